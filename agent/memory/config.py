@@ -28,6 +28,9 @@ class MemoryConfig:
     embedding_provider: str = "openai"  # "openai" | "local"
     embedding_model: str = "text-embedding-3-small"
     embedding_dim: int = 1536
+    embedding_batch_tokens: int = 8000  # 单次请求的估算 token 上限
+    embedding_concurrency: int = 4  # 并发请求数
+    embedding_cache_size: int = 50000  # 持久化 embedding 缓存条数上限 (LRU)，0 表示不限制
     
     # Chunking config
     chunk_max_tokens: int = 500
@@ -41,12 +44,19 @@ class MemoryConfig:
     vector_weight: float = 0.7
     keyword_weight: float = 0.3
     
+    # Vector index: "ivf" (approximate, needs numpy) | "exact"
+    vector_index: str = "ivf"
+    ann_min_size: int = 5000  # 分区向量数低于该值时精确搜索
+    ann_nprobe: int = 10  # 每次查询扫描的聚类数
+    
     # Memory sources
     sources: List[str] = field(default_factory=lambda: ["memory", "session"])
     
     # Sync config
     enable_auto_sync: bool = True
     sync_on_search: bool = True
+    watch_files: bool = False  # 后台线程轮询文件变化，搜索时不再同步
+    watch_interval: float = 5.0  # 轮询间隔(秒)
     
     # Memory flush config (独立于模型 context window)
     flush_token_threshold: int = 50000  # 50K tokens 触发 flush
@@ -66,6 +76,14 @@ class MemoryConfig:
         index_dir.mkdir(parents=True, exist_ok=True)
         return index_dir / "index.db"
     
+    def get_embedding_cache_path(self) -> Path:
+        """Get SQLite path of the persistent embedding cache"""
+        return self.get_db_path().parent / "embedding_cache.db"
+    
+    def get_vector_index_path(self) -> Path:
+        """Get path of the persisted ANN vector index"""
+        return self.get_db_path().parent / "vector_index.pkl"
+    
     def get_skills_dir(self) -> Path:
         """Get skills directory"""
         return self.get_workspace() / "skills"
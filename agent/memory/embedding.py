@@ -5,8 +5,16 @@ Supports OpenAI and local embedding models
 """
 
 import hashlib
+import random
+import sqlite3
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 
 class EmbeddingProvider(ABC):
@@ -30,9 +38,25 @@ class EmbeddingProvider(ABC):
 
 
 class OpenAIEmbeddingProvider(EmbeddingProvider):
-    """OpenAI embedding provider using REST API"""
+    """
+    OpenAI embedding provider using REST API
+
+    Inputs are split into token-bounded batches that are sent concurrently
+    over a pooled requests.Session. 429/5xx responses and network errors are
+    retried with exponential backoff, honouring Retry-After.
+    """
     
-    def __init__(self, model: str = "text-embedding-3-small", api_key: Optional[str] = None, api_base: Optional[str] = None):
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        api_key: Optional[str] = None,
+        api_base: Optional[str] = None,
+        max_batch_tokens: int = 8000,
+        max_batch_size: int = 256,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        timeout: float = 30
+    ):
         """
         Initialize OpenAI embedding provider
         
@@ -40,10 +64,22 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
             model: Model name (text-embedding-3-small or text-embedding-3-large)
             api_key: OpenAI API key
             api_base: Optional API base URL
+            max_batch_tokens: Estimated token budget per request
+            max_batch_size: Maximum number of inputs per request
+            max_concurrency: Maximum number of requests in flight
+            max_retries: Retries for rate-limited or failed requests
+            timeout: Per-request timeout in seconds
         """
         self.model = model
         self.api_key = api_key
         self.api_base = api_base or "https://api.openai.com/v1"
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._session = None
+        self._session_lock = threading.Lock()
 
         # Validate API key
         if not self.api_key or self.api_key in ["", "YOUR API KEY", "YOUR_API_KEY"]:
@@ -52,35 +88,122 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         # Set dimensions based on model
         self._dimensions = 1536 if "small" in model else 3072
 
+    def _get_session(self):
+        """Lazily create a pooled session sized for the concurrency limit"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}"
+                })
+                self._session = session
+            return self._session
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt"""
+        if retry_after:
+            try:
+                return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+        return min(0.5 * (2 ** attempt), 20.0) * random.uniform(0.5, 1.0)
+
     def _call_api(self, input_data):
         """Call OpenAI embedding API using requests"""
         import requests
 
         url = f"{self.api_base}/embeddings"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
         data = {
             "input": input_data,
             "model": self.model
         }
 
-        try:
-            response = requests.post(url, headers=headers, json=data, timeout=5)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError as e:
-            raise ConnectionError(f"Failed to connect to OpenAI API at {url}. Please check your network connection and api_base configuration. Error: {str(e)}")
-        except requests.exceptions.Timeout as e:
-            raise TimeoutError(f"OpenAI API request timed out after 10s. Please check your network connection. Error: {str(e)}")
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 401:
-                raise ValueError(f"Invalid OpenAI API key. Please check your 'open_ai_api_key' in config.json")
-            elif e.response.status_code == 429:
-                raise ValueError(f"OpenAI API rate limit exceeded. Please try again later.")
-            else:
-                raise ValueError(f"OpenAI API request failed: {e.response.status_code} - {e.response.text}")
+        attempt = 0
+        while True:
+            try:
+                response = self._get_session().post(url, json=data, timeout=self.timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    if attempt < self.max_retries:
+                        time.sleep(self._retry_delay(attempt, response.headers.get("Retry-After")))
+                        attempt += 1
+                        continue
+                response.raise_for_status()
+                return response.json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt < self.max_retries:
+                    time.sleep(self._retry_delay(attempt))
+                    attempt += 1
+                    continue
+                if isinstance(e, requests.exceptions.Timeout):
+                    raise TimeoutError(f"OpenAI API request timed out after {self.timeout}s. Please check your network connection. Error: {str(e)}")
+                raise ConnectionError(f"Failed to connect to OpenAI API at {url}. Please check your network connection and api_base configuration. Error: {str(e)}")
+            except requests.exceptions.HTTPError as e:
+                if e.response.status_code == 401:
+                    raise ValueError(f"Invalid OpenAI API key. Please check your 'open_ai_api_key' in config.json")
+                elif e.response.status_code == 429:
+                    raise ValueError(f"OpenAI API rate limit exceeded. Please try again later.")
+                else:
+                    raise ValueError(f"OpenAI API request failed: {e.response.status_code} - {e.response.text}")
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Cheap upper-bound token estimate (about one token per CJK char or 3 bytes)"""
+        return len(text.encode('utf-8')) // 3 + 1
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        """Group consecutive texts into batches bounded by size and estimated tokens"""
+        batches, batch, batch_tokens = [], [], 0
+        for text in texts:
+            tokens = self._estimate_tokens(text)
+            if batch and (len(batch) >= self.max_batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _embed_one_batch(self, batch: List[str]) -> List[List[float]]:
+        result = self._call_api(batch)
+        data = sorted(result["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in data]
+
+    def iter_embed_batches(self, texts: List[str]) -> Iterator[List[List[float]]]:
+        """
+        Embed texts batch by batch, yielding each batch's embeddings in input order
+
+        Up to `max_concurrency` requests are in flight; later batches keep
+        downloading while earlier results are consumed.
+        """
+        batches = self._split_batches(texts)
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            for batch in batches:
+                yield self._embed_one_batch(batch)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches)), thread_name_prefix="embedding") as executor:
+            futures = deque()
+            pending = iter(batches)
+            for batch in pending:
+                futures.append(executor.submit(self._embed_one_batch, batch))
+                if len(futures) >= self.max_concurrency:
+                    break
+            try:
+                while futures:
+                    embeddings = futures.popleft().result()
+                    for batch in pending:
+                        futures.append(executor.submit(self._embed_one_batch, batch))
+                        break
+                    yield embeddings
+            finally:
+                for future in futures:
+                    future.cancel()
 
     def embed(self, text: str) -> List[float]:
         """Generate embedding for text"""
@@ -92,8 +215,10 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
         if not texts:
             return []
 
-        result = self._call_api(texts)
-        return [item["embedding"] for item in result["data"]]
+        results = []
+        for embeddings in self.iter_embed_batches(texts):
+            results.extend(embeddings)
+        return results
 
     @property
     def dimensions(self) -> int:
@@ -104,37 +229,180 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
 
 
 class EmbeddingCache:
-    """Cache for embeddings to avoid recomputation"""
+    """
+    Persistent LRU cache of embeddings keyed by content hash
+
+    Entries live in a small SQLite database so vectors survive restarts.
+    Once the cache grows past `max_entries` the least recently used rows
+    are evicted (in batches, to keep writes cheap).
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, max_entries: int = 50000):
+        """
+        Args:
+            db_path: SQLite file for the cache, in-memory when None
+            max_entries: LRU bound, 0 for unbounded
+        """
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(str(db_path) if db_path else ":memory:", check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                hash TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (hash, provider, model)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        row = self.conn.execute("SELECT COUNT(*), MAX(last_used) FROM embedding_cache").fetchone()
+        self._size = row[0]
+        self._clock = row[1] or 0  # Logical LRU clock, monotonic across restarts
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-    def __init__(self):
-        self.cache = {}
+    @staticmethod
+    def compute_hash(text: str) -> str:
+        """Content hash, same as MemoryStorage.compute_hash so chunk hashes can be used directly"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
     def get(self, text: str, provider: str, model: str) -> Optional[List[float]]:
         """Get cached embedding"""
-        key = self._compute_key(text, provider, model)
-        return self.cache.get(key)
-    
+        return self.get_many_by_hash([self.compute_hash(text)], provider, model)[0]
+
     def put(self, text: str, provider: str, model: str, embedding: List[float]):
         """Cache embedding"""
-        key = self._compute_key(text, provider, model)
-        self.cache[key] = embedding
-    
-    @staticmethod
-    def _compute_key(text: str, provider: str, model: str) -> str:
-        """Compute cache key"""
-        content = f"{provider}:{model}:{text}"
-        return hashlib.md5(content.encode('utf-8')).hexdigest()
-    
+        self.put_many_by_hash([(self.compute_hash(text), embedding)], provider, model)
+
+    def get_many_by_hash(self, hashes: List[str], provider: str, model: str) -> List[Optional[List[float]]]:
+        """Look up embeddings for content hashes, None for misses"""
+        if not hashes:
+            return []
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            # Stay below SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                placeholders = ','.join('?' * len(part))
+                for h, blob in self.conn.execute(f"""
+                    SELECT hash, embedding FROM embedding_cache
+                    WHERE provider = ? AND model = ? AND hash IN ({placeholders})
+                """, [provider, model] + part):
+                    found[h] = array('f', blob).tolist()
+            if found:
+                self._clock += 1
+                self.conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE hash = ? AND provider = ? AND model = ?",
+                    [(self._clock, h, provider, model) for h in found]
+                )
+                self.conn.commit()
+            results = [found.get(h) for h in hashes]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many_by_hash(self, items: List[Tuple[str, List[float]]], provider: str, model: str):
+        """Store (content hash, embedding) pairs"""
+        items = [(h, e) for h, e in items if e]
+        if not items:
+            return
+        with self._lock:
+            self._clock += 1
+            before = self.conn.total_changes
+            self.conn.executemany("""
+                INSERT OR IGNORE INTO embedding_cache (hash, provider, model, embedding, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(h, provider, model, array('f', e).tobytes(), self._clock) for h, e in items])
+            self._size += self.conn.total_changes - before
+            if self.max_entries and self._size > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Evict down to 90% of the bound so eviction does not run on every put
+        excess = self._size - int(self.max_entries * 0.9)
+        self.conn.execute("""
+            DELETE FROM embedding_cache WHERE rowid IN (
+                SELECT rowid FROM embedding_cache ORDER BY last_used LIMIT ?
+            )
+        """, (excess,))
+        self._size -= excess
+        self.evictions += excess
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit-rate statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'size': self._size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
     def clear(self):
         """Clear cache"""
-        self.cache.clear()
+        with self._lock:
+            self.conn.execute("DELETE FROM embedding_cache")
+            self.conn.commit()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Wraps a provider so only texts missing from the EmbeddingCache reach the API"""
+
+    def __init__(self, provider: EmbeddingProvider, cache: EmbeddingCache, provider_name: str, model: str):
+        self.provider = provider
+        self.cache = cache
+        self.provider_name = provider_name
+        self.model = model
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        hashes = [self.cache.compute_hash(t) for t in texts]
+        results = self.cache.get_many_by_hash(hashes, self.provider_name, self.model)
+        missing = {}
+        for i, (h, r) in enumerate(zip(hashes, results)):
+            if r is None:
+                missing.setdefault(h, []).append(i)
+        if missing:
+            miss_hashes = list(missing)
+            embeddings = self.provider.embed_batch([texts[missing[h][0]] for h in miss_hashes])
+            for h, embedding in zip(miss_hashes, embeddings):
+                for i in missing[h]:
+                    results[i] = embedding
+            self.cache.put_many_by_hash(list(zip(miss_hashes, embeddings)), self.provider_name, self.model)
+        return results
+
+    @property
+    def dimensions(self) -> int:
+        return self.provider.dimensions
 
 
 def create_embedding_provider(
     provider: str = "openai",
     model: Optional[str] = None,
     api_key: Optional[str] = None,
-    api_base: Optional[str] = None
+    api_base: Optional[str] = None,
+    **kwargs
 ) -> EmbeddingProvider:
     """
     Factory function to create embedding provider
@@ -147,6 +415,7 @@ def create_embedding_provider(
         model: Model name (default: text-embedding-3-small)
         api_key: OpenAI API key (required)
         api_base: API base URL (default: https://api.openai.com/v1)
+        **kwargs: Batching/retry options passed to OpenAIEmbeddingProvider
         
     Returns:
         EmbeddingProvider instance
@@ -158,4 +427,4 @@ def create_embedding_provider(
         raise ValueError(f"Only 'openai' provider is supported, got: {provider}")
 
     model = model or "text-embedding-3-small"
-    return OpenAIEmbeddingProvider(model=model, api_key=api_key, api_base=api_base)
+    return OpenAIEmbeddingProvider(model=model, api_key=api_key, api_base=api_base, **kwargs)
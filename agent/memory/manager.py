@@ -5,6 +5,9 @@ Provides high-level interface for memory operations
 """
 
 import os
+import re
+import asyncio
+import threading
 from typing import List, Optional, Dict, Any
 from pathlib import Path
 import hashlib
@@ -12,10 +15,14 @@ from datetime import datetime, timedelta
 
 from agent.memory.config import MemoryConfig, get_default_memory_config
 from agent.memory.storage import MemoryStorage, MemoryChunk, SearchResult
+from agent.memory.vector_index import create_vector_index
 from agent.memory.chunker import TextChunker
-from agent.memory.embedding import create_embedding_provider, EmbeddingProvider
+from agent.memory.embedding import create_embedding_provider, EmbeddingProvider, EmbeddingCache, CachedEmbeddingProvider
 from agent.memory.summarizer import MemoryFlushManager, create_memory_files_if_needed
 
+# Paths generated by add_memory for entries that have no file on disk
+_ADD_MEMORY_PATH = re.compile(r"^memory/(shared|users/[^/]+)/memory_[0-9a-f]{8}\.md$")
+
 
 class MemoryManager:
     """
@@ -42,7 +49,18 @@ class MemoryManager:
         
         # Initialize storage
         db_path = self.config.get_db_path()
-        self.storage = MemoryStorage(db_path)
+        vector_index = None
+        try:
+            vector_index = create_vector_index(
+                self.config.vector_index,
+                path=self.config.get_vector_index_path(),
+                min_ivf_size=self.config.ann_min_size,
+                nprobe=self.config.ann_nprobe
+            )
+        except Exception as e:
+            from common.log import logger
+            logger.warning(f"[MemoryManager] Vector index initialization failed, using exact search: {e}")
+        self.storage = MemoryStorage(db_path, vector_index=vector_index)
         
         # Initialize chunker
         self.chunker = TextChunker(
@@ -65,7 +83,9 @@ class MemoryManager:
                     provider=self.config.embedding_provider,
                     model=self.config.embedding_model,
                     api_key=api_key,
-                    api_base=api_base
+                    api_base=api_base,
+                    max_batch_tokens=self.config.embedding_batch_tokens,
+                    max_concurrency=self.config.embedding_concurrency
                 )
             except Exception as e:
                 # Embedding provider failed, but that's OK
@@ -74,6 +94,24 @@ class MemoryManager:
                 logger.warning(f"[MemoryManager] Embedding provider initialization failed: {e}")
                 logger.info(f"[MemoryManager] Memory will work with keyword search only (no vector search)")
         
+        # Put the persistent embedding cache in front of every provider call
+        self.embedding_cache = None
+        if self.embedding_provider:
+            try:
+                self.embedding_cache = EmbeddingCache(
+                    self.config.get_embedding_cache_path(),
+                    max_entries=self.config.embedding_cache_size
+                )
+                self.embedding_provider = CachedEmbeddingProvider(
+                    self.embedding_provider,
+                    self.embedding_cache,
+                    provider_name=self.config.embedding_provider,
+                    model=getattr(self.embedding_provider, 'model', self.config.embedding_model)
+                )
+            except Exception as e:
+                from common.log import logger
+                logger.warning(f"[MemoryManager] Embedding cache initialization failed: {e}")
+        
         # Initialize memory flush manager
         workspace_dir = self.config.get_workspace()
         self.flush_manager = MemoryFlushManager(
@@ -85,6 +123,30 @@ class MemoryManager:
         self._init_workspace()
         
         self._dirty = False
+        self._sync_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+        self._migrate_unbacked_entries()
+        if self.config.watch_files:
+            self.start_watcher()
+    
+    def _migrate_unbacked_entries(self):
+        """
+        Mark add_memory entries written before mtime 0 was used for them, so sync does not purge them
+        
+        Older versions stored a nonzero mtime for these entries; they are recognised by
+        their generated path and the absence of a file at that path.
+        """
+        workspace_dir = self.config.get_workspace()
+        paths = [
+            path for path, (mtime, _) in self.storage.get_file_stats().items()
+            if mtime and _ADD_MEMORY_PATH.match(path.replace(os.sep, "/"))
+            and not (workspace_dir / path).exists()
+        ]
+        if paths:
+            self.storage.mark_files_unbacked(paths)
+            from common.log import logger
+            logger.info(f"[MemoryManager] Marked {len(paths)} add_memory entries as not backed by a file")
     
     def _init_workspace(self):
         """Initialize workspace directories"""
@@ -129,8 +191,8 @@ class MemoryManager:
         if not scopes:
             return []
         
-        # Sync if needed
-        if self.config.sync_on_search and self._dirty:
+        # Sync if needed (the background watcher, when running, keeps the index fresh instead)
+        if self.config.sync_on_search and self._dirty and not self._watcher:
             await self.sync()
         
         # Perform vector search (if embedding provider available)
@@ -236,6 +298,7 @@ class MemoryManager:
         
         # Save to storage
         self.storage.save_chunks_batch(memory_chunks)
+        self.storage.flush_vector_index()
         
         # Update file metadata
         file_hash = MemoryStorage.compute_hash(content)
@@ -243,7 +306,7 @@ class MemoryManager:
             path=path,
             source=source,
             file_hash=file_hash,
-            mtime=int(os.path.getmtime(__file__)),  # Use current time
+            mtime=0,  # Not backed by a file on disk, so sync never purges it
             size=len(content)
         )
     
@@ -251,16 +314,61 @@ class MemoryManager:
         """
         Synchronize memory from files
         
+        Runs sync_files in the default executor, so the event loop is not blocked
+        by file I/O and embedding calls while another sync holds the lock.
+        
+        Args:
+            force: Force full reindex
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.sync_files, force)
+    
+    def sync_files(self, force: bool = False):
+        """
+        Synchronize memory from files (blocking)
+        
+        Files whose mtime and size match the `files` table are skipped without
+        being read; files that disappeared have their chunks purged. Concurrent
+        calls from any thread or coroutine are serialized.
+        
         Args:
             force: Force full reindex
         """
+        with self._sync_lock:
+            workspace_dir = self.config.get_workspace()
+            stored = self.storage.get_file_stats(source="memory")
+            seen = set()
+            
+            for file_path, scope, user_id in self._scan_memory_files():
+                rel_path = str(file_path.relative_to(workspace_dir))
+                seen.add(rel_path)
+                try:
+                    stat = file_path.stat()
+                except FileNotFoundError:
+                    continue
+                if not force and stored.get(rel_path) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                self._sync_file(file_path, "memory", scope, user_id, force=force)
+            
+            # Purge files deleted from disk (mtime 0 marks entries not backed by a file, see add_memory)
+            for rel_path, (mtime, _) in stored.items():
+                if rel_path not in seen and mtime:
+                    self.storage.delete_file(rel_path)
+                    from common.log import logger
+                    logger.info(f"[MemoryManager] Purged deleted memory file: {rel_path}")
+            
+            self.storage.flush_vector_index()
+            self._dirty = False
+    
+    def _scan_memory_files(self) -> List[tuple]:
+        """List (file_path, scope, user_id) for every memory file on disk"""
         memory_dir = self.config.get_memory_dir()
         workspace_dir = self.config.get_workspace()
+        files = []
         
         # Scan MEMORY.md (workspace root)
         memory_file = Path(workspace_dir) / "MEMORY.md"
         if memory_file.exists():
-            await self._sync_file(memory_file, "memory", "shared", None)
+            files.append((memory_file, "shared", None))
         
         # Scan memory directory (including daily summaries)
         if memory_dir.exists():
@@ -291,16 +399,46 @@ class MemoryManager:
                     user_id = None
                     scope = "shared"
                 
-                await self._sync_file(file_path, "memory", scope, user_id)
+                files.append((file_path, scope, user_id))
         
-        self._dirty = False
+        return files
     
-    async def _sync_file(
+    def start_watcher(self, interval: Optional[float] = None):
+        """
+        Keep the index fresh from a background thread so search never syncs inline
+        
+        Polls file stats every `interval` seconds; unchanged files cost one stat() each.
+        """
+        if self._watcher and self._watcher.is_alive():
+            return
+        interval = interval or self.config.watch_interval
+        self._watcher_stop.clear()
+        
+        def _watch():
+            from common.log import logger
+            while not self._watcher_stop.wait(interval):
+                try:
+                    self.sync_files()
+                except Exception as e:
+                    logger.warning(f"[MemoryManager] Background sync failed: {e}")
+        
+        self._watcher = threading.Thread(target=_watch, name="memory_watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watcher(self):
+        """Stop the background watcher"""
+        self._watcher_stop.set()
+        if self._watcher:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+    
+    def _sync_file(
         self,
         file_path: Path,
         source: str,
         scope: str,
-        user_id: Optional[str]
+        user_id: Optional[str],
+        force: bool = False
     ):
         """Sync a single file"""
         # Compute file hash
@@ -313,8 +451,14 @@ class MemoryManager:
         
         # Check if file changed
         stored_hash = self.storage.get_file_hash(rel_path)
-        if stored_hash == file_hash:
-            return  # No changes
+        if stored_hash == file_hash and not force:
+            # Content unchanged (e.g. touched), just refresh the stat snapshot
+            stat = file_path.stat()
+            self.storage.update_file_metadata(rel_path, source, file_hash, stat.st_mtime_ns, stat.st_size)
+            return
+        
+        # Vectors of chunks whose text is unchanged can be reused as-is
+        previous = self.storage.get_embeddings_by_path(rel_path) if self.embedding_provider else {}
         
         # Delete old chunks
         self.storage.delete_by_path(rel_path)
@@ -325,16 +469,20 @@ class MemoryManager:
             return
         
         texts = [chunk.text for chunk in chunks]
+        hashes = [MemoryStorage.compute_hash(text) for text in texts]
         if self.embedding_provider:
-            embeddings = self.embedding_provider.embed_batch(texts)
+            embeddings = [previous.get(h) for h in hashes]
+            missing = [i for i, e in enumerate(embeddings) if e is None]
+            if missing:
+                for i, embedding in zip(missing, self.embedding_provider.embed_batch([texts[i] for i in missing])):
+                    embeddings[i] = embedding
         else:
             embeddings = [None] * len(texts)
         
         # Create memory chunks
         memory_chunks = []
-        for chunk, embedding in zip(chunks, embeddings):
+        for chunk, embedding, chunk_hash in zip(chunks, embeddings, hashes):
             chunk_id = self._generate_chunk_id(rel_path, chunk.start_line, chunk.end_line)
-            chunk_hash = MemoryStorage.compute_hash(chunk.text)
             
             memory_chunks.append(MemoryChunk(
                 id=chunk_id,
@@ -359,7 +507,7 @@ class MemoryManager:
             path=rel_path,
             source=source,
             file_hash=file_hash,
-            mtime=int(stat.st_mtime),
+            mtime=stat.st_mtime_ns,
             size=stat.st_size
         )
     
@@ -550,7 +698,8 @@ class MemoryManager:
             'embedding_enabled': self.embedding_provider is not None,
             'embedding_provider': self.config.embedding_provider if self.embedding_provider else 'disabled',
             'embedding_model': self.config.embedding_model if self.embedding_provider else 'N/A',
-            'search_mode': 'hybrid (vector + keyword)' if self.embedding_provider else 'keyword only (FTS5)'
+            'search_mode': 'hybrid (vector + keyword)' if self.embedding_provider else 'keyword only (FTS5)',
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None
         }
     
     def mark_dirty(self):
@@ -559,7 +708,10 @@ class MemoryManager:
     
     def close(self):
         """Close memory manager and release resources"""
+        self.stop_watcher()
         self.storage.close()
+        if self.embedding_cache:
+            self.embedding_cache.close()
     
     # Helper methods
     
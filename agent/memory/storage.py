@@ -8,10 +8,23 @@ from __future__ import annotations
 import sqlite3
 import json
 import hashlib
+import threading
+from array import array
 from typing import List, Dict, Optional, Any
 from pathlib import Path
 from dataclasses import dataclass
 
+from common.fts_tokenizer import segment, build_match_query, query_terms
+
+# Schema version stored in PRAGMA user_version
+# 1: files.mtime holds st_mtime_ns instead of whole seconds
+SCHEMA_VERSION = 1
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 @dataclass
 class MemoryChunk:
@@ -44,11 +57,22 @@ class SearchResult:
 class MemoryStorage:
     """SQLite-based storage with FTS5 for keyword search"""
     
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, vector_index=None):
+        """
+        Args:
+            db_path: SQLite database path
+            vector_index: Optional ANN index (see agent.memory.vector_index); exact search when None
+        """
         self.db_path = db_path
         self.conn: Optional[sqlite3.Connection] = None
         self.fts5_available = False  # Track FTS5 availability
+        # In-process embedding matrix per dimension, rebuilt after chunks change
+        self._vector_cache: Dict[int, Dict[str, Any]] = {}
+        self._vector_cache_lock = threading.Lock()
+        self.vector_index = vector_index
         self._init_db()
+        if self.vector_index is not None:
+            self._load_vector_index()
     
     def _check_fts5_support(self) -> bool:
         """Check if SQLite has FTS5 support"""
@@ -105,6 +129,8 @@ class MemoryStorage:
             self.conn.execute("PRAGMA journal_mode=WAL")
             # Set busy timeout to avoid "database is locked" errors
             self.conn.execute("PRAGMA busy_timeout=5000")
+            # INSERT OR REPLACE only fires the delete trigger with recursive triggers on
+            self.conn.execute("PRAGMA recursive_triggers=ON")
         except Exception as e:
             print(f"⚠️  Unexpected error during database initialization: {e}")
             raise
@@ -128,6 +154,12 @@ class MemoryStorage:
             )
         """)
         
+        # Embeddings are stored as float32 BLOBs with a precomputed L2 norm
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(chunks)")}
+        if 'embedding_norm' not in columns:
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN embedding_norm REAL")
+        self._migrate_json_embeddings()
+        
         # Create indexes
         self.conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_chunks_user 
@@ -146,40 +178,22 @@ class MemoryStorage:
         
         # Create FTS5 virtual table for keyword search (only if supported)
         if self.fts5_available:
-            # Use default unicode61 tokenizer (stable and compatible)
-            # For CJK support, we'll use LIKE queries as fallback
-            self.conn.execute("""
-                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
-                    text,
-                    id UNINDEXED,
-                    user_id UNINDEXED,
-                    path UNINDEXED,
-                    source UNINDEXED,
-                    scope UNINDEXED,
-                    content='chunks',
-                    content_rowid='rowid'
-                )
-            """)
-            
-            # Create triggers to keep FTS in sync
-            self.conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
-                    INSERT INTO chunks_fts(rowid, text, id, user_id, path, source, scope)
-                    VALUES (new.rowid, new.text, new.id, new.user_id, new.path, new.source, new.scope);
-                END
-            """)
-            
-            self.conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
-                    DELETE FROM chunks_fts WHERE rowid = old.rowid;
-                END
-            """)
-            
-            self.conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
-                    UPDATE chunks_fts SET text = new.text, id = new.id,
-                                         user_id = new.user_id, path = new.path, source = new.source, scope = new.scope
-                    WHERE rowid = new.rowid;
+            self._init_fts()
+        
+        # Write counter bumped by every change to chunks, identifies the state a
+        # persisted vector index was built from
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks_version (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("INSERT OR IGNORE INTO chunks_version (id, version) VALUES (0, 0)")
+        for trigger, event in (("chunks_version_ai", "INSERT"), ("chunks_version_ad", "DELETE"),
+                               ("chunks_version_au", "UPDATE")):
+            self.conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON chunks BEGIN
+                    UPDATE chunks_version SET version = version + 1 WHERE id = 0;
                 END
             """)
         
@@ -195,46 +209,135 @@ class MemoryStorage:
             )
         """)
         
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Whole seconds never equal a file's st_mtime_ns, so those files are rehashed
+            # once on the next sync; 0 (not backed by a file) is kept as is
+            self.conn.execute("UPDATE files SET mtime = mtime * 1000000000 WHERE mtime != 0")
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        
         self.conn.commit()
     
+    def _init_fts(self):
+        """
+        Create the keyword index over chunk text
+        
+        unicode61 treats a run of CJK characters as one token, so text is indexed
+        as overlapping bigrams and queries are rewritten to match. Segmentation is
+        done in Python (save_chunks_batch): the triggers only copy columns or delete
+        rows, so other connections (sqlite CLI, sqlite-web) can still write chunks.
+        The segmented text is stored in the FTS table itself, so triggers can delete
+        rows without reading the chunks table.
+        """
+        row = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+        ).fetchone()
+        if row and "content='chunks'" in row['sql']:
+            # Index from older versions: external content with unsegmented text
+            for trigger in ("chunks_ai", "chunks_ad", "chunks_au", "chunks_au_text"):
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            self.conn.execute("DROP TABLE chunks_fts")
+            row = None
+        
+        # Triggers from versions that segmented through a connection-local SQL function
+        for trigger in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%fts_segment%'"
+        ).fetchall():
+            self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger['name']}")
+        
+        self.conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text,
+                id UNINDEXED,
+                user_id UNINDEXED,
+                path UNINDEXED,
+                source UNINDEXED,
+                scope UNINDEXED
+            )
+        """)
+        
+        # Create triggers to keep FTS in sync
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, text, id, user_id, path, source, scope)
+                VALUES (new.rowid, new.text, new.id, new.user_id, new.path, new.source, new.scope);
+            END
+        """)
+        
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                DELETE FROM chunks_fts WHERE rowid = old.rowid;
+            END
+        """)
+        
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE OF id, user_id, path, source, scope ON chunks BEGIN
+                UPDATE chunks_fts SET id = new.id, user_id = new.user_id, path = new.path,
+                                     source = new.source, scope = new.scope
+                WHERE rowid = new.rowid;
+            END
+        """)
+        
+        # Only a changed text replaces the segmented copy (unsegmented, written outside MemoryStorage)
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS chunks_au_text AFTER UPDATE OF text ON chunks BEGIN
+                UPDATE chunks_fts SET text = new.text WHERE rowid = new.rowid;
+            END
+        """)
+        
+        if row is None:
+            rows = self.conn.execute("SELECT rowid, text, id, user_id, path, source, scope FROM chunks").fetchall()
+            self.conn.executemany("""
+                INSERT INTO chunks_fts(rowid, text, id, user_id, path, source, scope)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(r['rowid'], segment(r['text']), r['id'], r['user_id'], r['path'], r['source'], r['scope'])
+                  for r in rows])
+    
+    def _segment_fts_text(self, chunks: List[MemoryChunk]):
+        """Replace the text copied by the FTS triggers with its bigram-segmented form"""
+        updates = []
+        for c in chunks:
+            segmented = segment(c.text)
+            if segmented != c.text:
+                updates.append((segmented, c.id))
+        if updates:
+            self.conn.executemany("""
+                UPDATE chunks_fts SET text = ?
+                WHERE rowid = (SELECT rowid FROM chunks WHERE id = ?)
+            """, updates)
+    
     def save_chunk(self, chunk: MemoryChunk):
         """Save a memory chunk"""
-        self.conn.execute("""
-            INSERT OR REPLACE INTO chunks 
-            (id, user_id, scope, source, path, start_line, end_line, text, embedding, hash, metadata, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, strftime('%s', 'now'))
-        """, (
-            chunk.id,
-            chunk.user_id,
-            chunk.scope,
-            chunk.source,
-            chunk.path,
-            chunk.start_line,
-            chunk.end_line,
-            chunk.text,
-            json.dumps(chunk.embedding) if chunk.embedding else None,
-            chunk.hash,
-            json.dumps(chunk.metadata) if chunk.metadata else None
-        ))
-        self.conn.commit()
+        self.save_chunks_batch([chunk])
     
     def save_chunks_batch(self, chunks: List[MemoryChunk]):
         """Save multiple chunks in a batch"""
-        self.conn.executemany("""
-            INSERT OR REPLACE INTO chunks 
-            (id, user_id, scope, source, path, start_line, end_line, text, embedding, hash, metadata, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, strftime('%s', 'now'))
-        """, [
-            (
+        rows = []
+        for c in chunks:
+            blob, norm = self._encode_embedding(c.embedding)
+            rows.append((
                 c.id, c.user_id, c.scope, c.source, c.path,
                 c.start_line, c.end_line, c.text,
-                json.dumps(c.embedding) if c.embedding else None,
+                blob, norm,
                 c.hash,
                 json.dumps(c.metadata) if c.metadata else None
-            )
-            for c in chunks
-        ])
+            ))
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO chunks 
+            (id, user_id, scope, source, path, start_line, end_line, text, embedding, embedding_norm, hash, metadata, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, strftime('%s', 'now'))
+        """, rows)
+        if self.fts5_available:
+            self._segment_fts_text(chunks)
         self.conn.commit()
+        self._invalidate_vector_cache()
+        if self.vector_index is not None:
+            with self._vector_cache_lock:
+                for c in chunks:
+                    if c.embedding:
+                        self.vector_index.add(c.id, c.embedding, c.scope, c.user_id)
+                    else:
+                        self.vector_index.remove(c.id)
     
     def get_chunk(self, chunk_id: str) -> Optional[MemoryChunk]:
         """Get a chunk by ID"""
@@ -255,48 +358,92 @@ class MemoryStorage:
         limit: int = 10
     ) -> List[SearchResult]:
         """
-        Vector similarity search using in-memory cosine similarity
-        (sqlite-vec can be added later for better performance)
+        Vector similarity search over the in-process embedding matrix
+        
+        Cosine similarity is computed with one matrix-vector product when NumPy
+        is available; scope/user filters are applied as masks.
         """
         if scopes is None:
             scopes = ["shared"]
             if user_id:
                 scopes.append("user")
         
-        # Build query
-        scope_placeholders = ','.join('?' * len(scopes))
-        params = scopes
+        if self.vector_index is not None:
+            return self._search_vector_index(query_embedding, user_id, scopes, limit)
         
-        if user_id:
-            query = f"""
-                SELECT * FROM chunks 
-                WHERE scope IN ({scope_placeholders})
-                AND (scope = 'shared' OR user_id = ?)
-                AND embedding IS NOT NULL
-            """
-            params.append(user_id)
-        else:
-            query = f"""
-                SELECT * FROM chunks 
-                WHERE scope IN ({scope_placeholders})
-                AND embedding IS NOT NULL
-            """
-        
-        rows = self.conn.execute(query, params).fetchall()
-        
-        # Calculate cosine similarity
-        results = []
-        for row in rows:
-            embedding = json.loads(row['embedding'])
-            similarity = self._cosine_similarity(query_embedding, embedding)
-            
-            if similarity > 0:
-                results.append((similarity, row))
+        dim = len(query_embedding)
+        cache = self._get_vector_cache(dim)
+        if not cache['ids']:
+            return []
         
-        # Sort by similarity and limit
-        results.sort(key=lambda x: x[0], reverse=True)
-        results = results[:limit]
+        if np is not None:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query_norm = float(np.linalg.norm(query))
+            if query_norm == 0:
+                return []
+            scope_codes = [cache['scope_index'][scope] for scope in scopes if scope in cache['scope_index']]
+            mask = np.isin(cache['scope_codes'], scope_codes) & (cache['norms'] > 0)
+            if user_id:
+                shared_code = cache['scope_index'].get('shared', -1)
+                user_code = cache['user_index'].get(user_id, -1)
+                mask &= (cache['scope_codes'] == shared_code) | (cache['user_codes'] == user_code)
+            candidates = int(mask.sum())
+            if candidates == 0:
+                return []
+            scores = cache['matrix'] @ query
+            scores /= np.where(mask, cache['norms'], 1.0) * query_norm
+            scores[~mask] = -np.inf
+            k = min(limit, candidates)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            ranked = [(float(scores[i]), int(i)) for i in top]
+        else:
+            query_norm = sum(a * a for a in query_embedding) ** 0.5
+            if query_norm == 0:
+                return []
+            ranked = []
+            for i, vector in enumerate(cache['matrix']):
+                scope = cache['scopes'][i]
+                if scope not in scopes or (user_id and scope != 'shared' and cache['user_ids'][i] != user_id):
+                    continue
+                norm = cache['norms'][i]
+                if norm == 0:
+                    continue
+                ranked.append((sum(a * b for a, b in zip(query_embedding, vector)) / (norm * query_norm), i))
+            ranked.sort(key=lambda x: x[0], reverse=True)
+            ranked = ranked[:limit]
+        
+        ranked = [(score, cache['ids'][i]) for score, i in ranked if score > 0]
+        return self._fetch_results(ranked)
+    
+    def _search_vector_index(
+        self,
+        query_embedding: List[float],
+        user_id: Optional[str],
+        scopes: List[str],
+        limit: int
+    ) -> List[SearchResult]:
+        """Vector search through the ANN index, one partition per (scope, user_id)"""
+        with self._vector_cache_lock:
+            if user_id:
+                partitions = [(scope, None if scope == 'shared' else user_id) for scope in scopes]
+            else:
+                partitions = [key for key in self.vector_index.partition_keys() if key[0] in scopes]
+            ranked = self.vector_index.search(query_embedding, partitions, limit)
+        return self._fetch_results([(score, chunk_id) for score, chunk_id in ranked if score > 0])
+    
+    def _fetch_results(self, ranked) -> List[SearchResult]:
+        """Load text for ranked (score, chunk_id) pairs"""
+        if not ranked:
+            return []
         
+        # Only the winners need their text
+        ids = [chunk_id for _, chunk_id in ranked]
+        placeholders = ','.join('?' * len(ids))
+        rows = {
+            row['id']: row
+            for row in self.conn.execute(f"SELECT * FROM chunks WHERE id IN ({placeholders})", ids)
+        }
         return [
             SearchResult(
                 path=row['path'],
@@ -307,7 +454,8 @@ class MemoryStorage:
                 source=row['source'],
                 user_id=row['user_id']
             )
-            for score, row in results
+            for score, row in ((score, rows.get(chunk_id)) for score, chunk_id in ranked)
+            if row is not None
         ]
     
     def search_keyword(
@@ -318,28 +466,17 @@ class MemoryStorage:
         limit: int = 10
     ) -> List[SearchResult]:
         """
-        Keyword search using FTS5 + LIKE fallback
-        
-        Strategy:
-        1. If FTS5 available: Try FTS5 search first (good for English and word-based languages)
-        2. If no FTS5 or no results and query contains CJK: Use LIKE search
+        Keyword search using FTS5 (BM25 ranked, CJK via bigrams), LIKE fallback
+        when SQLite is built without FTS5
         """
         if scopes is None:
             scopes = ["shared"]
             if user_id:
                 scopes.append("user")
         
-        # Try FTS5 search first (if available)
         if self.fts5_available:
-            fts_results = self._search_fts5(query, user_id, scopes, limit)
-            if fts_results:
-                return fts_results
-        
-        # Fallback to LIKE search (always for CJK, or if FTS5 not available)
-        if not self.fts5_available or MemoryStorage._contains_cjk(query):
-            return self._search_like(query, user_id, scopes, limit)
-        
-        return []
+            return self._search_fts5(query, user_id, scopes, limit)
+        return self._search_like(query, user_id, scopes, limit)
     
     def _search_fts5(
         self,
@@ -349,7 +486,7 @@ class MemoryStorage:
         limit: int
     ) -> List[SearchResult]:
         """FTS5 full-text search"""
-        fts_query = self._build_fts_query(query)
+        fts_query = build_match_query(query, operator="OR")
         if not fts_query:
             return []
         
@@ -360,7 +497,7 @@ class MemoryStorage:
             sql_query = f"""
                 SELECT chunks.*, bm25(chunks_fts) as rank
                 FROM chunks_fts
-                JOIN chunks ON chunks.id = chunks_fts.id
+                JOIN chunks ON chunks.rowid = chunks_fts.rowid
                 WHERE chunks_fts MATCH ? 
                 AND chunks.scope IN ({scope_placeholders})
                 AND (chunks.scope = 'shared' OR chunks.user_id = ?)
@@ -372,7 +509,7 @@ class MemoryStorage:
             sql_query = f"""
                 SELECT chunks.*, bm25(chunks_fts) as rank
                 FROM chunks_fts
-                JOIN chunks ON chunks.id = chunks_fts.id
+                JOIN chunks ON chunks.rowid = chunks_fts.rowid
                 WHERE chunks_fts MATCH ? 
                 AND chunks.scope IN ({scope_placeholders})
                 ORDER BY rank
@@ -404,11 +541,9 @@ class MemoryStorage:
         scopes: List[str],
         limit: int
     ) -> List[SearchResult]:
-        """LIKE-based search for CJK characters"""
-        import re
-        # Extract CJK words (2+ characters)
-        cjk_words = re.findall(r'[\u4e00-\u9fff]{2,}', query)
-        if not cjk_words:
+        """LIKE-based search, used when SQLite is built without FTS5"""
+        words = [w for w in query_terms(query) if len(w) >= 2]
+        if not words:
             return []
         
         scope_placeholders = ','.join('?' * len(scopes))
@@ -416,7 +551,7 @@ class MemoryStorage:
         # Build LIKE conditions for each word
         like_conditions = []
         params = []
-        for word in cjk_words:
+        for word in words:
             like_conditions.append("text LIKE ?")
             params.append(f'%{word}%')
         
@@ -460,10 +595,42 @@ class MemoryStorage:
     
     def delete_by_path(self, path: str):
         """Delete all chunks from a file"""
+        if self.vector_index is not None:
+            ids = [row['id'] for row in self.conn.execute("SELECT id FROM chunks WHERE path = ?", (path,))]
+            with self._vector_cache_lock:
+                for chunk_id in ids:
+                    self.vector_index.remove(chunk_id)
         self.conn.execute("""
             DELETE FROM chunks WHERE path = ?
         """, (path,))
         self.conn.commit()
+        self._invalidate_vector_cache()
+    
+    def get_embeddings_by_path(self, path: str) -> Dict[str, List[float]]:
+        """Map chunk hash -> embedding for the chunks currently stored for a file"""
+        rows = self.conn.execute("""
+            SELECT hash, embedding FROM chunks WHERE path = ? AND embedding IS NOT NULL
+        """, (path,)).fetchall()
+        return {row['hash']: self._decode_embedding(row['embedding']) for row in rows}
+    
+    def get_file_stats(self, source: Optional[str] = None) -> Dict[str, tuple]:
+        """Map path -> (mtime_ns, size) for indexed files"""
+        if source:
+            rows = self.conn.execute("SELECT path, mtime, size FROM files WHERE source = ?", (source,))
+        else:
+            rows = self.conn.execute("SELECT path, mtime, size FROM files")
+        return {row['path']: (row['mtime'], row['size']) for row in rows}
+    
+    def delete_file(self, path: str):
+        """Delete a file's chunks and metadata"""
+        self.delete_by_path(path)
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.conn.commit()
+    
+    def mark_files_unbacked(self, paths: List[str]):
+        """Set mtime to 0 for entries that have no file on disk, so sync never purges them"""
+        self.conn.executemany("UPDATE files SET mtime = 0 WHERE path = ?", [(p,) for p in paths])
+        self.conn.commit()
     
     def get_file_hash(self, path: str) -> Optional[str]:
         """Get stored file hash"""
@@ -473,7 +640,7 @@ class MemoryStorage:
         return row['hash'] if row else None
     
     def update_file_metadata(self, path: str, source: str, file_hash: str, mtime: int, size: int):
-        """Update file metadata"""
+        """Update file metadata (mtime in nanoseconds, 0 for entries not backed by a file)"""
         self.conn.execute("""
             INSERT OR REPLACE INTO files (path, source, hash, mtime, size, updated_at)
             VALUES (?, ?, ?, ?, ?, strftime('%s', 'now'))
@@ -495,8 +662,23 @@ class MemoryStorage:
             'files': files_count
         }
     
+    def flush_vector_index(self):
+        """Persist the vector index if it changed, tagged with the chunks it was built from"""
+        if self.vector_index is None or self.conn is None:
+            return
+        try:
+            with self._vector_cache_lock:
+                self.vector_index.save(self._vector_index_signature())
+        except Exception as e:
+            from common.log import logger
+            logger.warning(f"[MemoryStorage] Error saving vector index: {e}")
+    
     def close(self):
         """Close database connection"""
+        self.flush_vector_index()
+        self._close_connection()
+    
+    def _close_connection(self):
         if self.conn:
             try:
                 self.conn.commit()  # Ensure all changes are committed
@@ -506,9 +688,9 @@ class MemoryStorage:
                 print(f"⚠️  Error closing database connection: {e}")
     
     def __del__(self):
-        """Destructor to ensure connection is closed"""
+        """Destructor to ensure connection is closed (the vector index is saved by flush/close only)"""
         try:
-            self.close()
+            self._close_connection()
         except:
             pass  # Ignore errors during cleanup
     
@@ -525,11 +707,113 @@ class MemoryStorage:
             start_line=row['start_line'],
             end_line=row['end_line'],
             text=row['text'],
-            embedding=json.loads(row['embedding']) if row['embedding'] else None,
+            embedding=self._decode_embedding(row['embedding']),
             hash=row['hash'],
             metadata=json.loads(row['metadata']) if row['metadata'] else None
         )
     
+    def _migrate_json_embeddings(self):
+        """Convert embeddings stored as JSON text by older versions into float32 BLOBs"""
+        rows = self.conn.execute("""
+            SELECT id, embedding FROM chunks WHERE typeof(embedding) = 'text'
+        """).fetchall()
+        if not rows:
+            return
+        updates = []
+        for row in rows:
+            blob, norm = self._encode_embedding(json.loads(row['embedding']))
+            updates.append((blob, norm, row['id']))
+        self.conn.executemany("UPDATE chunks SET embedding = ?, embedding_norm = ? WHERE id = ?", updates)
+        self.conn.commit()
+        from common.log import logger
+        logger.info(f"[MemoryStorage] Migrated {len(updates)} JSON embeddings to float32 blobs")
+    
+    def _vector_index_signature(self) -> str:
+        """Identifies the current chunk contents: write counter plus the number of indexable chunks"""
+        version = self.conn.execute("SELECT version FROM chunks_version WHERE id = 0").fetchone()['version']
+        count = self.conn.execute("""
+            SELECT COUNT(*) as cnt FROM chunks WHERE embedding IS NOT NULL AND embedding_norm > 0
+        """).fetchone()['cnt']
+        return f"{version}:{count}"
+    
+    def _load_vector_index(self):
+        """Load the persisted ANN index, rebuilding it from the database if it is missing or stale"""
+        signature = self._vector_index_signature()
+        if self.vector_index.load() and self.vector_index.signature == signature:
+            return
+        count = int(signature.split(":")[1])
+        if count == 0:
+            self.vector_index.clear()
+            self.vector_index.save(signature)
+            return
+        from common.log import logger
+        logger.info(f"[MemoryStorage] Building vector index for {count} chunks")
+        index = self.vector_index
+        index.clear()
+        for row in self.conn.execute("""
+            SELECT id, scope, user_id, embedding FROM chunks WHERE embedding IS NOT NULL AND embedding_norm > 0
+        """):
+            index.add(row['id'], self._decode_embedding(row['embedding']), row['scope'], row['user_id'])
+        index.save(signature)
+    
+    def _invalidate_vector_cache(self):
+        with self._vector_cache_lock:
+            self._vector_cache.clear()
+    
+    def _get_vector_cache(self, dim: int) -> Dict[str, Any]:
+        """Load all embeddings of the given dimension into memory (once per change)"""
+        with self._vector_cache_lock:
+            cache = self._vector_cache.get(dim)
+            if cache is not None:
+                return cache
+            rows = self.conn.execute("""
+                SELECT id, scope, user_id, embedding, embedding_norm FROM chunks
+                WHERE embedding IS NOT NULL AND length(embedding) = ?
+            """, (dim * 4,)).fetchall()
+            ids = [row['id'] for row in rows]
+            if np is not None:
+                matrix = np.frombuffer(b''.join(row['embedding'] for row in rows), dtype=np.float32).reshape(len(rows), dim)
+                # Scopes and user ids are interned to integer codes so filters become vector masks
+                scope_index, user_index = {}, {}
+                cache = {
+                    'ids': ids,
+                    'matrix': matrix,
+                    'norms': np.array([row['embedding_norm'] or 0.0 for row in rows], dtype=np.float32),
+                    'scope_codes': np.array([scope_index.setdefault(row['scope'], len(scope_index)) for row in rows], dtype=np.int32),
+                    'user_codes': np.array([user_index.setdefault(row['user_id'], len(user_index)) for row in rows], dtype=np.int32),
+                    'scope_index': scope_index,
+                    'user_index': user_index,
+                }
+            else:
+                cache = {
+                    'ids': ids,
+                    'matrix': [self._decode_embedding(row['embedding']) for row in rows],
+                    'norms': [row['embedding_norm'] or 0.0 for row in rows],
+                    'scopes': [row['scope'] for row in rows],
+                    'user_ids': [row['user_id'] for row in rows],
+                }
+            self._vector_cache[dim] = cache
+            return cache
+    
+    @staticmethod
+    def _encode_embedding(embedding: Optional[List[float]]):
+        """Pack an embedding into a float32 BLOB and compute its L2 norm"""
+        if not embedding:
+            return None, None
+        packed = array('f', embedding)
+        norm = sum(a * a for a in packed) ** 0.5
+        return packed.tobytes(), norm
+    
+    @staticmethod
+    def _decode_embedding(value) -> Optional[List[float]]:
+        if not value:
+            return None
+        if isinstance(value, str):
+            return json.loads(value)  # Legacy JSON text
+        unpacked = array('f')
+        unpacked.frombytes(value)
+        return unpacked.tolist()
+    
     @staticmethod
     def _cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -546,35 +830,17 @@ class MemoryStorage:
         return dot_product / (norm1 * norm2)
     
     @staticmethod
-    def _contains_cjk(text: str) -> bool:
-        """Check if text contains CJK (Chinese/Japanese/Korean) characters"""
-        import re
-        return bool(re.search(r'[\u4e00-\u9fff]', text))
-    
-    @staticmethod
-    def _build_fts_query(raw_query: str) -> Optional[str]:
+    def _bm25_rank_to_score(rank: float) -> float:
         """
-        Build FTS5 query from raw text
+        Convert BM25 rank to a 0-1 score
         
-        Works best for English and word-based languages.
-        For CJK characters, LIKE search will be used as fallback.
+        FTS5 ranks are negative (lower is better). -rank / (1 - rank) is bounded
+        and absolute, so a weak single-term hit stays low even when it is the
+        best hit of its query, instead of scoring like an exact phrase match.
         """
-        import re
-        # Extract words (primarily English words and numbers)
-        tokens = re.findall(r'[A-Za-z0-9_]+', raw_query)
-        if not tokens:
-            return None
-        
-        # Quote tokens for exact matching
-        quoted = [f'"{t}"' for t in tokens]
-        # Use OR for more flexible matching
-        return ' OR '.join(quoted)
-    
-    @staticmethod
-    def _bm25_rank_to_score(rank: float) -> float:
-        """Convert BM25 rank to 0-1 score"""
-        normalized = max(0, rank) if rank is not None else 999
-        return 1 / (1 + normalized)
+        if rank is None or rank >= 0:
+            return 0.0
+        return -rank / (1 - rank)
     
     @staticmethod
     def _truncate_text(text: str, max_chars: int) -> str:
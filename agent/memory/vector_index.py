@@ -0,0 +1,270 @@
+"""
+Approximate nearest-neighbour index for memory embeddings
+
+Vectors are partitioned by (scope, user_id). Small partitions are scanned
+exactly; partitions above a size threshold get an IVF (inverted file) index
+built with spherical k-means, so a query only scores the vectors in the
+few clusters closest to it. Requires NumPy.
+"""
+
+from __future__ import annotations
+import os
+import pickle
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+PartitionKey = Tuple[str, Optional[str]]
+
+
+class VectorIndex(ABC):
+    """Base class for pluggable vector indexes behind MemoryStorage"""
+
+    # Opaque tag of the database state the index was saved from (see save/load)
+    signature: Optional[str] = None
+
+    @abstractmethod
+    def add(self, chunk_id: str, vector: List[float], scope: str, user_id: Optional[str]):
+        """Add or replace a vector"""
+        pass
+
+    @abstractmethod
+    def remove(self, chunk_id: str):
+        """Remove a vector if present"""
+        pass
+
+    @abstractmethod
+    def search(self, query: List[float], partitions: List[PartitionKey], limit: int) -> List[Tuple[float, str]]:
+        """Return (cosine score, chunk_id) pairs, best first"""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Remove all vectors"""
+        pass
+
+    def partition_keys(self) -> List[PartitionKey]:
+        """All (scope, user_id) partitions currently in the index"""
+        return []
+
+    def save(self, signature: Optional[str] = None):
+        """Persist the index together with `signature` (optional)"""
+        pass
+
+    def load(self) -> bool:
+        """Load a persisted index and its `signature`, returns False when nothing usable was found"""
+        return False
+
+
+class _Partition:
+    """Vectors of one (scope, user_id) partition, with an optional IVF layer"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+        self.centroids = None  # (nlist, dim), None while below the IVF threshold
+        self.assign = np.zeros(16, dtype=np.int32)  # row -> centroid
+        self.trained_size = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, chunk_id: str, vector):
+        row = self.positions.get(chunk_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.vectors):
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+                self.assign = np.concatenate([self.assign, np.zeros_like(self.assign)])
+            self.ids.append(chunk_id)
+            self.positions[chunk_id] = row
+        self.vectors[row] = vector
+        if self.centroids is not None:
+            self.assign[row] = int(np.argmax(self.centroids @ vector))
+
+    def remove(self, chunk_id: str):
+        row = self.positions.pop(chunk_id, None)
+        if row is None:
+            return
+        # Keep rows compact: move the last row into the hole
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.positions[moved] = row
+            self.vectors[row] = self.vectors[last]
+            self.assign[row] = self.assign[last]
+        self.ids.pop()
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """Spherical k-means over (a sample of) the partition"""
+        n = len(self.ids)
+        nlist = max(1, int(n ** 0.5))
+        rng = np.random.default_rng(seed)
+        data = self.vectors[:n]
+        sample = data[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms > 0, norms, 1.0)
+        self.centroids = centroids
+        self.assign[:n] = np.argmax(data @ centroids.T, axis=1)
+        self.trained_size = n
+
+    def search(self, query, limit: int, nprobe: int) -> List[Tuple[float, str]]:
+        n = len(self.ids)
+        if n == 0:
+            return []
+        if self.centroids is None:
+            rows = np.arange(n)
+            scores = self.vectors[:n] @ query
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            rows = np.flatnonzero(np.isin(self.assign[:n], probe))
+            if rows.size == 0:
+                return []
+            scores = self.vectors[rows] @ query
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(float(scores[i]), self.ids[rows[i]]) for i in top]
+
+
+class IVFVectorIndex(VectorIndex):
+    """
+    Partitioned IVF index, exact below `min_ivf_size` vectors per partition
+
+    Args:
+        path: Pickle file to persist the index (optional)
+        min_ivf_size: Partitions smaller than this are searched exactly
+        nprobe: Number of clusters scanned per query
+    """
+
+    def __init__(self, path: Optional[Path] = None, min_ivf_size: int = 5000, nprobe: int = 10):
+        if np is None:
+            raise ImportError("numpy is required for the IVF vector index")
+        self.path = Path(path) if path else None
+        self.min_ivf_size = min_ivf_size
+        self.nprobe = nprobe
+        self.partitions: Dict[PartitionKey, _Partition] = {}
+        self.locations: Dict[str, PartitionKey] = {}
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def add(self, chunk_id: str, vector: List[float], scope: str, user_id: Optional[str]):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            self.remove(chunk_id)
+            return
+        key = (scope, user_id if scope != "shared" else None)
+        if self.locations.get(chunk_id, key) != key:
+            self.remove(chunk_id)
+        partition = self.partitions.get(key)
+        if partition is None or partition.dim != len(vector):
+            if partition is not None:
+                # Embedding model changed: vectors of the old dimension are dropped with their partition
+                for old_id in partition.ids:
+                    self.locations.pop(old_id, None)
+            partition = self.partitions[key] = _Partition(len(vector))
+        partition.add(chunk_id, vector / norm)
+        self.locations[chunk_id] = key
+        # (Re)train once a partition crosses the threshold or doubles in size
+        size = len(partition)
+        if size >= self.min_ivf_size and size >= 2 * partition.trained_size:
+            partition.train()
+        self.dirty = True
+
+    def remove(self, chunk_id: str):
+        key = self.locations.pop(chunk_id, None)
+        if key is None:
+            return
+        self.partitions[key].remove(chunk_id)
+        self.dirty = True
+
+    def search(self, query: List[float], partitions: List[PartitionKey], limit: int) -> List[Tuple[float, str]]:
+        query = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return []
+        query = query / norm
+        results = []
+        for key in partitions:
+            partition = self.partitions.get(key)
+            if partition is not None and partition.dim == len(query):
+                results.extend(partition.search(query, limit, self.nprobe))
+        results.sort(key=lambda x: x[0], reverse=True)
+        return results[:limit]
+
+    def clear(self):
+        self.partitions.clear()
+        self.locations.clear()
+        self.dirty = True
+
+    def partition_keys(self) -> List[PartitionKey]:
+        return list(self.partitions)
+
+    def save(self, signature: Optional[str] = None):
+        if not self.path or (not self.dirty and signature == self.signature):
+            return
+        # Write to a temporary file first so a crash never leaves a truncated index
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        state = {"partitions": self.partitions, "locations": self.locations, "signature": signature}
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.signature = signature
+        self.dirty = False
+
+    def load(self) -> bool:
+        if not self.path or not self.path.exists():
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            self.partitions = state["partitions"]
+            self.locations = state["locations"]
+            self.signature = state.get("signature")
+            self.dirty = False
+            return True
+        except Exception as e:
+            from common.log import logger
+            logger.warning(f"[VectorIndex] Failed to load {self.path}, will rebuild: {e}")
+            return False
+
+
+def create_vector_index(kind: str, path: Optional[Path] = None, **kwargs) -> Optional[VectorIndex]:
+    """
+    Factory for vector indexes; returns None (exact search) when unavailable
+
+    Args:
+        kind: "ivf" or "exact"
+        path: Where to persist the index
+    """
+    if kind == "exact":
+        return None
+    if kind != "ivf":
+        raise ValueError(f"Unknown vector index: {kind}")
+    if np is None:
+        from common.log import logger
+        logger.info("[VectorIndex] numpy not installed, using exact vector search")
+        return None
+    return IVFVectorIndex(path, **kwargs)
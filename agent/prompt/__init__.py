@@ -2,11 +2,12 @@
 Agent Prompt Module - 系统提示词构建模块
 """
 
-from .builder import PromptBuilder, build_agent_system_prompt
+from .builder import PromptBuilder, SystemPromptSections, build_agent_system_prompt
 from .workspace import ensure_workspace, load_context_files
 
 __all__ = [
     'PromptBuilder',
+    'SystemPromptSections',
     'build_agent_system_prompt',
     'ensure_workspace',
     'load_context_files',
@@ -6,6 +6,8 @@ System Prompt Builder - 系统提示词构建器
 
 from __future__ import annotations
 import os
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 
@@ -75,6 +77,162 @@ class PromptBuilder:
             is_first_conversation=is_first_conversation,
             **kwargs
         )
+    
+    def build_sections(
+        self,
+        user_identity: Optional[Dict[str, str]] = None,
+        tools: Optional[List[Any]] = None,
+        context_files: Optional[List[ContextFile]] = None,
+        skill_manager: Any = None,
+        memory_manager: Any = None,
+        runtime_info: Optional[Dict[str, Any]] = None,
+        is_first_conversation: bool = False
+    ) -> "SystemPromptSections":
+        """
+        构建分段缓存的系统提示词，参数同build，tools在render时传入
+        
+        context_files为None时从工作空间读取，并在文件修改后自动重新读取
+        """
+        return SystemPromptSections(
+            workspace_dir=self.workspace_dir,
+            language=self.language,
+            user_identity=user_identity,
+            context_files=context_files,
+            skill_manager=skill_manager,
+            memory_manager=memory_manager,
+            runtime_info=runtime_info,
+            is_first_conversation=is_first_conversation
+        )
+
+
+class SystemPromptSections:
+    """
+    按section缓存的系统提示词
+    
+    各section只在其依赖变化时重新渲染：工具系统/技能/记忆依赖工具集合，技能还依赖
+    skill_manager.version，上下文文件依赖文件的mtime和大小（未显式传入context_files时），
+    运行时信息按分钟刷新，其余section只渲染一次。每种工具集合各有一份缓存，
+    不同工具集合的会话交替使用时互不失效。
+    运行时信息位于最后，因此之前的前缀在各轮之间字节一致，便于模型服务端的prompt缓存命中。
+    """
+    
+    ORDER = ("tooling", "skills", "memory", "workspace", "user_identity", "context_files", "runtime")
+    MAX_TOOL_SETS = 16  # 最多缓存的工具集合数，超出时淘汰最久未用的
+    
+    def __init__(
+        self,
+        workspace_dir: str,
+        language: str = "zh",
+        user_identity: Optional[Dict[str, str]] = None,
+        context_files: Optional[List[ContextFile]] = None,
+        skill_manager: Any = None,
+        memory_manager: Any = None,
+        runtime_info: Optional[Dict[str, Any]] = None,
+        is_first_conversation: bool = False
+    ):
+        self.workspace_dir = workspace_dir
+        self.language = language
+        self.user_identity = user_identity
+        self.context_files = context_files
+        self.watch_context_files = context_files is None
+        self._context_files_key = None
+        self.skill_manager = skill_manager
+        self.memory_manager = memory_manager
+        self.runtime_info = runtime_info
+        self.is_first_conversation = is_first_conversation
+        # tools_key -> {"sections": {name: text}, "keys": {name: key}, "prompt": str}
+        self._caches: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _current_context_files_key(self):
+        if not self.watch_context_files:
+            return None
+        from .workspace import context_files_signature
+        return context_files_signature(self.workspace_dir)
+    
+    def _section_keys(self) -> Dict[str, Any]:
+        return {
+            "tooling": None,
+            "skills": getattr(self.skill_manager, 'version', 0),
+            "memory": None,
+            "workspace": None,
+            "user_identity": None,
+            "context_files": self._current_context_files_key(),
+            "runtime": _runtime_minute(self.runtime_info),
+        }
+    
+    def _get_context_files(self, key) -> Optional[List[ContextFile]]:
+        """读取上下文文件，同一版本的文件只读取一次（各工具集合的缓存共用）"""
+        if self.watch_context_files and key != self._context_files_key:
+            from .workspace import load_context_files
+            self.context_files = load_context_files(self.workspace_dir)
+            self._context_files_key = key
+        return self.context_files
+    
+    def _render_section(self, name: str, tools: Optional[List[Any]], key: Any = None) -> List[str]:
+        language = self.language
+        if name == "tooling":
+            return _build_tooling_section(tools, language) if tools else []
+        if name == "skills":
+            return _build_skills_section(self.skill_manager, tools, language) if self.skill_manager else []
+        if name == "memory":
+            return _build_memory_section(self.memory_manager, tools, language) if self.memory_manager else []
+        if name == "workspace":
+            return _build_workspace_section(self.workspace_dir, language, self.is_first_conversation)
+        if name == "user_identity":
+            return _build_user_identity_section(self.user_identity, language) if self.user_identity else []
+        if name == "context_files":
+            context_files = self._get_context_files(key)
+            return _build_context_files_section(context_files, language) if context_files else []
+        if name == "runtime":
+            return _build_runtime_section(self.runtime_info, language) if self.runtime_info else []
+        return []
+    
+    def render(self, tools: Optional[List[Any]] = None) -> str:
+        """
+        渲染完整提示词，依赖未变化的section直接复用，整体未变化时返回同一字符串
+        """
+        tools_key = tuple(sorted(tool.name if hasattr(tool, 'name') else str(tool) for tool in tools or []))
+        keys = self._section_keys()
+        with self._lock:
+            cache = self._caches.get(tools_key)
+            if cache is None:
+                cache = self._caches[tools_key] = {"sections": {}, "keys": {}, "prompt": None}
+                if len(self._caches) > self.MAX_TOOL_SETS:
+                    self._caches.popitem(last=False)
+            else:
+                self._caches.move_to_end(tools_key)
+            sections = cache["sections"]
+            changed = False
+            for name in self.ORDER:
+                if name not in sections or cache["keys"].get(name) != keys[name]:
+                    sections[name] = "\n".join(self._render_section(name, tools, keys[name]))
+                    cache["keys"][name] = keys[name]
+                    changed = True
+            if changed or cache["prompt"] is None:
+                cache["prompt"] = "\n".join(sections[name] for name in self.ORDER if sections[name])
+            return cache["prompt"]
+    
+    def invalidate(self, name: Optional[str] = None):
+        """强制重新渲染某个section（不传则全部），上下文文件会重新读取"""
+        with self._lock:
+            if name in (None, "context_files"):
+                self._context_files_key = None
+            for cache in self._caches.values():
+                if name:
+                    cache["sections"].pop(name, None)
+                else:
+                    cache["sections"].clear()
+
+
+def _runtime_minute(runtime_info: Optional[Dict[str, Any]]) -> Optional[str]:
+    """运行时信息的缓存key：精确到分钟的当前时间"""
+    if runtime_info and callable(runtime_info.get("_get_current_time")):
+        try:
+            return runtime_info["_get_current_time"]()["time"][:16]
+        except Exception:
+            return None
+    return None
 
 
 def build_agent_system_prompt(
@@ -446,7 +604,8 @@ def _build_runtime_section(runtime_info: Dict[str, Any], language: str) -> List[
     if callable(runtime_info.get("_get_current_time")):
         try:
             time_info = runtime_info["_get_current_time"]()
-            time_line = f"当前时间: {time_info['time']} {time_info['weekday']} ({time_info['timezone']})"
+            # 精确到分钟，提示词每分钟最多变化一次
+            time_line = f"当前时间: {time_info['time'][:16]} {time_info['weekday']} ({time_info['timezone']})"
             lines.append(time_line)
             lines.append("")
         except Exception as e:
@@ -471,7 +630,9 @@ def _build_runtime_section(runtime_info: Dict[str, Any], language: str) -> List[
     if runtime_info.get("model"):
         runtime_parts.append(f"模型={runtime_info['model']}")
     if runtime_info.get("workspace"):
-        runtime_parts.append(f"工作空间={runtime_info['workspace']}")
+        # Replace backslashes with forward slashes for Windows paths
+        workspace_path = str(runtime_info['workspace']).replace('\\', '/')
+        runtime_parts.append(f"工作空间={workspace_path}")
     # Only add channel if it's not the default "web"
     if runtime_info.get("channel") and runtime_info.get("channel") != "web":
         runtime_parts.append(f"渠道={runtime_info['channel']}")
@@ -21,6 +21,13 @@ DEFAULT_RULE_FILENAME = "RULE.md"
 DEFAULT_MEMORY_FILENAME = "MEMORY.md"
 DEFAULT_STATE_FILENAME = ".agent_state.json"
 
+# 默认加载到系统提示词的上下文文件（按优先级排序）
+CONTEXT_FILENAMES = [
+    DEFAULT_AGENT_FILENAME,
+    DEFAULT_USER_FILENAME,
+    DEFAULT_RULE_FILENAME,
+]
+
 
 @dataclass
 class WorkspaceFiles:
@@ -93,12 +100,7 @@ def load_context_files(workspace_dir: str, files_to_load: Optional[List[str]] =
         ContextFile对象列表
     """
     if files_to_load is None:
-        # 默认加载的文件（按优先级排序）
-        files_to_load = [
-            DEFAULT_AGENT_FILENAME,
-            DEFAULT_USER_FILENAME,
-            DEFAULT_RULE_FILENAME,
-        ]
+        files_to_load = CONTEXT_FILENAMES
     
     context_files = []
     
@@ -129,6 +131,20 @@ def load_context_files(workspace_dir: str, files_to_load: Optional[List[str]] =
     return context_files
 
 
+def context_files_signature(workspace_dir: str, files_to_load: Optional[List[str]] = None) -> tuple:
+    """
+    上下文文件的 (路径, mtime_ns, 大小) 元组，文件被修改、创建或删除后随之变化
+    """
+    signature = []
+    for filename in files_to_load or CONTEXT_FILENAMES:
+        try:
+            stat = os.stat(os.path.join(workspace_dir, filename))
+            signature.append((filename, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((filename, None, None))
+    return tuple(signature)
+
+
 def _create_template_if_missing(filepath: str, template_content: str):
     """如果文件不存在，创建模板文件"""
     if not os.path.exists(filepath):
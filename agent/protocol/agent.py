@@ -5,6 +5,7 @@ import threading
 from common.log import logger
 from agent.protocol.models import LLMRequest, LLMModel
 from agent.protocol.agent_stream import AgentStreamExecutor
+from agent.protocol.token_estimator import get_token_estimator
 from agent.protocol.result import AgentAction, AgentActionType, ToolResult, AgentResult
 from agent.tools.base_tool import BaseTool, ToolStage
 
@@ -14,7 +15,7 @@ class Agent:
                  tools=None, output_mode="print", max_steps=100, max_context_tokens=None, 
                  context_reserve_tokens=None, memory_manager=None, name: str = None,
                  workspace_dir: str = None, skill_manager=None, enable_skills: bool = True,
-                 runtime_info: dict = None):
+                 runtime_info: dict = None, prompt_sections=None):
         """
         Initialize the Agent with system prompt, model, description.
 
@@ -33,6 +34,8 @@ class Agent:
         :param skill_manager: Optional SkillManager instance (will be created if None and enable_skills=True)
         :param enable_skills: Whether to enable skills support (default: True)
         :param runtime_info: Optional runtime info dict (with _get_current_time callable for dynamic time)
+        :param prompt_sections: Optional SystemPromptSections; when set, the system prompt is rendered
+                                from cached sections instead of patching system_prompt
         """
         self.name = name or "Agent"
         self.system_prompt = system_prompt
@@ -51,6 +54,9 @@ class Agent:
         self.workspace_dir = workspace_dir  # Workspace directory
         self.enable_skills = enable_skills  # Skills enabled flag
         self.runtime_info = runtime_info  # Runtime info for dynamic time update
+        self.prompt_sections = prompt_sections  # Section-cached system prompt
+        self._prompt_cache_key = None
+        self._prompt_cache = None
         
         # Initialize skill manager
         self.skill_manager = None
@@ -107,6 +113,15 @@ class Agent:
         :param skill_filter: Optional list of skill names to include (deprecated)
         :return: Complete system prompt
         """
+        if self.prompt_sections is not None:
+            return self.prompt_sections.render(self.tools)
+
+        # Patching is only redone when the tool set or the current minute changes,
+        # so consecutive turns send a byte-identical prompt
+        cache_key = (self.system_prompt, tuple(tool.name for tool in self.tools), self._current_minute())
+        if cache_key == self._prompt_cache_key:
+            return self._prompt_cache
+
         prompt = self.system_prompt
 
         # Rebuild tool list section to reflect current self.tools
@@ -116,7 +131,17 @@ class Agent:
         if self.runtime_info and callable(self.runtime_info.get('_get_current_time')):
             prompt = self._rebuild_runtime_section(prompt)
 
+        self._prompt_cache_key = cache_key
+        self._prompt_cache = prompt
         return prompt
+
+    def _current_minute(self):
+        if self.runtime_info and callable(self.runtime_info.get('_get_current_time')):
+            try:
+                return self.runtime_info['_get_current_time']()['time'][:16]
+            except Exception:
+                return None
+        return None
     
     def _rebuild_runtime_section(self, prompt: str) -> str:
         """
@@ -136,7 +161,7 @@ class Agent:
             runtime_lines = [
                 "\n## 运行时信息\n",
                 "\n",
-                f"当前时间: {time_info['time']} {time_info['weekday']} ({time_info['timezone']})\n",
+                f"当前时间: {time_info['time'][:16]} {time_info['weekday']} ({time_info['timezone']})\n",
                 "\n"
             ]
             
@@ -278,64 +303,26 @@ class Agent:
         """
         Estimate token count for a message.
 
-        Uses chars/3 for Chinese-heavy content and chars/4 for ASCII-heavy content,
-        plus per-block overhead for tool_use / tool_result structures.
+        Counts come from the shared TokenEstimator, memoized per message object
+        and recomputed only when the message content changes.
 
         :param message: Message dict with 'role' and 'content'
         :return: Estimated token count
         """
-        content = message.get('content', '')
-        if isinstance(content, str):
-            return max(1, self._estimate_text_tokens(content))
-        elif isinstance(content, list):
-            total_tokens = 0
-            for part in content:
-                if not isinstance(part, dict):
-                    continue
-                block_type = part.get('type', '')
-                if block_type == 'text':
-                    total_tokens += self._estimate_text_tokens(part.get('text', ''))
-                elif block_type == 'image':
-                    total_tokens += 1200
-                elif block_type == 'tool_use':
-                    # tool_use has id + name + input (JSON-encoded)
-                    total_tokens += 50  # overhead for structure
-                    input_data = part.get('input', {})
-                    if isinstance(input_data, dict):
-                        import json
-                        input_str = json.dumps(input_data, ensure_ascii=False)
-                        total_tokens += self._estimate_text_tokens(input_str)
-                elif block_type == 'tool_result':
-                    # tool_result has tool_use_id + content
-                    total_tokens += 30  # overhead for structure
-                    result_content = part.get('content', '')
-                    if isinstance(result_content, str):
-                        total_tokens += self._estimate_text_tokens(result_content)
-                else:
-                    # Unknown block type, estimate conservatively
-                    total_tokens += 10
-            return max(1, total_tokens)
-        return 1
+        return get_token_estimator().estimate_message(message)
 
     @staticmethod
     def _estimate_text_tokens(text: str) -> int:
         """
         Estimate token count for a text string.
 
-        Chinese / CJK characters typically use ~1.5 tokens each,
-        while ASCII uses ~0.25 tokens per char (4 chars/token).
-        We use a weighted average based on the character mix.
+        Uses tiktoken when available, otherwise ~1.5 tokens per CJK char
+        and ~0.25 tokens per ASCII char.
 
         :param text: Input text
         :return: Estimated token count
         """
-        if not text:
-            return 0
-        # Count non-ASCII characters (CJK, emoji, etc.)
-        non_ascii = sum(1 for c in text if ord(c) > 127)
-        ascii_count = len(text) - non_ascii
-        # CJK chars: ~1.5 tokens each; ASCII: ~0.25 tokens per char
-        return int(non_ascii * 1.5 + ascii_count * 0.25) + 1
+        return get_token_estimator().estimate_text(text)
 
     def _find_tool(self, tool_name: str):
         """Find and return a tool with the specified name"""
@@ -479,6 +466,7 @@ class Agent:
         # Get max_context_turns from config
         from config import conf
         max_context_turns = conf().get("agent_max_context_turns", 30)
+        max_parallel_tools = conf().get("agent_max_parallel_tools", 4)
         
         # Create stream executor with copied message history
         executor = AgentStreamExecutor(
@@ -489,7 +477,8 @@ class Agent:
             max_turns=self.max_steps,
             on_event=on_event,
             messages=messages_copy,  # Pass copied message history
-            max_context_turns=max_context_turns
+            max_context_turns=max_context_turns,
+            max_parallel_tools=max_parallel_tools
         )
 
         # Execute
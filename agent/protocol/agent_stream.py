@@ -5,9 +5,11 @@ Provides streaming output, event system, and complete tool-call loop
 """
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Callable, Tuple
 
 from agent.protocol.models import LLMRequest, LLMModel
+from agent.protocol.token_estimator import get_token_estimator
 from agent.tools.base_tool import BaseTool, ToolResult
 from common.log import logger
 
@@ -32,7 +34,8 @@ class AgentStreamExecutor:
             max_turns: int = 50,
             on_event: Optional[Callable] = None,
             messages: Optional[List[Dict]] = None,
-            max_context_turns: int = 30
+            max_context_turns: int = 30,
+            max_parallel_tools: int = 4
     ):
         """
         Initialize stream executor
@@ -46,6 +49,7 @@ class AgentStreamExecutor:
             on_event: Event callback function
             messages: Optional existing message history (for persistent conversations)
             max_context_turns: Maximum number of conversation turns to keep in context
+            max_parallel_tools: Maximum concurrency-safe tool calls run at once (1 disables parallelism)
         """
         self.agent = agent
         self.model = model
@@ -55,6 +59,7 @@ class AgentStreamExecutor:
         self.max_turns = max_turns
         self.on_event = on_event
         self.max_context_turns = max_context_turns
+        self.max_parallel_tools = max_parallel_tools
 
         # Message history - use provided messages or create new list
         self.messages = messages if messages is not None else []
@@ -292,8 +297,7 @@ class AgentStreamExecutor:
                 tool_result_blocks = []
 
                 try:
-                    for tool_call in tool_calls:
-                        result = self._execute_tool(tool_call)
+                    for tool_call, result in self._execute_tools(tool_calls):
                         tool_results.append(result)
                         
                         # Debug: Check if tool is being called repeatedly with same args
@@ -788,6 +792,55 @@ class AgentStreamExecutor:
 
         return full_content, tool_calls
 
+    def _is_concurrency_safe(self, tool_call: Dict) -> bool:
+        tool = self.tools.get(tool_call["name"])
+        return bool(tool and tool.concurrency_safe and "_parse_error" not in tool_call)
+
+    def _execute_tools(self, tool_calls: List[Dict]):
+        """
+        Execute the tool calls of one turn, yielding (tool_call, result) in the original order
+        
+        Consecutive concurrency-safe calls run together on a bounded pool; any other
+        call runs alone. Failure checks, failure bookkeeping and start/end events stay
+        on the calling thread in call order.
+        """
+        i = 0
+        while i < len(tool_calls):
+            j = i
+            if self.max_parallel_tools > 1:
+                while j < len(tool_calls) and self._is_concurrency_safe(tool_calls[j]):
+                    j += 1
+            if j - i <= 1:
+                yield tool_calls[i], self._execute_tool(tool_calls[i])
+                i += 1
+                continue
+
+            batch = tool_calls[i:j]
+            i = j
+            # Failure checks see the history as it was before the batch
+            results = {}
+            runnable = []
+            for idx, tool_call in enumerate(batch):
+                early = self._precheck_tool_call(tool_call)
+                if early is not None:
+                    results[idx] = early
+                else:
+                    self._emit_tool_start(tool_call)
+                    runnable.append(idx)
+
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel_tools, len(runnable) or 1),
+                                    thread_name_prefix="agent_tool") as executor:
+                futures = {idx: executor.submit(self._invoke_tool, batch[idx]) for idx in runnable}
+                try:
+                    for idx, tool_call in enumerate(batch):
+                        if idx in futures:
+                            results[idx] = self._finish_tool_call(tool_call, futures.pop(idx).result())
+                        yield tool_call, results[idx]
+                finally:
+                    # Caller stopped early (e.g. critical error): still close out started calls
+                    for idx, future in futures.items():
+                        self._finish_tool_call(batch[idx], future.result())
+
     def _execute_tool(self, tool_call: Dict) -> Dict[str, Any]:
         """
         Execute tool
@@ -798,8 +851,15 @@ class AgentStreamExecutor:
         Returns:
             Tool execution result
         """
+        early = self._precheck_tool_call(tool_call)
+        if early is not None:
+            return early
+        self._emit_tool_start(tool_call)
+        return self._finish_tool_call(tool_call, self._invoke_tool(tool_call))
+
+    def _precheck_tool_call(self, tool_call: Dict) -> Optional[Dict[str, Any]]:
+        """Return an error result if the call must not run (parse error or retry protection)"""
         tool_name = tool_call["name"]
-        tool_id = tool_call["id"]
         arguments = tool_call["arguments"]
 
         # Check if there was a JSON parse error
@@ -835,13 +895,18 @@ class AgentStreamExecutor:
                     "execution_time": 0
                 }
             return result
+        return None
 
+    def _emit_tool_start(self, tool_call: Dict):
         self._emit_event("tool_execution_start", {
-            "tool_call_id": tool_id,
-            "tool_name": tool_name,
-            "arguments": arguments
+            "tool_call_id": tool_call["id"],
+            "tool_name": tool_call["name"],
+            "arguments": tool_call["arguments"]
         })
 
+    def _invoke_tool(self, tool_call: Dict) -> Dict[str, Any]:
+        """Run the tool itself; safe to call from a worker thread (no shared bookkeeping)"""
+        tool_name = tool_call["name"]
         try:
             tool = self.tools.get(tool_name)
             if not tool:
@@ -853,51 +918,47 @@ class AgentStreamExecutor:
 
             # Execute tool
             start_time = time.time()
-            result: ToolResult = tool.execute_tool(arguments)
+            result: ToolResult = tool.execute_tool(tool_call["arguments"])
             execution_time = time.time() - start_time
 
-            result_dict = {
+            return {
                 "status": result.status,
                 "result": result.result,
                 "execution_time": execution_time
             }
 
-            # Record tool result for failure tracking
-            success = result.status == "success"
-            self._record_tool_result(tool_name, arguments, success)
-
-            # Auto-refresh skills after skill creation
-            if tool_name == "bash" and result.status == "success":
-                command = arguments.get("command", "")
-                if "init_skill.py" in command and self.agent.skill_manager:
-                    logger.info("Detected skill creation, refreshing skills...")
-                    self.agent.refresh_skills()
-                    logger.info(f"Skills refreshed! Now have {len(self.agent.skill_manager.skills)} skills")
-
-            self._emit_event("tool_execution_end", {
-                "tool_call_id": tool_id,
-                "tool_name": tool_name,
-                **result_dict
-            })
-
-            return result_dict
-
         except Exception as e:
             logger.error(f"Tool execution error: {e}")
-            error_result = {
+            return {
                 "status": "error",
                 "result": str(e),
                 "execution_time": 0
             }
-            # Record failure
-            self._record_tool_result(tool_name, arguments, False)
-            
-            self._emit_event("tool_execution_end", {
-                "tool_call_id": tool_id,
-                "tool_name": tool_name,
-                **error_result
-            })
-            return error_result
+
+    def _finish_tool_call(self, tool_call: Dict, result_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the result for failure tracking and emit tool_execution_end"""
+        tool_name = tool_call["name"]
+        arguments = tool_call["arguments"]
+
+        # Record tool result for failure tracking
+        success = result_dict["status"] == "success"
+        self._record_tool_result(tool_name, arguments, success)
+
+        # Auto-refresh skills after skill creation
+        if tool_name == "bash" and success:
+            command = arguments.get("command", "")
+            if "init_skill.py" in command and self.agent.skill_manager:
+                logger.info("Detected skill creation, refreshing skills...")
+                self.agent.refresh_skills()
+                logger.info(f"Skills refreshed! Now have {len(self.agent.skill_manager.skills)} skills")
+
+        self._emit_event("tool_execution_end", {
+            "tool_call_id": tool_call["id"],
+            "tool_name": tool_name,
+            **result_dict
+        })
+
+        return result_dict
 
     def _validate_and_fix_messages(self):
         """
@@ -1152,10 +1213,14 @@ class AgentStreamExecutor:
         if not turns:
             return
         
+        # 每轮 tokens 只估算一次（按消息缓存），后续累加都基于这份列表
+        turn_tokens_list = [self._estimate_turn_tokens(turn) for turn in turns]
+
         # Step 2: 轮次限制 - 保留最近 N 轮
         if len(turns) > self.max_context_turns:
             removed_turns = len(turns) - self.max_context_turns
             turns = turns[-self.max_context_turns:]  # 保留最近的轮次
+            turn_tokens_list = turn_tokens_list[-self.max_context_turns:]
             
             logger.info(
                 f"💾 上下文轮次超限: {len(turns) + removed_turns} > {self.max_context_turns}，"
@@ -1175,11 +1240,11 @@ class AgentStreamExecutor:
             max_tokens = context_window - reserve_tokens
 
         # Estimate system prompt tokens
-        system_tokens = self.agent._estimate_message_tokens({"role": "system", "content": self.system_prompt})
+        system_tokens = max(1, get_token_estimator().estimate_text(self.system_prompt, cache=True))
         available_tokens = max_tokens - system_tokens
 
         # Calculate current tokens
-        current_tokens = sum(self._estimate_turn_tokens(turn) for turn in turns)
+        current_tokens = sum(turn_tokens_list)
         
         # If under limit, reconstruct messages and return
         if current_tokens + system_tokens <= max_tokens:
@@ -1207,8 +1272,7 @@ class AgentStreamExecutor:
         accumulated_tokens = 0
         min_turns = 3  # 尽量保留至少 3 轮，但不强制（避免超出 token 限制）
         
-        for i, turn in enumerate(reversed(turns)):
-            turn_tokens = self._estimate_turn_tokens(turn)
+        for i, (turn, turn_tokens) in enumerate(zip(reversed(turns), reversed(turn_tokens_list))):
             turns_from_end = i + 1
             
             # 检查是否超出限制
@@ -0,0 +1,204 @@
+"""
+Token estimation for agent context trimming
+
+Counts are memoized by a fingerprint of the message content (string hashes and
+lengths), so trimming the history before each LLM call only tokenizes messages
+that are new or were modified in place (e.g. truncated tool results). The cache
+holds only fingerprints and counts, never the messages themselves. Uses tiktoken when it is installed, otherwise a
+character-class heuristic.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from common.log import logger
+
+
+def heuristic_text_tokens(text: str) -> int:
+    """
+    Estimate tokens without a tokenizer: ~1.5 tokens per non-ASCII (CJK, emoji)
+    char and ~0.25 per ASCII char. Counting is done by the codec in C.
+    """
+    if not text:
+        return 0
+    if text.isascii():
+        return int(len(text) * 0.25) + 1
+    ascii_count = len(text.encode("ascii", "ignore"))
+    non_ascii = len(text) - ascii_count
+    return int(non_ascii * 1.5 + ascii_count * 0.25) + 1
+
+
+def _text_key(value):
+    # str caches its hash, so re-fingerprinting an unchanged message is cheap
+    return (len(value), hash(value)) if isinstance(value, str) else None
+
+
+def _message_key(content):
+    """
+    Content fingerprint of a message, changes when a block is truncated or
+    replaced in place so the memoized count is recomputed
+    """
+    if isinstance(content, str):
+        return _text_key(content)
+    if not isinstance(content, list):
+        return None
+    key = []
+    for block in content:
+        if not isinstance(block, dict):
+            key.append(None)
+            continue
+        block_type = block.get("type")
+        if block_type == "tool_use":
+            input_data = block.get("input")
+            if isinstance(input_data, dict):
+                input_text = json.dumps(input_data, ensure_ascii=False, sort_keys=True, default=str)
+                key.append((block_type, _text_key(input_text)))
+            else:
+                key.append((block_type, None))
+        else:
+            key.append((block_type, _text_key(block.get("text")), _text_key(block.get("content"))))
+    return tuple(key)
+
+
+class TokenEstimator:
+    """
+    Memoizing token counter shared by all agents
+
+    Args:
+        mode: "auto" uses tiktoken (cl100k_base) when available, "heuristic" never does
+        max_cached_messages: Number of message counts kept (LRU)
+        max_cached_texts: Number of long texts (system prompts) whose counts are kept
+    """
+
+    def __init__(self, mode: str = "auto", max_cached_messages: int = 8192, max_cached_texts: int = 64):
+        self.mode = mode
+        self.max_cached_messages = max_cached_messages
+        self.max_cached_texts = max_cached_texts
+        self._encoding = None
+        self._encoding_loaded = mode != "auto"
+        # content fingerprint -> tokens; no message references are kept
+        self._messages = OrderedDict()
+        self._texts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_encoding(self):
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.debug(f"[TokenEstimator] tiktoken unavailable, using heuristic estimation: {e}")
+        return self._encoding
+
+    def estimate_text(self, text: str, cache: bool = False) -> int:
+        """
+        Count tokens of a text
+
+        :param text: Input text
+        :param cache: Memoize the count by content, for long texts that are counted repeatedly
+        """
+        if not text:
+            return 0
+        if cache:
+            with self._lock:
+                tokens = self._texts.get(text)
+                if tokens is not None:
+                    self._texts.move_to_end(text)
+                    return tokens
+        encoding = self._get_encoding()
+        if encoding is not None:
+            tokens = len(encoding.encode_ordinary(text))
+        else:
+            tokens = heuristic_text_tokens(text)
+        if cache:
+            with self._lock:
+                self._texts[text] = tokens
+                while len(self._texts) > self.max_cached_texts:
+                    self._texts.popitem(last=False)
+        return tokens
+
+    def estimate_message(self, message: dict) -> int:
+        """
+        Count tokens of a message, plus per-block overhead for tool_use / tool_result
+        """
+        content = message.get("content", "")
+        key = _message_key(content)
+        if key is None:
+            return self._count_content(content)
+        with self._lock:
+            tokens = self._messages.get(key)
+            if tokens is not None:
+                self._messages.move_to_end(key)
+                self.hits += 1
+                return tokens
+        tokens = self._count_content(content)
+        with self._lock:
+            self.misses += 1
+            self._messages[key] = tokens
+            self._messages.move_to_end(key)
+            while len(self._messages) > self.max_cached_messages:
+                self._messages.popitem(last=False)
+        return tokens
+
+    def _count_content(self, content) -> int:
+        if isinstance(content, str):
+            return max(1, self.estimate_text(content))
+        if not isinstance(content, list):
+            return 1
+        total_tokens = 0
+        for part in content:
+            if not isinstance(part, dict):
+                continue
+            block_type = part.get("type", "")
+            if block_type == "text":
+                total_tokens += self.estimate_text(part.get("text", ""))
+            elif block_type == "image":
+                total_tokens += 1200
+            elif block_type == "tool_use":
+                # tool_use has id + name + input (JSON-encoded)
+                total_tokens += 50  # overhead for structure
+                input_data = part.get("input", {})
+                if isinstance(input_data, dict):
+                    total_tokens += self.estimate_text(json.dumps(input_data, ensure_ascii=False))
+            elif block_type == "tool_result":
+                # tool_result has tool_use_id + content
+                total_tokens += 30  # overhead for structure
+                result_content = part.get("content", "")
+                if isinstance(result_content, str):
+                    total_tokens += self.estimate_text(result_content)
+            else:
+                # Unknown block type, estimate conservatively
+                total_tokens += 10
+        return max(1, total_tokens)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tokenizer": "tiktoken" if self._encoding is not None else "heuristic",
+                "cached_messages": len(self._messages),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_estimator: Optional[TokenEstimator] = None
+_estimator_lock = threading.Lock()
+
+
+def get_token_estimator() -> TokenEstimator:
+    """Get the process-wide TokenEstimator"""
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            try:
+                from config import conf
+                mode = conf().get("agent_token_estimator", "auto")
+            except Exception:
+                mode = "auto"
+            _estimator = TokenEstimator(mode=mode)
+        return _estimator
@@ -36,6 +36,7 @@ class SkillManager:
         
         self.loader = SkillLoader(workspace_dir=workspace_dir)
         self.skills: Dict[str, SkillEntry] = {}
+        self.version = 0  # Bumped on every refresh so cached prompts can detect changes
         
         # Load skills on initialization
         self.refresh_skills()
@@ -58,6 +59,7 @@ class SkillManager:
             workspace_skills_dir=workspace_skills_dir,
             extra_dirs=self.extra_dirs,
         )
+        self.version += 1
         
         logger.debug(f"SkillManager: Loaded {len(self.skills)} skills")
     
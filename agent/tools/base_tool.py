@@ -38,6 +38,9 @@ class BaseTool:
     description: str = "Base tool"
     params: dict = {}  # Store JSON Schema
     model: Optional[Any] = None  # LLM model instance, type depends on bot implementation
+    # Read-only / idempotent tools may run in parallel with other concurrency-safe
+    # calls from the same LLM turn; stateful tools (bash, edit, write...) stay serialized
+    concurrency_safe: bool = False
 
     @classmethod
     def get_json_schema(cls) -> dict:
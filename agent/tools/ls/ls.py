@@ -17,6 +17,7 @@ class Ls(BaseTool):
     """Tool for listing directory contents"""
     
     name: str = "ls"
+    concurrency_safe: bool = True
     description: str = f"List directory contents. Returns entries sorted alphabetically, with '/' suffix for directories. Includes dotfiles. Output is truncated to {DEFAULT_LIMIT} entries or {DEFAULT_MAX_BYTES // 1024}KB (whichever is hit first)."
     
     params: dict = {
@@ -11,6 +11,7 @@ class MemoryGetTool(BaseTool):
     """Tool for reading memory file contents"""
     
     name: str = "memory_get"
+    concurrency_safe: bool = True
     description: str = (
         "Read specific content from memory files. "
         "Use this to get full context from a memory file or specific line range."
@@ -33,7 +33,7 @@ def init_scheduler(agent_bridge) -> bool:
         
         # Get workspace from config
         workspace_root = expand_path(conf().get("agent_workspace", "~/cow"))
-        store_path = os.path.join(workspace_root, "scheduler", "tasks.json")
+        store_path = os.path.join(workspace_root, "scheduler", "tasks.db")
         
         # Create task store
         _task_store = TaskStore(store_path)
@@ -61,6 +61,7 @@ def init_scheduler(agent_bridge) -> bool:
                     logger.warning(f"[Scheduler] Unknown action type: {action_type}")
             except Exception as e:
                 logger.error(f"[Scheduler] Error executing task {task.get('id')}: {e}")
+                raise
         
         # Create scheduler service
         _scheduler_service = SchedulerService(_task_store, execute_task_callback)
@@ -169,6 +170,7 @@ def _execute_agent_task(task: dict, agent_bridge):
                         logger.error(f"[Scheduler] Failed to create channel: {channel_type}")
                 except Exception as e:
                     logger.error(f"[Scheduler] Failed to send result: {e}")
+                    raise
             else:
                 logger.error(f"[Scheduler] Task {task['id']}: No result from agent execution")
                 
@@ -176,11 +178,13 @@ def _execute_agent_task(task: dict, agent_bridge):
             logger.error(f"[Scheduler] Failed to execute task via Agent: {e}")
             import traceback
             logger.error(f"[Scheduler] Traceback: {traceback.format_exc()}")
+            raise
             
     except Exception as e:
         logger.error(f"[Scheduler] Error in _execute_agent_task: {e}")
         import traceback
         logger.error(f"[Scheduler] Traceback: {traceback.format_exc()}")
+        raise
 
 
 def _execute_send_message(task: dict, agent_bridge):
@@ -257,11 +261,13 @@ def _execute_send_message(task: dict, agent_bridge):
             logger.error(f"[Scheduler] Failed to send message: {e}")
             import traceback
             logger.error(f"[Scheduler] Traceback: {traceback.format_exc()}")
+            raise
             
     except Exception as e:
         logger.error(f"[Scheduler] Error in _execute_send_message: {e}")
         import traceback
         logger.error(f"[Scheduler] Traceback: {traceback.format_exc()}")
+        raise
 
 
 def _execute_tool_call(task: dict, agent_bridge):
@@ -351,9 +357,11 @@ def _execute_tool_call(task: dict, agent_bridge):
                 logger.error(f"[Scheduler] Failed to create channel: {channel_type}")
         except Exception as e:
             logger.error(f"[Scheduler] Failed to send tool result: {e}")
+            raise
             
     except Exception as e:
         logger.error(f"[Scheduler] Error in _execute_tool_call: {e}")
+        raise
 
 
 def _execute_skill_call(task: dict, agent_bridge):
@@ -430,11 +438,13 @@ def _execute_skill_call(task: dict, agent_bridge):
             logger.error(f"[Scheduler] Failed to execute skill via Agent: {e}")
             import traceback
             logger.error(f"[Scheduler] Traceback: {traceback.format_exc()}")
+            raise
             
     except Exception as e:
         logger.error(f"[Scheduler] Error in _execute_skill_call: {e}")
         import traceback
         logger.error(f"[Scheduler] Traceback: {traceback.format_exc()}")
+        raise
 
 
 def attach_scheduler_to_tool(tool, context: Context = None):
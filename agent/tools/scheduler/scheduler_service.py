@@ -2,32 +2,84 @@
 Background scheduler service for executing scheduled tasks
 """
 
+import heapq
 import time
 import threading
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Callable, Optional
 from croniter import croniter
 from common.log import logger
+from common.worker_pool import WorkerPool
+from config import conf
+
+# Missed-run policies, applied when a run starts more than misfire_grace_seconds late
+MISFIRE_SKIP = "skip"  # drop the missed run, schedule the next one from now
+MISFIRE_COALESCE = "coalesce"  # run once for all missed runs, then schedule from now
+MISFIRE_CATCH_UP = "catch_up"  # run every missed occurrence (up to max_catch_up, beyond that coalesce)
+MISFIRE_POLICIES = (MISFIRE_SKIP, MISFIRE_COALESCE, MISFIRE_CATCH_UP)
 
 
 class SchedulerService:
     """
     Background service that executes scheduled tasks
+
+    Enabled tasks are kept in a min-heap ordered by next run time. The loop sleeps
+    until the earliest task is due and is woken early when the task store reports
+    a change. Heap entries are invalidated lazily: a popped entry is ignored unless
+    it is still the current schedule of its task.
+
+    Due tasks are dispatched to a bounded worker pool, so a slow task does not delay
+    the others. A task never runs concurrently with itself (a run that comes due
+    meanwhile starts when the current one ends) and each receiver has at most
+    max_per_user runs in flight. A run that exceeds its timeout is reported as
+    timed out, but threads cannot be killed: it keeps its worker, its in-flight
+    mark and its receiver's slot until the callback actually returns.
     """
+
+    # Upper bound of a single sleep, so wall-clock jumps (NTP, suspend) are noticed
+    MAX_SLEEP_SECONDS = 60
     
-    def __init__(self, task_store, execute_callback: Callable):
+    def __init__(self, task_store, execute_callback: Callable, max_workers: int = None, max_per_user: int = None,
+                 task_timeout: float = None, misfire_policy: str = None, misfire_grace_seconds: float = None,
+                 max_catch_up: int = None):
         """
         Initialize scheduler service
         
         Args:
             task_store: TaskStore instance
-            execute_callback: Function to call when executing a task
+            execute_callback: Function to call when executing a task, raises on failure
+            max_workers: Number of tasks executed at the same time
+            max_per_user: Number of tasks of one receiver executed at the same time
+            task_timeout: Seconds after which a run is reported as timed out, a task's own "timeout" field takes precedence
+            misfire_policy: Default missed-run policy, a task's own "misfire_policy" field takes precedence
+            misfire_grace_seconds: Lateness tolerated before a run counts as missed
+            max_catch_up: Max missed occurrences replayed by the catch_up policy
         """
         self.task_store = task_store
         self.execute_callback = execute_callback
+        self.max_workers = conf().get("scheduler_max_workers", 4) if max_workers is None else max_workers
+        self.max_per_user = conf().get("scheduler_max_concurrency_per_user", 2) if max_per_user is None else max_per_user
+        self.task_timeout = conf().get("scheduler_task_timeout", 600) if task_timeout is None else task_timeout
+        self.misfire_policy = conf().get("scheduler_misfire_policy", MISFIRE_SKIP) if misfire_policy is None else misfire_policy
+        self.misfire_grace_seconds = conf().get("scheduler_misfire_grace_seconds", 300) \
+            if misfire_grace_seconds is None else misfire_grace_seconds
+        self.max_catch_up = conf().get("scheduler_max_catch_up", 10) if max_catch_up is None else max_catch_up
+        self.pool = None
         self.running = False
         self.thread = None
         self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._heap = []  # (run_at timestamp, task_id)
+        self._scheduled = {}  # task_id -> run_at timestamp of its current heap entry
+        self._exec_lock = threading.Lock()
+        self._in_flight = {}  # task_id -> user key, for runs executing or waiting for a per-user slot
+        self._deferred = set()  # task ids that came due while in flight
+        self._user_running = {}  # user key -> number of runs executing
+        self._user_waiting = {}  # user key -> deque of (task, scheduled_at) waiting for a slot
+        self._deadlines = {}  # task_id -> (deadline timestamp, timeout) of executing runs that have a timeout
+        self._timed_out = set()  # task ids whose executing run has passed its deadline
+        self.task_store.add_listener(self._on_task_changed)
     
     def start(self):
         """Start the scheduler service"""
@@ -37,6 +89,8 @@ class SchedulerService:
                 return
             
             self.running = True
+            self.pool = WorkerPool("scheduler", max_workers=self.max_workers)
+            self._load_schedule()
             self.thread = threading.Thread(target=self._run_loop, daemon=True)
             self.thread.start()
             logger.debug("[Scheduler] Service started")
@@ -48,10 +102,85 @@ class SchedulerService:
                 return
             
             self.running = False
+            with self._cond:
+                self._cond.notify()
             if self.thread:
                 self.thread.join(timeout=5)
+            if self.pool:
+                self.pool.shutdown(wait=False)
             logger.info("[Scheduler] Service stopped")
     
+    def _load_schedule(self):
+        """Build the heap from the enabled tasks in the store"""
+        with self._cond:
+            self._heap = []
+            self._scheduled = {}
+        for task in self.task_store.list_tasks(enabled_only=True):
+            self._schedule(task)
+
+    def _schedule(self, task: dict):
+        """Push a task's next run onto the heap (replacing its previous entry)"""
+        task_id = task["id"]
+        run_at = None
+        if task.get("enabled", True):
+            next_run_str = task.get("next_run_at")
+            if next_run_str:
+                try:
+                    run_at = datetime.fromisoformat(next_run_str).timestamp()
+                except (TypeError, ValueError):
+                    logger.error(f"[Scheduler] Invalid next_run_at for task {task_id}: {next_run_str}")
+                    return
+            else:
+                # No next_run_at yet, let _dispatch calculate it right away
+                run_at = time.time()
+
+        with self._cond:
+            if run_at is None:
+                self._scheduled.pop(task_id, None)
+                return
+            if self._scheduled.get(task_id) == run_at:
+                return
+            self._scheduled[task_id] = run_at
+            heapq.heappush(self._heap, (run_at, task_id))
+            if self._heap[0][1] == task_id:
+                self._cond.notify()
+
+    def _on_task_changed(self, task_id: str, task: Optional[dict]):
+        """Task store listener: reschedule a task that was added, updated or deleted"""
+        if task is None:
+            with self._cond:
+                self._scheduled.pop(task_id, None)
+            return
+        self._schedule(task)
+
+    def _pop_due_tasks(self) -> list:
+        """Pop the ids of all tasks whose heap entry is due, skipping stale entries"""
+        now = time.time()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                run_at, task_id = heapq.heappop(self._heap)
+                if self._scheduled.get(task_id) == run_at:
+                    del self._scheduled[task_id]
+                    due.append(task_id)
+        return due
+
+    def _wait_for_next_task(self):
+        """Sleep until the earliest task is due or a run hits its deadline, a task changes or the service stops"""
+        with self._exec_lock:
+            deadline = min((d for d, _ in self._deadlines.values()), default=None)
+        with self._cond:
+            # Drop stale entries so the timeout targets a real task
+            while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            timeout = self.MAX_SLEEP_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.time()))
+            if self._heap:
+                timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+            if timeout > 0 and self.running:
+                self._cond.wait(timeout)
+
     def _run_loop(self):
         """Main scheduler loop"""
         logger.debug("[Scheduler] Scheduler loop started")
@@ -59,96 +188,220 @@ class SchedulerService:
         while self.running:
             try:
                 self._check_and_execute_tasks()
+                self._check_timeouts()
             except Exception as e:
                 logger.error(f"[Scheduler] Error in scheduler loop: {e}")
             
-            # Sleep for 30 seconds between checks
-            time.sleep(30)
+            self._wait_for_next_task()
     
     def _check_and_execute_tasks(self):
-        """Check for due tasks and execute them"""
-        now = datetime.now()
-        tasks = self.task_store.list_tasks(enabled_only=True)
-        
-        for task in tasks:
+        """Dispatch the tasks that are due according to the heap"""
+        for task_id in self._pop_due_tasks():
+            # Re-read the task, the heap only holds its id and run time
+            task = self.task_store.get_task(task_id)
+            if not task or not task.get("enabled", True):
+                continue
             try:
-                # Check if task is due
-                if self._is_task_due(task, now):
-                    logger.info(f"[Scheduler] Executing task: {task['id']} - {task['name']}")
-                    self._execute_task(task)
-                    
-                    # Update next run time
-                    next_run = self._calculate_next_run(task, now)
-                    if next_run:
-                        self.task_store.update_task(task['id'], {
-                            "next_run_at": next_run.isoformat(),
-                            "last_run_at": now.isoformat()
-                        })
-                    else:
-                        # One-time task, disable it
-                        self.task_store.update_task(task['id'], {
-                            "enabled": False,
-                            "last_run_at": now.isoformat()
-                        })
-                        logger.info(f"[Scheduler] One-time task completed and disabled: {task['id']}")
+                self._dispatch(task)
             except Exception as e:
-                logger.error(f"[Scheduler] Error processing task {task.get('id')}: {e}")
+                logger.error(f"[Scheduler] Error processing task {task_id}: {e}")
     
-    def _is_task_due(self, task: dict, now: datetime) -> bool:
+    def _misfire_policy(self, task: dict) -> str:
+        policy = task.get("misfire_policy") or self.misfire_policy
+        return policy if policy in MISFIRE_POLICIES else MISFIRE_SKIP
+    
+    def _dispatch(self, task: dict):
         """
-        Check if a task is due to run
+        Advance a due task's schedule according to its missed-run policy and submit the run
         
         Args:
-            task: Task dictionary
-            now: Current datetime
-            
-        Returns:
-            True if task should run now
+            task: Task dictionary whose next_run_at has passed
         """
+        task_id = task['id']
+        with self._exec_lock:
+            if task_id in self._in_flight:
+                # Previous run still in progress, dispatch again once it ends
+                self._deferred.add(task_id)
+                return
+            # Claim the task, so the loop and a finishing worker cannot both dispatch it
+            self._in_flight[task_id] = None
+        submitted = False
+        try:
+            submitted = self._advance_and_submit(task)
+        finally:
+            if not submitted:
+                with self._exec_lock:
+                    self._in_flight.pop(task_id, None)
+                    self._deferred.discard(task_id)
+    
+    def _advance_and_submit(self, task: dict) -> bool:
+        """Advance the schedule of a claimed task and submit its run, returns whether it was submitted"""
+        task_id = task['id']
+        now = datetime.now()
         next_run_str = task.get("next_run_at")
         if not next_run_str:
             # Calculate initial next_run_at
             next_run = self._calculate_next_run(task, now)
             if next_run:
-                self.task_store.update_task(task['id'], {
-                    "next_run_at": next_run.isoformat()
-                })
-                return False
+                self.task_store.update_task(task_id, {"next_run_at": next_run.isoformat()})
             return False
         
-        try:
-            next_run = datetime.fromisoformat(next_run_str)
-            
-            # Check if task is overdue (e.g., service restart)
-            if next_run < now:
-                time_diff = (now - next_run).total_seconds()
-                
-                # If overdue by more than 5 minutes, skip this run and schedule next
-                if time_diff > 300:  # 5 minutes
-                    logger.warning(f"[Scheduler] Task {task['id']} is overdue by {int(time_diff)}s, skipping and scheduling next run")
-                    
-                    # For one-time tasks, disable them
-                    schedule = task.get("schedule", {})
-                    if schedule.get("type") == "once":
-                        self.task_store.update_task(task['id'], {
-                            "enabled": False,
-                            "last_run_at": now.isoformat()
-                        })
-                        logger.info(f"[Scheduler] One-time task {task['id']} expired, disabled")
-                        return False
-                    
-                    # For recurring tasks, calculate next run from now
-                    next_next_run = self._calculate_next_run(task, now)
-                    if next_next_run:
-                        self.task_store.update_task(task['id'], {
-                            "next_run_at": next_next_run.isoformat()
-                        })
-                        logger.info(f"[Scheduler] Rescheduled task {task['id']} to {next_next_run}")
-                    return False
-            
-            return now >= next_run
-        except:
+        scheduled_at = datetime.fromisoformat(next_run_str)
+        if scheduled_at > now:
+            # Not due yet (e.g. clock moved back), keep it scheduled
+            self._schedule(task)
             return False
+        
+        lateness = (now - scheduled_at).total_seconds()
+        policy = self._misfire_policy(task)
+        run = True
+        base_time = now
+        if lateness > self.misfire_grace_seconds:
+            if policy == MISFIRE_SKIP:
+                run = False
+            elif policy == MISFIRE_CATCH_UP and self._count_missed(task, scheduled_at, now) <= self.max_catch_up:
+                # Schedule from the missed occurrence so the following ones come due right away
+                base_time = scheduled_at
+        
+        # Advance the schedule before running, so a crash mid-run does not repeat it
+        next_run = self._calculate_next_run(task, base_time)
+        updates = {"next_run_at": next_run.isoformat()} if next_run else {"enabled": False}
+        if not run:
+            updates["missed_count"] = task.get("missed_count", 0) + 1
+            updates["last_status"] = "skipped"
+            self.task_store.update_task(task_id, updates)
+            logger.warning(f"[Scheduler] Task {task_id} is overdue by {int(lateness)}s, skipped"
+                           + (f", next run at {next_run}" if next_run else ", one-time task disabled"))
+            return False
+        self.task_store.update_task(task_id, updates)
+        if lateness > self.misfire_grace_seconds:
+            logger.info(f"[Scheduler] Task {task_id} is overdue by {int(lateness)}s, running it ({policy})")
+        self._submit(task, scheduled_at)
+        return True
+    
+    def _count_missed(self, task: dict, scheduled_at: datetime, now: datetime) -> int:
+        """Count occurrences from scheduled_at up to now, stopping past max_catch_up"""
+        count = 0
+        run_at = scheduled_at
+        while run_at and run_at <= now and count <= self.max_catch_up:
+            count += 1
+            run_at = self._calculate_next_run(task, run_at)
+        return count
+    
+    @staticmethod
+    def _user_key(task: dict) -> str:
+        action = task.get("action", {})
+        return f"{action.get('channel_type')}:{action.get('receiver')}"
+    
+    def _submit(self, task: dict, scheduled_at: datetime):
+        """Run a task in the pool, or queue it while its receiver has max_per_user runs executing"""
+        user = self._user_key(task)
+        with self._exec_lock:
+            self._in_flight[task['id']] = user
+            if self.max_per_user > 0 and self._user_running.get(user, 0) >= self.max_per_user:
+                self._user_waiting.setdefault(user, deque()).append((task, scheduled_at))
+                logger.debug(f"[Scheduler] Task {task['id']} waiting, {user} has {self.max_per_user} tasks running")
+                return
+            self._user_running[user] = self._user_running.get(user, 0) + 1
+        self.pool.submit(self._run_task, task, scheduled_at, user)
+    
+    def _run_task(self, task: dict, scheduled_at: datetime, user: str):
+        """Worker: execute a task, record its metrics and release its slot once the callback returns"""
+        task_id = task['id']
+        try:
+            started_at = datetime.now()
+            timeout = task.get("timeout") or self.task_timeout
+            if timeout and timeout > 0:
+                with self._exec_lock:
+                    self._deadlines[task_id] = (time.time() + timeout, timeout)
+                with self._cond:
+                    self._cond.notify()  # let the loop wake up for this deadline
+            logger.info(f"[Scheduler] Executing task: {task_id} - {task.get('name')}")
+            status, error = self._execute_task(task)
+            duration = (datetime.now() - started_at).total_seconds()
+            with self._exec_lock:
+                self._deadlines.pop(task_id, None)
+                if task_id in self._timed_out:
+                    self._timed_out.discard(task_id)
+                    status = "timeout"
+                    error = f"Timed out after {timeout}s (finished after {int(duration)}s)"
+            self._record_run(task_id, status, error, started_at, duration, (started_at - scheduled_at).total_seconds())
+        except Exception as e:
+            logger.error(f"[Scheduler] Error running task {task_id}: {e}")
+        finally:
+            with self._exec_lock:
+                self._deadlines.pop(task_id, None)
+                self._timed_out.discard(task_id)
+            self._finish(task_id, user)
+    
+    def _check_timeouts(self):
+        """Report runs that passed their deadline; they keep their slots until they return"""
+        now = time.time()
+        expired = []
+        with self._exec_lock:
+            for task_id, (deadline, timeout) in self._deadlines.items():
+                if deadline <= now and task_id not in self._timed_out:
+                    self._timed_out.add(task_id)
+                    expired.append((task_id, timeout))
+        for task_id, timeout in expired:
+            logger.error(f"[Scheduler] Task {task_id} timed out after {timeout}s, still running")
+            if self.task_store.get_task(task_id):
+                self.task_store.update_task(task_id, {
+                    "last_status": "timeout",
+                    "last_error": f"Timed out after {timeout}s",
+                    "last_error_at": datetime.now().isoformat(),
+                })
+    
+    def _record_run(self, task_id: str, status: str, error: Optional[str], started_at: datetime,
+                    duration: float, lateness: float):
+        """Store the outcome, latency and lateness of a run on the task"""
+        task = self.task_store.get_task(task_id)
+        if not task:
+            return  # Deleted while running
+        updates = {
+            "last_run_at": started_at.isoformat(),
+            "last_status": status,
+            "last_duration_ms": int(duration * 1000),
+            "last_lateness_ms": int(max(0.0, lateness) * 1000),
+            "run_count": task.get("run_count", 0) + 1,
+        }
+        if error:
+            updates["failure_count"] = task.get("failure_count", 0) + 1
+            updates["last_error"] = error
+            updates["last_error_at"] = datetime.now().isoformat()
+        self.task_store.update_task(task_id, updates)
+        if not task.get("enabled", True) and task.get("schedule", {}).get("type") == "once":
+            logger.info(f"[Scheduler] One-time task completed and disabled: {task_id}")
+    
+    def _finish(self, task_id: str, user: str):
+        """Hand the receiver's slot to its next waiting run and re-dispatch a deferred task"""
+        with self._exec_lock:
+            self._in_flight.pop(task_id, None)
+            deferred = task_id in self._deferred
+            self._deferred.discard(task_id)
+            waiting = self._user_waiting.get(user)
+            next_run = waiting.popleft() if waiting else None
+            if waiting is not None and not waiting:
+                del self._user_waiting[user]
+            if next_run is None:
+                self._user_running[user] -= 1
+                if not self._user_running[user]:
+                    del self._user_running[user]
+        if next_run is not None and self.running:
+            self.pool.submit(self._run_task, next_run[0], next_run[1], user)
+        if deferred and self.running:
+            task = self.task_store.get_task(task_id)
+            if task and task.get("enabled", True):
+                self._dispatch(task)
+    
+    def stats(self) -> dict:
+        """Worker pool statistics plus the number of runs in flight and waiting for a per-user slot"""
+        with self._exec_lock:
+            in_flight = len(self._in_flight)
+            waiting = sum(len(q) for q in self._user_waiting.values())
+        stats = self.pool.stats() if self.pool else {}
+        stats.update({"in_flight": in_flight, "waiting_for_user_slot": waiting, "scheduled": len(self._scheduled)})
+        return stats
     
     def _calculate_next_run(self, task: dict, from_time: datetime) -> Optional[datetime]:
         """
@@ -201,20 +454,20 @@ class SchedulerService:
         
         return None
     
-    def _execute_task(self, task: dict):
+    def _execute_task(self, task: dict) -> tuple:
         """
-        Execute a task
+        Execute a task in the calling worker thread
         
         Args:
             task: Task dictionary
+            
+        Returns:
+            (status, error): status is "success" or "failed"
         """
         try:
             # Call the execute callback
             self.execute_callback(task)
         except Exception as e:
             logger.error(f"[Scheduler] Error executing task {task['id']}: {e}")
-            # Update task with error
-            self.task_store.update_task(task['id'], {
-                "last_error": str(e),
-                "last_error_at": datetime.now().isoformat()
-            })
+            return "failed", str(e)
+        return "success", None
@@ -4,198 +4,268 @@ Task storage management for scheduler
 
 import json
 import os
+import sqlite3
 import threading
 from datetime import datetime
-from typing import Dict, List, Optional
-from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from common.log import logger
 from common.utils import expand_path
 
 
 class TaskStore:
     """
     Manages persistent storage of scheduled tasks
+
+    Tasks are kept in a SQLite table, one row per task holding the task dict as
+    JSON plus indexed copies of `enabled` and `next_run_at`. Every change is a
+    single-row transaction and is reported to the listeners registered with
+    `add_listener`, so the scheduler can reschedule without polling.
     """
-    
+
     def __init__(self, store_path: str = None):
         """
         Initialize task store
-        
+
         Args:
-            store_path: Path to tasks.json file. Defaults to ~/cow/scheduler/tasks.json
+            store_path: Path to the tasks database. Defaults to ~/cow/scheduler/tasks.db.
+                A tasks.json path (the previous storage format) is accepted: the database is
+                created next to it and the JSON tasks are imported on first start.
         """
         if store_path is None:
-            # Default to ~/cow/scheduler/tasks.json
+            # Default to ~/cow/scheduler/tasks.db
             home = expand_path("~")
-            store_path = os.path.join(home, "cow", "scheduler", "tasks.json")
-        
+            store_path = os.path.join(home, "cow", "scheduler", "tasks.db")
+
+        if store_path.endswith(".json"):
+            self.json_path = store_path
+            store_path = os.path.join(os.path.dirname(store_path), "tasks.db")
+        else:
+            self.json_path = os.path.join(os.path.dirname(store_path), "tasks.json")
+
         self.store_path = store_path
         self.lock = threading.Lock()
+        self._listeners: List[Callable[[str, Optional[dict]], None]] = []
         self._ensure_store_dir()
-    
+        self._init_db()
+        self._migrate_json()
+
     def _ensure_store_dir(self):
         """Ensure the storage directory exists"""
         store_dir = os.path.dirname(self.store_path)
         os.makedirs(store_dir, exist_ok=True)
-    
+
+    def _init_db(self):
+        """Open the database and create the tasks table"""
+        self.conn = sqlite3.connect(self.store_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                next_run_at TEXT,
+                data TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_enabled_next_run
+            ON tasks(enabled, next_run_at)
+        """)
+        self.conn.commit()
+
+    def _migrate_json(self):
+        """Import tasks from tasks.json (previous storage format) and rename it"""
+        if not os.path.exists(self.json_path):
+            return
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                tasks = json.load(f).get("tasks", {})
+        except Exception as e:
+            logger.error(f"[Scheduler] Failed to read {self.json_path} for migration: {e}")
+            return
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (id, enabled, next_run_at, data) VALUES (?, ?, ?, ?)",
+                [self._to_row(task) for task in tasks.values() if task.get("id")]
+            )
+        os.replace(self.json_path, f"{self.json_path}.migrated")
+        logger.info(f"[Scheduler] Migrated {len(tasks)} tasks from {self.json_path} to {self.store_path}")
+
+    @staticmethod
+    def _to_row(task: dict) -> tuple:
+        return (
+            task["id"],
+            1 if task.get("enabled", True) else 0,
+            task.get("next_run_at"),
+            json.dumps(task, ensure_ascii=False)
+        )
+
+    def add_listener(self, listener: Callable[[str, Optional[dict]], None]):
+        """
+        Register a callback invoked as listener(task_id, task) after a task is added or
+        changed, and listener(task_id, None) after it is deleted
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, task_id: str, task: Optional[dict]):
+        for listener in self._listeners:
+            try:
+                listener(task_id, task)
+            except Exception as e:
+                logger.error(f"[Scheduler] Task listener error: {e}")
+
     def load_tasks(self) -> Dict[str, dict]:
         """
         Load all tasks from storage
-        
+
         Returns:
             Dictionary of task_id -> task_data
         """
         with self.lock:
-            if not os.path.exists(self.store_path):
-                return {}
-            
-            try:
-                with open(self.store_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get("tasks", {})
-            except Exception as e:
-                print(f"Error loading tasks: {e}")
-                return {}
-    
+            rows = self.conn.execute("SELECT id, data FROM tasks").fetchall()
+        return {task_id: json.loads(data) for task_id, data in rows}
+
     def save_tasks(self, tasks: Dict[str, dict]):
         """
-        Save all tasks to storage
-        
+        Replace all tasks in storage
+
         Args:
             tasks: Dictionary of task_id -> task_data
         """
-        with self.lock:
-            try:
-                # Create backup
-                if os.path.exists(self.store_path):
-                    backup_path = f"{self.store_path}.bak"
-                    try:
-                        with open(self.store_path, 'r') as src:
-                            with open(backup_path, 'w') as dst:
-                                dst.write(src.read())
-                    except:
-                        pass
-                
-                # Save tasks
-                data = {
-                    "version": 1,
-                    "updated_at": datetime.now().isoformat(),
-                    "tasks": tasks
-                }
-                
-                with open(self.store_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                print(f"Error saving tasks: {e}")
-                raise
-    
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM tasks")
+            self.conn.executemany(
+                "INSERT INTO tasks (id, enabled, next_run_at, data) VALUES (?, ?, ?, ?)",
+                [self._to_row(task) for task in tasks.values()]
+            )
+        for task_id, task in tasks.items():
+            self._notify(task_id, task)
+
     def add_task(self, task: dict) -> bool:
         """
         Add a new task
-        
+
         Args:
             task: Task data dictionary
-            
+
         Returns:
             True if successful
         """
-        tasks = self.load_tasks()
         task_id = task.get("id")
-        
+
         if not task_id:
             raise ValueError("Task must have an 'id' field")
-        
-        if task_id in tasks:
+
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO tasks (id, enabled, next_run_at, data) VALUES (?, ?, ?, ?)",
+                    self._to_row(task)
+                )
+        except sqlite3.IntegrityError:
             raise ValueError(f"Task with id '{task_id}' already exists")
-        
-        tasks[task_id] = task
-        self.save_tasks(tasks)
+
+        self._notify(task_id, task)
         return True
-    
+
     def update_task(self, task_id: str, updates: dict) -> bool:
         """
         Update an existing task
-        
+
         Args:
             task_id: Task ID
             updates: Dictionary of fields to update
-            
+
         Returns:
             True if successful
         """
-        tasks = self.load_tasks()
-        
-        if task_id not in tasks:
-            raise ValueError(f"Task '{task_id}' not found")
-        
-        # Update fields
-        tasks[task_id].update(updates)
-        tasks[task_id]["updated_at"] = datetime.now().isoformat()
-        
-        self.save_tasks(tasks)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+            if row is None:
+                raise ValueError(f"Task '{task_id}' not found")
+
+            # Update fields
+            task = json.loads(row[0])
+            task.update(updates)
+            task["updated_at"] = datetime.now().isoformat()
+
+            enabled, next_run_at, data = self._to_row(task)[1:]
+            self.conn.execute(
+                "UPDATE tasks SET enabled = ?, next_run_at = ?, data = ? WHERE id = ?",
+                (enabled, next_run_at, data, task_id)
+            )
+
+        self._notify(task_id, task)
         return True
-    
+
     def delete_task(self, task_id: str) -> bool:
         """
         Delete a task
-        
+
         Args:
             task_id: Task ID
-            
+
         Returns:
             True if successful
         """
-        tasks = self.load_tasks()
-        
-        if task_id not in tasks:
+        with self.lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+        if cursor.rowcount == 0:
             raise ValueError(f"Task '{task_id}' not found")
-        
-        del tasks[task_id]
-        self.save_tasks(tasks)
+
+        self._notify(task_id, None)
         return True
-    
+
     def get_task(self, task_id: str) -> Optional[dict]:
         """
         Get a specific task
-        
+
         Args:
             task_id: Task ID
-            
+
         Returns:
             Task data or None if not found
         """
-        tasks = self.load_tasks()
-        return tasks.get(task_id)
-    
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
     def list_tasks(self, enabled_only: bool = False) -> List[dict]:
         """
         List all tasks
-        
+
         Args:
             enabled_only: If True, only return enabled tasks
-            
+
         Returns:
-            List of task dictionaries
+            List of task dictionaries, sorted by next_run_at (tasks without one last)
         """
-        tasks = self.load_tasks()
-        task_list = list(tasks.values())
-        
+        query = "SELECT data FROM tasks"
         if enabled_only:
-            task_list = [t for t in task_list if t.get("enabled", True)]
-        
-        # Sort by next_run_at
-        task_list.sort(key=lambda t: t.get("next_run_at", float('inf')))
-        
-        return task_list
-    
+            query += " WHERE enabled = 1"
+        query += " ORDER BY next_run_at IS NULL, next_run_at"
+
+        with self.lock:
+            rows = self.conn.execute(query).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
     def enable_task(self, task_id: str, enabled: bool = True) -> bool:
         """
         Enable or disable a task
-        
+
         Args:
             task_id: Task ID
             enabled: True to enable, False to disable
-            
+
         Returns:
             True if successful
         """
         return self.update_task(task_id, {"enabled": enabled})
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
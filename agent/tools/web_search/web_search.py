@@ -23,6 +23,7 @@ class WebSearch(BaseTool):
     """Tool for searching the web using Bocha or LinkAI search API"""
 
     name: str = "web_search"
+    concurrency_safe: bool = True
     description: str = (
         "Search the web for current information, news, research topics, or any real-time data. "
         "Returns web page titles, URLs, snippets, and optional summaries. "
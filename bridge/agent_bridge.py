@@ -2,8 +2,12 @@
 Agent Bridge - Integrates Agent system with existing COW bridge
 """
 
+import hashlib
+import json
 import os
-from typing import Optional, List
+import threading
+import weakref
+from typing import Dict, Optional, List
 
 from agent.protocol import Agent, LLMModel, LLMRequest
 from bridge.agent_event_handler import AgentEventHandler
@@ -12,6 +16,7 @@ from bridge.bridge import Bridge
 from bridge.context import Context
 from bridge.reply import Reply, ReplyType
 from common import const
+from common.expired_dict import ExpiredDict
 from common.log import logger
 from common.utils import expand_path
 from models.openai_compatible_bot import OpenAICompatibleBot
@@ -183,8 +188,18 @@ class AgentBridge:
     """
     
     def __init__(self, bridge: Bridge):
+        from config import conf
         self.bridge = bridge
-        self.agents = {}  # session_id -> Agent instance mapping
+        # session_id -> Agent, evicted when idle or over the cap; history is persisted on eviction
+        self.agents = ExpiredDict(
+            conf().get("agent_session_expires_in_seconds", 3600),
+            max_size=conf().get("agent_max_sessions", 200),
+            on_evict=self._on_agent_evicted
+        )
+        self._agents_lock = threading.Lock()  # Guards _init_locks
+        self._init_locks: Dict[str, threading.Lock] = {}  # session_id -> lock held while its agent is built
+        self._default_agent_lock = threading.Lock()
+        self._evicted_agents = weakref.WeakSet()  # Evicted while still running a request
         self.default_agent = None  # For backward compatibility (no session_id)
         self.agent: Optional[Agent] = None
         self.scheduler_initialized = False
@@ -231,11 +246,13 @@ class AgentBridge:
             max_steps=kwargs.get("max_steps", 15),
             output_mode=kwargs.get("output_mode", "logger"),
             workspace_dir=kwargs.get("workspace_dir"),  # Pass workspace for skills loading
+            skill_manager=kwargs.get("skill_manager"),  # Shared SkillManager, avoids rescanning skills
             enable_skills=kwargs.get("enable_skills", True),  # Enable skills by default
             memory_manager=kwargs.get("memory_manager"),  # Pass memory manager
             max_context_tokens=kwargs.get("max_context_tokens"),
             context_reserve_tokens=kwargs.get("context_reserve_tokens"),
-            runtime_info=kwargs.get("runtime_info")  # Pass runtime_info for dynamic time updates
+            runtime_info=kwargs.get("runtime_info"),  # Pass runtime_info for dynamic time updates
+            prompt_sections=kwargs.get("prompt_sections")  # Section-cached system prompt
         )
 
         # Log skill loading details
@@ -256,15 +273,29 @@ class AgentBridge:
         """
         # If no session_id, use default agent (backward compatibility)
         if session_id is None:
-            if self.default_agent is None:
-                self._init_default_agent()
-            return self.default_agent
+            with self._default_agent_lock:
+                if self.default_agent is None:
+                    self._init_default_agent()
+                return self.default_agent
         
-        # Check if agent exists for this session
-        if session_id not in self.agents:
-            self._init_agent_for_session(session_id)
+        # Warm lookup only takes the cache's own lock
+        agent = self.agents.get(session_id)
+        if agent is not None:
+            return agent
         
-        return self.agents[session_id]
+        # Cold start: one build per session, other sessions are not blocked
+        with self._agents_lock:
+            init_lock = self._init_locks.setdefault(session_id, threading.Lock())
+        with init_lock:
+            try:
+                agent = self.agents.get(session_id)  # Built by a concurrent request
+                if agent is None:
+                    agent = self._init_agent_for_session(session_id)
+            finally:
+                with self._agents_lock:
+                    if self._init_locks.get(session_id) is init_lock:
+                        del self._init_locks[session_id]
+        return agent
     
     def _init_default_agent(self):
         """Initialize default super agent"""
@@ -274,7 +305,54 @@ class AgentBridge:
     def _init_agent_for_session(self, session_id: str):
         """Initialize agent for a specific session"""
         agent = self.initializer.initialize_agent(session_id=session_id)
+        self._restore_history(session_id, agent)
+        # ExpiredDict locks the insert itself and runs on_evict (history write) after releasing it
         self.agents[session_id] = agent
+        return agent
+    
+    @staticmethod
+    def _sessions_dir() -> str:
+        from config import conf
+        return os.path.join(expand_path(conf().get("agent_workspace", "~/cow")), "sessions")
+    
+    def _history_path(self, session_id: str) -> str:
+        name = hashlib.md5(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self._sessions_dir(), f"{name}.json")
+    
+    def _on_agent_evicted(self, session_id: str, agent: Agent):
+        """Persist the evicted agent's message history so the next request can restore it"""
+        self._evicted_agents.add(agent)
+        self._save_history(session_id, agent)
+    
+    def _save_history(self, session_id: str, agent: Agent):
+        with agent.messages_lock:
+            messages = list(agent.messages)
+        if not messages:
+            return
+        path = self._history_path(session_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"session_id": session_id, "messages": messages}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            logger.debug(f"[AgentBridge] Persisted {len(messages)} messages of evicted session {session_id}")
+        except Exception as e:
+            logger.warning(f"[AgentBridge] Failed to persist session {session_id}: {e}")
+    
+    def _restore_history(self, session_id: str, agent: Agent):
+        path = self._history_path(session_id)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with agent.messages_lock:
+                agent.messages = data.get("messages", [])
+            os.remove(path)
+            logger.info(f"[AgentBridge] Restored {len(agent.messages)} messages for session {session_id}")
+        except Exception as e:
+            logger.warning(f"[AgentBridge] Failed to restore session {session_id}: {e}")
     
     def agent_reply(self, query: str, context: Context = None, 
                    on_event=None, clear_history: bool = False) -> Reply:
@@ -339,6 +417,10 @@ class AgentBridge:
                 
                 # Log execution summary
                 event_handler.log_summary()
+                
+                # Evicted mid-run: persist again so this turn is not lost
+                if session_id is not None and agent in self._evicted_agents:
+                    self._save_history(session_id, agent)
             
             # Check if there are files to send (from read tool)
             if hasattr(agent, 'stream_executor') and hasattr(agent.stream_executor, 'files_to_send'):
@@ -482,15 +564,26 @@ class AgentBridge:
         Args:
             session_id: Session identifier to clear
         """
-        if session_id in self.agents:
+        if self.agents.pop(session_id, None) is not None:
             logger.info(f"[AgentBridge] Clearing session: {session_id}")
-            del self.agents[session_id]
+        try:
+            os.remove(self._history_path(session_id))
+        except FileNotFoundError:
+            pass
     
     def clear_all_sessions(self):
         """Clear all agent sessions"""
         logger.info(f"[AgentBridge] Clearing all sessions ({len(self.agents)} total)")
         self.agents.clear()
         self.default_agent = None
+        self.initializer.invalidate_system_prompt()
+        
+        # Drop persisted histories of evicted sessions as well
+        sessions_dir = self._sessions_dir()
+        if os.path.isdir(sessions_dir):
+            for name in os.listdir(sessions_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(sessions_dir, name))
     
     def refresh_all_skills(self) -> int:
         """
@@ -513,6 +606,9 @@ class AgentBridge:
             logger.info(f"[AgentBridge] Reloaded environment variables from {env_file}")
 
         refreshed_count = 0
+        
+        # Skill sections re-render via SkillManager.version, context files reload when they change
+        self.initializer.invalidate_system_prompt()
 
         # Collect all agent instances to refresh
         agents_to_refresh = []
@@ -26,6 +26,9 @@ class AgentEventHandler:
         if context:
             self.channel = context.kwargs.get("channel") if hasattr(context, "kwargs") else None
         
+        # Streaming reply for channels that can update messages (None = send complete messages)
+        self.reply_stream = context.get("reply_stream") if context else None
+        
         # Track current thinking for channel output
         self.current_thinking = ""
         self.turn_number = 0
@@ -66,6 +69,8 @@ class AgentEventHandler:
         """Handle message update event (streaming text)"""
         delta = data.get("delta", "")
         self.current_thinking += delta
+        if self.reply_stream:
+            self.reply_stream.feed(delta)
     
     def _handle_message_end(self, data):
         """Handle message end event"""
@@ -75,10 +80,12 @@ class AgentEventHandler:
         if tool_calls:
             if self.current_thinking.strip():
                 logger.debug(f"💭 {self.current_thinking.strip()[:200]}{'...' if len(self.current_thinking) > 200 else ''}")
-                # Send thinking process to channel
-                self._send_to_channel(f"{self.current_thinking.strip()}")
+                # Send thinking process to channel (already shown if streaming, just finalize it)
+                if not (self.reply_stream and self.reply_stream.finish(self.current_thinking.strip())):
+                    self._send_to_channel(f"{self.current_thinking.strip()}")
         else:
-            # No tool calls = final response (logged at agent_stream level)
+            # No tool calls = final response (logged at agent_stream level).
+            # A streamed final response stays open until the channel sends the decorated reply.
             if self.current_thinking.strip():
                 logger.debug(f"💬 {self.current_thinking.strip()[:200]}{'...' if len(self.current_thinking) > 200 else ''}")
         
@@ -5,6 +5,7 @@ Agent Initializer - Handles agent initialization logic
 import os
 import asyncio
 import datetime
+import threading
 import time
 from typing import Optional, List
 
@@ -33,69 +34,35 @@ class AgentInitializer:
         """
         self.bridge = bridge
         self.agent_bridge = agent_bridge
+        self._shared = None
+        self._shared_lock = threading.Lock()
     
     def initialize_agent(self, session_id: Optional[str] = None) -> Agent:
         """
         Initialize agent for a session
         
+        Workspace setup, memory storage, skills and the system prompt are built once
+        per process (see _get_shared_components); each session only gets its own
+        tool instances and message history.
+        
         Args:
             session_id: Session ID (None for default agent)
         
         Returns:
             Initialized agent instance
         """
-        from config import conf
-        
-        # Get workspace from config
-        workspace_root = expand_path(conf().get("agent_workspace", "~/cow"))
-        
-        # Migrate API keys
-        self._migrate_config_to_env(workspace_root)
-        
-        # Load environment variables
-        self._load_env_file()
-        
-        # Initialize workspace
-        from agent.prompt import ensure_workspace, load_context_files, PromptBuilder
-        workspace_files = ensure_workspace(workspace_root, create_templates=True)
+        shared = self._get_shared_components(session_id)
+        workspace_root = shared["workspace_root"]
+        memory_manager = shared["memory_manager"]
         
-        if session_id is None:
-            logger.info(f"[AgentInitializer] Workspace initialized at: {workspace_root}")
-        
-        # Setup memory system
-        memory_manager, memory_tools = self._setup_memory_system(workspace_root, session_id)
-        
-        # Load tools
+        # Tool instances carry per-call context, so every session gets its own
+        memory_tools = self._create_memory_tools(memory_manager)
         tools = self._load_tools(workspace_root, memory_manager, memory_tools, session_id)
         
         # Initialize scheduler if needed
         self._initialize_scheduler(tools, session_id)
         
-        # Load context files
-        context_files = load_context_files(workspace_root)
-        
-        # Initialize skill manager
-        skill_manager = self._initialize_skill_manager(workspace_root, session_id)
-        
-        # Check if first conversation
-        from agent.prompt.workspace import is_first_conversation, mark_conversation_started
-        is_first = is_first_conversation(workspace_root)
-        
-        # Build system prompt
-        prompt_builder = PromptBuilder(workspace_dir=workspace_root, language="zh")
-        runtime_info = self._get_runtime_info(workspace_root)
-        
-        system_prompt = prompt_builder.build(
-            tools=tools,
-            context_files=context_files,
-            skill_manager=skill_manager,
-            memory_manager=memory_manager,
-            runtime_info=runtime_info,
-            is_first_conversation=is_first
-        )
-        
-        if is_first:
-            mark_conversation_started(workspace_root)
+        prompt_sections = self._get_prompt_sections(shared)
         
         # Get cost control parameters
         from config import conf
@@ -104,15 +71,16 @@ class AgentInitializer:
         
         # Create agent
         agent = self.agent_bridge.create_agent(
-            system_prompt=system_prompt,
+            system_prompt=prompt_sections.render(tools),
+            prompt_sections=prompt_sections,
             tools=tools,
             max_steps=max_steps,
             output_mode="logger",
             workspace_dir=workspace_root,
-            skill_manager=skill_manager,
+            skill_manager=shared["skill_manager"],
             enable_skills=True,
             max_context_tokens=max_context_tokens,
-            runtime_info=runtime_info  # Pass runtime_info for dynamic time updates
+            runtime_info=shared["runtime_info"]  # Pass runtime_info for dynamic time updates
         )
         
         # Attach memory manager
@@ -121,6 +89,80 @@ class AgentInitializer:
         
         return agent
     
+    def _get_shared_components(self, session_id: Optional[str] = None) -> dict:
+        """
+        Build the process-wide components once: workspace, .env, memory storage,
+        parsed skills and runtime info
+        """
+        with self._shared_lock:
+            if self._shared is not None:
+                return self._shared
+            
+            from config import conf
+            
+            # Get workspace from config
+            workspace_root = expand_path(conf().get("agent_workspace", "~/cow"))
+            
+            # Migrate API keys
+            self._migrate_config_to_env(workspace_root)
+            
+            # Load environment variables
+            self._load_env_file()
+            
+            # Initialize workspace
+            from agent.prompt import ensure_workspace
+            ensure_workspace(workspace_root, create_templates=True)
+            logger.info(f"[AgentInitializer] Workspace initialized at: {workspace_root}")
+            
+            self._shared = {
+                "workspace_root": workspace_root,
+                "memory_manager": self._setup_memory_system(workspace_root, session_id),
+                "skill_manager": self._initialize_skill_manager(workspace_root, session_id),
+                "runtime_info": self._get_runtime_info(workspace_root),
+                "prompt_sections": None,  # Section-cached system prompt template, shared by all sessions
+            }
+            return self._shared
+    
+    def _get_prompt_sections(self, shared: dict):
+        """
+        Get the section-cached system prompt, shared once the workspace is past its first conversation.
+        Only the template is shared: context files (AGENT.md, USER.md, RULE.md) are read from the
+        workspace and reloaded when they change, since the agent edits them itself. Sections
+        re-render on their own when tools, skills, context files or the current minute change.
+        """
+        with self._shared_lock:
+            if shared["prompt_sections"] is not None:
+                return shared["prompt_sections"]
+            
+            from agent.prompt import PromptBuilder
+            from agent.prompt.workspace import is_first_conversation, mark_conversation_started
+            workspace_root = shared["workspace_root"]
+            
+            # Check if first conversation
+            is_first = is_first_conversation(workspace_root)
+            
+            # Build system prompt
+            prompt_builder = PromptBuilder(workspace_dir=workspace_root, language="zh")
+            prompt_sections = prompt_builder.build_sections(
+                skill_manager=shared["skill_manager"],
+                memory_manager=shared["memory_manager"],
+                runtime_info=shared["runtime_info"],
+                is_first_conversation=is_first
+            )
+            
+            if is_first:
+                # The onboarding prompt is only for this session; later sessions rebuild
+                mark_conversation_started(workspace_root)
+            else:
+                shared["prompt_sections"] = prompt_sections
+            return prompt_sections
+    
+    def invalidate_system_prompt(self):
+        """Rebuild the cached system prompt template for the next new session (e.g. after a session reset)"""
+        with self._shared_lock:
+            if self._shared is not None:
+                self._shared["prompt_sections"] = None
+    
     def _load_env_file(self):
         """Load environment variables from .env file"""
         env_file = expand_path("~/.cow/.env")
@@ -138,20 +180,20 @@ class AgentInitializer:
         Setup memory system
         
         Returns:
-            (memory_manager, memory_tools) tuple
+            Shared MemoryManager, or None if unavailable
         """
         memory_manager = None
-        memory_tools = []
         
         try:
             from agent.memory import MemoryManager, MemoryConfig, create_embedding_provider
-            from agent.tools import MemorySearchTool, MemoryGetTool
             from config import conf
             
             # Get OpenAI config
             openai_api_key = conf().get("open_ai_api_key", "")
             openai_api_base = conf().get("open_ai_api_base", "")
             
+            memory_config = MemoryConfig(workspace_root=workspace_root)
+            
             # Initialize embedding provider
             embedding_provider = None
             if openai_api_key and openai_api_key not in ["", "YOUR API KEY", "YOUR_API_KEY"]:
@@ -160,7 +202,9 @@ class AgentInitializer:
                         provider="openai",
                         model="text-embedding-3-small",
                         api_key=openai_api_key,
-                        api_base=openai_api_base or "https://api.openai.com/v1"
+                        api_base=openai_api_base or "https://api.openai.com/v1",
+                        max_batch_tokens=memory_config.embedding_batch_tokens,
+                        max_concurrency=memory_config.embedding_concurrency
                     )
                     if session_id is None:
                         logger.info("[AgentInitializer] OpenAI embedding initialized")
@@ -168,25 +212,27 @@ class AgentInitializer:
                     logger.warning(f"[AgentInitializer] OpenAI embedding failed: {e}")
             
             # Create memory manager
-            memory_config = MemoryConfig(workspace_root=workspace_root)
             memory_manager = MemoryManager(memory_config, embedding_provider=embedding_provider)
             
             # Sync memory
             self._sync_memory(memory_manager, session_id)
             
-            # Create memory tools
-            memory_tools = [
-                MemorySearchTool(memory_manager),
-                MemoryGetTool(memory_manager)
-            ]
-            
-            if session_id is None:
-                logger.info("[AgentInitializer] Memory system initialized")
+            logger.info("[AgentInitializer] Memory system initialized")
         
         except Exception as e:
             logger.warning(f"[AgentInitializer] Memory system not available: {e}")
         
-        return memory_manager, memory_tools
+        return memory_manager
+    
+    def _create_memory_tools(self, memory_manager) -> List:
+        """Create memory tools bound to the shared memory manager"""
+        if not memory_manager:
+            return []
+        from agent.tools import MemorySearchTool, MemoryGetTool
+        return [
+            MemorySearchTool(memory_manager),
+            MemoryGetTool(memory_manager)
+        ]
     
     def _sync_memory(self, memory_manager, session_id: Optional[str] = None):
         """Sync memory database"""
@@ -209,7 +255,9 @@ class AgentInitializer:
     def _load_tools(self, workspace_root: str, memory_manager, memory_tools: List, session_id: Optional[str] = None):
         """Load all tools"""
         tool_manager = ToolManager()
-        tool_manager.load_tools()
+        if not tool_manager.tool_classes:
+            # Tool classes are process-wide; only scan them once
+            tool_manager.load_tools()
         
         tools = []
         file_config = {
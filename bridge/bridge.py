@@ -3,6 +3,7 @@ from bridge.context import Context
 from bridge.reply import Reply
 from common import const
 from common.log import logger
+from common.async_loop import run_sync
 from common.singleton import singleton
 from config import conf
 from translate.factory import create_translator
@@ -94,6 +95,9 @@ class Bridge(object):
     def fetch_reply_content(self, query, context: Context) -> Reply:
         return self.get_bot("chat").reply(query, context)
 
+    async def fetch_reply_content_async(self, query, context: Context) -> Reply:
+        return await self.get_bot("chat").reply_async(query, context)
+
     def fetch_voice_to_text(self, voiceFile) -> Reply:
         return self.get_bot("voice_to_text").voiceToText(voiceFile)
 
@@ -139,3 +143,10 @@ class Bridge(object):
         """
         agent_bridge = self.get_agent_bridge()
         return agent_bridge.agent_reply(query, context, on_event, clear_history)
+
+    async def fetch_agent_reply_async(self, query: str, context: Context = None,
+                                      on_event=None, clear_history: bool = False) -> Reply:
+        """
+        Async variant of fetch_agent_reply, the agent runs in the fallback thread pool
+        """
+        return await run_sync(self.fetch_agent_reply, query, context, on_event, clear_history)
@@ -5,6 +5,7 @@ Message sending channel abstract class
 from bridge.bridge import Bridge
 from bridge.context import Context
 from bridge.reply import *
+from common.async_loop import run_sync
 from common.log import logger
 from config import conf
 
@@ -36,6 +37,28 @@ class Channel(object):
         """
         raise NotImplementedError
 
+    async def send_async(self, reply: Reply, context: Context):
+        """
+        async_mode下的发送函数，原生支持asyncio的Channel可重写此方法，默认在线程池中执行send
+        """
+        return await run_sync(self.send, reply, context)
+
+    def supports_stream(self, context: Context) -> bool:
+        """
+        是否支持流式回复（先发出消息，再随模型输出不断更新），支持的Channel需同时重写update_message
+        """
+        return False
+
+    def update_message(self, context: Context, handle, content: str, final: bool = False):
+        """
+        流式回复的发送函数：handle为None时发送一条新消息，否则把该消息更新为最新的完整内容
+        :param handle: 上次调用返回的消息标识
+        :param content: 截至目前的完整文本
+        :param final: 是否为该消息的最终内容
+        :return: 消息标识(不能为None)，供后续更新使用
+        """
+        raise NotImplementedError
+
     def build_reply_content(self, query, context: Context = None) -> Reply:
         """
         Build reply content, using agent if enabled in config
@@ -66,6 +89,25 @@ class Channel(object):
             # Normal mode
             return Bridge().fetch_reply_content(query, context)
 
+    async def build_reply_content_async(self, query, context: Context = None) -> Reply:
+        """
+        Async variant of build_reply_content
+        """
+        if conf().get("agent", False):
+            try:
+                logger.info("[Channel] Using agent mode")
+                if context and "channel_type" not in context:
+                    context["channel_type"] = self.channel_type
+                return await Bridge().fetch_agent_reply_async(
+                    query=query,
+                    context=context,
+                    on_event=None,
+                    clear_history=False
+                )
+            except Exception as e:
+                logger.error(f"[Channel] Agent mode failed, fallback to normal mode: {e}")
+        return await Bridge().fetch_reply_content_async(query, context)
+
     def build_voice_to_text(self, voice_file) -> Reply:
         return Bridge().fetch_voice_to_text(voice_file)
 
@@ -1,15 +1,20 @@
+import asyncio
+import functools
 import os
 import re
 import threading
 import time
-from asyncio import CancelledError
-from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 
 from bridge.context import *
 from bridge.reply import *
 from channel.channel import Channel
+from common import async_loop
+from common.async_loop import run_sync
 from common.dequeue import Dequeue
 from common import memory
+from common.trigger_matcher import KeywordMatcher, PrefixMatcher
+from common.worker_pool import PoolBusyError, WorkerPool
 from plugins import *
 
 try:
@@ -17,7 +22,102 @@ try:
 except Exception as e:
     pass
 
-handler_pool = ThreadPoolExecutor(max_workers=8)  # 处理消息的线程池
+handler_pools = {}  # 处理消息的线程池，按text/media/agent划分，避免慢任务占满线程，首次使用时根据配置创建
+handler_pools_lock = threading.Lock()
+handler_pool_initializer = None  # 线程池工作线程的初始化函数，需在首次提交任务前设置
+busy_reply_pool = ThreadPoolExecutor(max_workers=1)  # 发送繁忙提示的线程池，避免阻塞consume线程
+
+
+def get_handler_pool(name) -> WorkerPool:
+    with handler_pools_lock:
+        pool = handler_pools.get(name)
+        if pool is None:
+            size_key = "handler_pool_size" if name == "text" else f"handler_pool_{name}_size"
+            pool = WorkerPool(
+                name,
+                max_workers=conf().get(size_key, 4 if name == "media" else 8),
+                max_queue=conf().get("handler_pool_max_queue", 0),
+                policy=conf().get("handler_pool_reject_policy", "reject"),
+                initializer=handler_pool_initializer,
+            )
+            handler_pools[name] = pool
+        return pool
+
+
+def handler_pool_stats() -> list:
+    with handler_pools_lock:
+        pools = list(handler_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+class TriggerTable:
+    """
+    由配置预编译的消息触发规则：名单转为集合，前缀转为字典树，关键词转为正则
+    """
+
+    # 构建触发规则用到的配置项
+    CONFIG_KEYS = (
+        "group_name_white_list", "group_name_keyword_white_list", "group_shared_session", "group_chat_in_one_session",
+        "trigger_by_self", "nick_name_black_list", "group_chat_prefix", "group_chat_keyword", "group_at_off",
+        "single_chat_prefix", "image_create_prefix", "always_reply_voice", "voice_reply_voice",
+    )
+
+    @classmethod
+    def config_values(cls, config) -> list:
+        """相关配置项的当前取值，每条消息都会调用，直接读dict，跳过Config.get对缺失key的异常处理"""
+        return [dict.get(config, key) for key in cls.CONFIG_KEYS]
+
+    def __init__(self, config):
+        group_name_white_list = config.get("group_name_white_list", []) or []
+        self.all_groups = "ALL_GROUP" in group_name_white_list
+        self.group_names = frozenset(group_name_white_list)
+        self.group_name_keywords = KeywordMatcher(config.get("group_name_keyword_white_list", []))
+        self.group_shared_session = config.get("group_shared_session", True)
+        group_chat_in_one_session = config.get("group_chat_in_one_session", []) or []
+        self.all_groups_in_one_session = "ALL_GROUP" in group_chat_in_one_session
+        self.groups_in_one_session = frozenset(group_chat_in_one_session)
+        self.trigger_by_self = config.get("trigger_by_self", True)
+        self.nick_name_black_list = frozenset(config.get("nick_name_black_list", []) or [])
+        self.group_chat_prefix = PrefixMatcher(config.get("group_chat_prefix"))
+        self.group_chat_keyword = KeywordMatcher(config.get("group_chat_keyword"))
+        self.group_at_off = config.get("group_at_off", False)
+        self.single_chat_prefix = PrefixMatcher(config.get("single_chat_prefix", [""]))
+        self.image_create_prefix = PrefixMatcher(config.get("image_create_prefix", [""]))
+        self.always_reply_voice = config.get("always_reply_voice")
+        self.voice_reply_voice = config.get("voice_reply_voice")
+
+    def group_allowed(self, group_name) -> bool:
+        return self.all_groups or group_name in self.group_names or self.group_name_keywords.contains(group_name)
+
+    def group_in_one_session(self, group_name) -> bool:
+        return self.all_groups_in_one_session or group_name in self.groups_in_one_session
+
+
+_trigger_table = None
+_trigger_config_snapshot = None  # 构建_trigger_table时相关配置项的取值，列表为副本
+
+
+def get_trigger_table() -> TriggerTable:
+    """
+    获取当前配置对应的触发规则，仅在相关配置项的取值变化后重建
+    """
+    global _trigger_table, _trigger_config_snapshot
+    # 按取值比较，配置重新加载、赋值或列表被原地修改都会触发重建
+    values = TriggerTable.config_values(conf())
+    if _trigger_table is None or values != _trigger_config_snapshot:
+        _trigger_table = TriggerTable(conf())
+        _trigger_config_snapshot = [list(v) if isinstance(v, list) else v for v in values]
+    return _trigger_table
+
+
+@functools.lru_cache(maxsize=1024)
+def _at_pattern(name):
+    return re.compile(f"@{re.escape(name)}(\u2005|\u0020)")
+
+
+def remove_at(content, name):
+    """移除消息中 @name 加空格 的部分"""
+    return _at_pattern(name).sub("", content)
 
 
 # 抽象类, 它包含了与消息通道无关的通用处理逻辑
@@ -26,7 +126,8 @@ class ChatChannel(Channel):
     user_id = None  # 登录的用户id
     futures = {}  # 记录每个session_id提交到线程池的future对象, 用于重置会话时把没执行的future取消掉，正在执行的不会被取消
     sessions = {}  # 用于控制并发，每个session_id同时只能有一个context在处理
-    lock = threading.Lock()  # 用于控制对sessions的访问
+    lock = threading.RLock()  # 用于控制对sessions的访问，取消future时回调会在持锁线程中同步执行，因此需要可重入
+    ready_sessions = Dequeue()  # 就绪队列：有新消息或刚释放信号量的session_id，consume线程阻塞等待，无需轮询
 
     def __init__(self):
         _thread = threading.Thread(target=self.consume)
@@ -45,54 +146,36 @@ class ChatChannel(Channel):
         # context首次传入时，receiver是None，根据类型设置receiver
         first_in = "receiver" not in context
         # 群名匹配过程，设置session_id和receiver
+        triggers = get_trigger_table()
         if first_in:  # context首次传入时，receiver是None，根据类型设置receiver
-            config = conf()
             cmsg = context["msg"]
-            user_data = conf().get_user_data(cmsg.from_user_id)
-            context["openai_api_key"] = user_data.get("openai_api_key")
-            context["gpt_model"] = user_data.get("gpt_model")
             if context.get("isgroup", False):
                 group_name = cmsg.other_user_nickname
                 group_id = cmsg.other_user_id
-
-                group_name_white_list = config.get("group_name_white_list", [])
-                group_name_keyword_white_list = config.get("group_name_keyword_white_list", [])
-                if any(
-                    [
-                        group_name in group_name_white_list,
-                        "ALL_GROUP" in group_name_white_list,
-                        check_contain(group_name, group_name_keyword_white_list),
-                    ]
-                ):
-                    # Check global group_shared_session config first
-                    group_shared_session = conf().get("group_shared_session", True)
-                    if group_shared_session:
-                        # All users in the group share the same session
-                        session_id = group_id
-                    else:
-                        # Check group-specific whitelist (legacy behavior)
-                        group_chat_in_one_session = conf().get("group_chat_in_one_session", [])
-                        session_id = cmsg.actual_user_id
-                        if any(
-                            [
-                                group_name in group_chat_in_one_session,
-                                "ALL_GROUP" in group_chat_in_one_session,
-                            ]
-                        ):
-                            session_id = group_id
-                else:
+                if not triggers.group_allowed(group_name):
                     logger.debug(f"No need reply, groupName not in whitelist, group_name={group_name}")
                     return None
+                if triggers.group_shared_session:
+                    # All users in the group share the same session
+                    session_id = group_id
+                elif triggers.group_in_one_session(group_name):
+                    # Check group-specific whitelist (legacy behavior)
+                    session_id = group_id
+                else:
+                    session_id = cmsg.actual_user_id
                 context["session_id"] = session_id
                 context["receiver"] = group_id
             else:
                 context["session_id"] = cmsg.other_user_id
                 context["receiver"] = cmsg.other_user_id
+            user_data = conf().get_user_data(cmsg.from_user_id)
+            context["openai_api_key"] = user_data.get("openai_api_key")
+            context["gpt_model"] = user_data.get("gpt_model")
             e_context = PluginManager().emit_event(EventContext(Event.ON_RECEIVE_MESSAGE, {"channel": self, "context": context}))
             context = e_context["context"]
             if e_context.is_pass() or context is None:
                 return context
-            if cmsg.from_user_id == self.user_id and not config.get("trigger_by_self", True):
+            if cmsg.from_user_id == self.user_id and not triggers.trigger_by_self:
                 logger.debug("[chat_channel]self message skipped")
                 return None
 
@@ -103,38 +186,34 @@ class ChatChannel(Channel):
                 logger.debug("[chat_channel]reference query skipped")
                 return None
 
-            nick_name_black_list = conf().get("nick_name_black_list", [])
             if context.get("isgroup", False):  # 群聊
-                # 校验关键字
-                match_prefix = check_prefix(content, conf().get("group_chat_prefix"))
-                match_contain = check_contain(content, conf().get("group_chat_keyword"))
                 flag = False
-                if context["msg"].to_user_id != context["msg"].actual_user_id:
-                    if match_prefix is not None or match_contain is not None:
+                msg = context["msg"]
+                if msg.to_user_id != msg.actual_user_id:
+                    # 校验关键字
+                    match_prefix = triggers.group_chat_prefix.match(content)
+                    if match_prefix is not None or triggers.group_chat_keyword.contains(content):
                         flag = True
                         if match_prefix:
                             content = content.replace(match_prefix, "", 1).strip()
-                    if context["msg"].is_at:
-                        nick_name = context["msg"].actual_user_nickname
-                        if nick_name and nick_name in nick_name_black_list:
+                    if msg.is_at:
+                        nick_name = msg.actual_user_nickname
+                        if nick_name and nick_name in triggers.nick_name_black_list:
                             # 黑名单过滤
                             logger.warning(f"[chat_channel] Nickname {nick_name} in In BlackList, ignore")
                             return None
 
                         logger.info("[chat_channel]receive group at")
-                        if not conf().get("group_at_off", False):
+                        if not triggers.group_at_off:
                             flag = True
                         self.name = self.name if self.name is not None else ""  # 部分渠道self.name可能没有赋值
-                        pattern = f"@{re.escape(self.name)}(\u2005|\u0020)"
-                        subtract_res = re.sub(pattern, r"", content)
-                        if isinstance(context["msg"].at_list, list):
-                            for at in context["msg"].at_list:
-                                pattern = f"@{re.escape(at)}(\u2005|\u0020)"
-                                subtract_res = re.sub(pattern, r"", subtract_res)
-                        if subtract_res == content and context["msg"].self_display_name:
+                        subtract_res = remove_at(content, self.name)
+                        if isinstance(msg.at_list, list):
+                            for at in msg.at_list:
+                                subtract_res = remove_at(subtract_res, at)
+                        if subtract_res == content and msg.self_display_name:
                             # 前缀移除后没有变化，使用群昵称再次移除
-                            pattern = f"@{re.escape(context['msg'].self_display_name)}(\u2005|\u0020)"
-                            subtract_res = re.sub(pattern, r"", content)
+                            subtract_res = remove_at(content, msg.self_display_name)
                         content = subtract_res
                 if not flag:
                     if context["origin_ctype"] == ContextType.VOICE:
@@ -142,12 +221,12 @@ class ChatChannel(Channel):
                     return None
             else:  # 单聊
                 nick_name = context["msg"].from_user_nickname
-                if nick_name and nick_name in nick_name_black_list:
+                if nick_name and nick_name in triggers.nick_name_black_list:
                     # 黑名单过滤
                     logger.warning(f"[chat_channel] Nickname '{nick_name}' in In BlackList, ignore")
                     return None
 
-                match_prefix = check_prefix(content, conf().get("single_chat_prefix", [""]))
+                match_prefix = triggers.single_chat_prefix.match(content)
                 if match_prefix is not None:  # 判断如果匹配到自定义前缀，则返回过滤掉前缀+空格后的内容
                     content = content.replace(match_prefix, "", 1).strip()
                 elif context["origin_ctype"] == ContextType.VOICE:  # 如果源消息是私聊的语音消息，允许不匹配前缀，放宽条件
@@ -156,17 +235,17 @@ class ChatChannel(Channel):
                     logger.info("[chat_channel]receive single chat msg, but checkprefix didn't match")
                     return None
             content = content.strip()
-            img_match_prefix = check_prefix(content, conf().get("image_create_prefix",[""]))
+            img_match_prefix = triggers.image_create_prefix.match(content)
             if img_match_prefix:
                 content = content.replace(img_match_prefix, "", 1)
                 context.type = ContextType.IMAGE_CREATE
             else:
                 context.type = ContextType.TEXT
             context.content = content.strip()
-            if "desire_rtype" not in context and conf().get("always_reply_voice") and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
+            if "desire_rtype" not in context and triggers.always_reply_voice and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
                 context["desire_rtype"] = ReplyType.VOICE
         elif context.type == ContextType.VOICE:
-            if "desire_rtype" not in context and conf().get("voice_reply_voice") and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
+            if "desire_rtype" not in context and triggers.voice_reply_voice and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
                 context["desire_rtype"] = ReplyType.VOICE
         return context
 
@@ -185,6 +264,7 @@ class ChatChannel(Channel):
 
             # reply的发送步骤
             self._send_reply(context, reply)
+        self._finish_reply_stream(context)
 
     def _generate_reply(self, context: Context, reply: Reply = Reply()) -> Reply:
         e_context = PluginManager().emit_event(
@@ -198,6 +278,7 @@ class ChatChannel(Channel):
             logger.debug("[chat_channel] type={}, content={}".format(context.type, context.content))
             if context.type == ContextType.TEXT or context.type == ContextType.IMAGE_CREATE:  # 文字和图片消息
                 context["channel"] = e_context["channel"]
+                self._attach_reply_stream(context)
                 reply = super().build_reply_content(context.content, context)
             elif context.type == ContextType.VOICE:  # 语音消息
                 cmsg = context["msg"]
@@ -248,36 +329,39 @@ class ChatChannel(Channel):
                     {"channel": self, "context": context, "reply": reply},
                 )
             )
-            reply = e_context["reply"]
-            desire_rtype = context.get("desire_rtype")
-            if not e_context.is_pass() and reply and reply.type:
-                if reply.type in self.NOT_SUPPORT_REPLYTYPE:
-                    logger.error("[chat_channel]reply type not support: " + str(reply.type))
-                    reply.type = ReplyType.ERROR
-                    reply.content = "不支持发送的消息类型: " + str(reply.type)
+            return self._apply_decoration(context, e_context)
 
-                if reply.type == ReplyType.TEXT:
-                    reply_text = reply.content
-                    if desire_rtype == ReplyType.VOICE and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
-                        reply = super().build_text_to_voice(reply.content)
-                        return self._decorate_reply(context, reply)
-                    if context.get("isgroup", False):
-                        if not context.get("no_need_at", False):
-                            reply_text = "@" + context["msg"].actual_user_nickname + "\n" + reply_text.strip()
-                        reply_text = conf().get("group_chat_reply_prefix", "") + reply_text + conf().get("group_chat_reply_suffix", "")
-                    else:
-                        reply_text = conf().get("single_chat_reply_prefix", "") + reply_text + conf().get("single_chat_reply_suffix", "")
-                    reply.content = reply_text
-                elif reply.type == ReplyType.ERROR or reply.type == ReplyType.INFO:
-                    reply.content = "[" + str(reply.type) + "]\n" + reply.content
-                elif reply.type == ReplyType.IMAGE_URL or reply.type == ReplyType.VOICE or reply.type == ReplyType.IMAGE or reply.type == ReplyType.FILE or reply.type == ReplyType.VIDEO or reply.type == ReplyType.VIDEO_URL:
-                    pass
+    def _apply_decoration(self, context: Context, e_context: EventContext) -> Reply:
+        reply = e_context["reply"]
+        desire_rtype = context.get("desire_rtype")
+        if not e_context.is_pass() and reply and reply.type:
+            if reply.type in self.NOT_SUPPORT_REPLYTYPE:
+                logger.error("[chat_channel]reply type not support: " + str(reply.type))
+                reply.type = ReplyType.ERROR
+                reply.content = "不支持发送的消息类型: " + str(reply.type)
+
+            if reply.type == ReplyType.TEXT:
+                reply_text = reply.content
+                if desire_rtype == ReplyType.VOICE and ReplyType.VOICE not in self.NOT_SUPPORT_REPLYTYPE:
+                    reply = super().build_text_to_voice(reply.content)
+                    return self._decorate_reply(context, reply)
+                if context.get("isgroup", False):
+                    if not context.get("no_need_at", False):
+                        reply_text = "@" + context["msg"].actual_user_nickname + "\n" + reply_text.strip()
+                    reply_text = conf().get("group_chat_reply_prefix", "") + reply_text + conf().get("group_chat_reply_suffix", "")
                 else:
-                    logger.error("[chat_channel] unknown reply type: {}".format(reply.type))
-                    return
-            if desire_rtype and desire_rtype != reply.type and reply.type not in [ReplyType.ERROR, ReplyType.INFO]:
-                logger.warning("[chat_channel] desire_rtype: {}, but reply type: {}".format(context.get("desire_rtype"), reply.type))
-            return reply
+                    reply_text = conf().get("single_chat_reply_prefix", "") + reply_text + conf().get("single_chat_reply_suffix", "")
+                reply.content = reply_text
+            elif reply.type == ReplyType.ERROR or reply.type == ReplyType.INFO:
+                reply.content = "[" + str(reply.type) + "]\n" + reply.content
+            elif reply.type == ReplyType.IMAGE_URL or reply.type == ReplyType.VOICE or reply.type == ReplyType.IMAGE or reply.type == ReplyType.FILE or reply.type == ReplyType.VIDEO or reply.type == ReplyType.VIDEO_URL:
+                pass
+            else:
+                logger.error("[chat_channel] unknown reply type: {}".format(reply.type))
+                return
+        if desire_rtype and desire_rtype != reply.type and reply.type not in [ReplyType.ERROR, ReplyType.INFO]:
+            logger.warning("[chat_channel] desire_rtype: {}, but reply type: {}".format(context.get("desire_rtype"), reply.type))
+        return reply
 
     def _send_reply(self, context: Context, reply: Reply):
         if reply and reply.type:
@@ -290,22 +374,52 @@ class ChatChannel(Channel):
             reply = e_context["reply"]
             if not e_context.is_pass() and reply and reply.type:
                 logger.debug("[chat_channel] sending reply: {}, context: {}".format(reply, context))
-                
-                # 如果是文本回复，尝试提取并发送图片
-                if reply.type == ReplyType.TEXT:
-                    self._extract_and_send_images(reply, context)
-                # 如果是图片回复但带有文本内容，先发文本再发图片
-                elif reply.type == ReplyType.IMAGE_URL and hasattr(reply, 'text_content') and reply.text_content:
-                    # 先发送文本
-                    text_reply = Reply(ReplyType.TEXT, reply.text_content)
-                    self._send(text_reply, context)
-                    # 短暂延迟后发送图片
-                    time.sleep(0.3)
-                    self._send(reply, context)
-                else:
-                    self._send(reply, context)
-    
-    def _extract_and_send_images(self, reply: Reply, context: Context):
+                for delay, outgoing in self._plan_replies(reply):
+                    if self._deliver_streamed(context, outgoing):
+                        continue
+                    if delay:
+                        time.sleep(delay)
+                    self._send(outgoing, context)
+
+    def _attach_reply_stream(self, context: Context):
+        """
+        开启流式回复时，为支持的渠道创建ReplyStream，Agent和Bot的增量输出会写入其中
+        """
+        if not conf().get("stream_reply", False) or context.get("desire_rtype") == ReplyType.VOICE:
+            return
+        try:
+            if self.supports_stream(context):
+                from channel.reply_stream import ReplyStream
+                context["reply_stream"] = ReplyStream(self, context)
+        except Exception as e:
+            logger.warning("[chat_channel] create reply stream failed: {}".format(e))
+
+    def _deliver_streamed(self, context: Context, reply: Reply) -> bool:
+        """
+        文本已通过流式消息展示时，用最终内容更新那条消息，不再另发一条
+        """
+        stream = context.get("reply_stream")
+        return bool(stream) and reply.type == ReplyType.TEXT and stream.finish(reply.content)
+
+    def _finish_reply_stream(self, context: Context):
+        # 收尾未被最终回复覆盖的流式消息（如回复被插件拦截或为错误消息）
+        stream = context.get("reply_stream") if context else None
+        if stream:
+            stream.finish()
+
+    def _plan_replies(self, reply: Reply) -> list:
+        """
+        把一条回复拆分为实际要发送的消息列表 [(发送前延迟秒数, reply), ...]
+        """
+        # 如果是文本回复，尝试提取并发送图片
+        if reply.type == ReplyType.TEXT:
+            return self._extract_media_replies(reply)
+        # 如果是图片回复但带有文本内容，先发文本再发图片，中间短暂延迟
+        if reply.type == ReplyType.IMAGE_URL and hasattr(reply, 'text_content') and reply.text_content:
+            return [(0, Reply(ReplyType.TEXT, reply.text_content)), (0.3, reply)]
+        return [(0, reply)]
+
+    def _extract_media_replies(self, reply: Reply) -> list:
         """
         从文本回复中提取图片/视频URL并单独发送
         支持格式：[图片: /path/to/image.png], [视频: /path/to/video.mp4], ![](url), <img src="url">
@@ -338,52 +452,40 @@ class ChatChannel(Channel):
                 seen.add(url)
                 unique_items.append((url, mtype))
         media_items = unique_items[:5]
-        
-        if media_items:
-            logger.info(f"[chat_channel] Extracted {len(media_items)} media item(s) from reply")
-            
-            # 先发送文本（保持原文本不变）
-            logger.info(f"[chat_channel] Sending text content before media: {reply.content[:100]}...")
-            self._send(reply, context)
-            logger.info(f"[chat_channel] Text sent, now sending {len(media_items)} media item(s)")
-            
-            # 然后逐个发送媒体文件
-            for i, (url, media_type) in enumerate(media_items):
-                try:
-                    # 判断是本地文件还是URL
-                    if url.startswith(('http://', 'https://')):
-                        # 网络资源
-                        if media_type == 'video':
-                            # 视频使用 FILE 类型发送
-                            media_reply = Reply(ReplyType.FILE, url)
-                            media_reply.file_name = os.path.basename(url)
-                        else:
-                            # 图片使用 IMAGE_URL 类型
-                            media_reply = Reply(ReplyType.IMAGE_URL, url)
-                    elif os.path.exists(url):
-                        # 本地文件
-                        if media_type == 'video':
-                            # 视频使用 FILE 类型，转换为 file:// URL
-                            media_reply = Reply(ReplyType.FILE, f"file://{url}")
-                            media_reply.file_name = os.path.basename(url)
-                        else:
-                            # 图片使用 IMAGE_URL 类型，转换为 file:// URL
-                            media_reply = Reply(ReplyType.IMAGE_URL, f"file://{url}")
-                    else:
-                        logger.warning(f"[chat_channel] Media file not found or invalid URL: {url}")
-                        continue
-                    
-                    # 发送媒体文件（添加小延迟避免频率限制）
-                    if i > 0:
-                        time.sleep(0.5)
-                    self._send(media_reply, context)
-                    logger.info(f"[chat_channel] Sent {media_type} {i+1}/{len(media_items)}: {url[:50]}...")
-                    
-                except Exception as e:
-                    logger.error(f"[chat_channel] Failed to send {media_type} {url}: {e}")
-        else:
-            # 没有媒体文件，正常发送文本
-                self._send(reply, context)
+
+        # 没有媒体文件，正常发送文本
+        if not media_items:
+            return [(0, reply)]
+
+        logger.info(f"[chat_channel] Extracted {len(media_items)} media item(s) from reply")
+        # 先发送文本（保持原文本不变），然后逐个发送媒体文件
+        replies = [(0, reply)]
+        for url, media_type in media_items:
+            # 判断是本地文件还是URL
+            if url.startswith(('http://', 'https://')):
+                # 网络资源
+                if media_type == 'video':
+                    # 视频使用 FILE 类型发送
+                    media_reply = Reply(ReplyType.FILE, url)
+                    media_reply.file_name = os.path.basename(url)
+                else:
+                    # 图片使用 IMAGE_URL 类型
+                    media_reply = Reply(ReplyType.IMAGE_URL, url)
+            elif os.path.exists(url):
+                # 本地文件
+                if media_type == 'video':
+                    # 视频使用 FILE 类型，转换为 file:// URL
+                    media_reply = Reply(ReplyType.FILE, f"file://{url}")
+                    media_reply.file_name = os.path.basename(url)
+                else:
+                    # 图片使用 IMAGE_URL 类型，转换为 file:// URL
+                    media_reply = Reply(ReplyType.IMAGE_URL, f"file://{url}")
+            else:
+                logger.warning(f"[chat_channel] Media file not found or invalid URL: {url}")
+                continue
+            # 添加小延迟避免频率限制
+            replies.append((0.5 if len(replies) > 1 else 0, media_reply))
+        return replies
 
     def _send(self, reply: Reply, context: Context, retry_cnt=0):
         try:
@@ -397,6 +499,89 @@ class ChatChannel(Channel):
                 time.sleep(3 + 3 * retry_cnt)
                 self._send(reply, context, retry_cnt + 1)
 
+    # async_mode下的处理流程，与_handle各步骤一一对应，等待期间不占用线程
+    async def _handle_async(self, context: Context):
+        if context is None or not context.content:
+            return
+        logger.debug("[chat_channel] handling context async: {}".format(context))
+        reply = await self._generate_reply_async(context)
+        if reply and reply.content:
+            reply = await self._decorate_reply_async(context, reply)
+            await self._send_reply_async(context, reply)
+        if context and context.get("reply_stream"):
+            await run_sync(self._finish_reply_stream, context)
+
+    async def _generate_reply_async(self, context: Context, reply: Reply = Reply()) -> Reply:
+        # 只有文字和图片消息走异步bot，其余类型沿用同步逻辑
+        if context.type not in [ContextType.TEXT, ContextType.IMAGE_CREATE]:
+            return await run_sync(self._generate_reply, context, reply)
+        e_context = await PluginManager().emit_event_async(
+            EventContext(
+                Event.ON_HANDLE_CONTEXT,
+                {"channel": self, "context": context, "reply": reply},
+            )
+        )
+        reply = e_context["reply"]
+        if not e_context.is_pass():
+            logger.debug("[chat_channel] type={}, content={}".format(context.type, context.content))
+            context["channel"] = e_context["channel"]
+            self._attach_reply_stream(context)
+            reply = await super().build_reply_content_async(context.content, context)
+        return reply
+
+    async def _decorate_reply_async(self, context: Context, reply: Reply) -> Reply:
+        if reply and reply.type:
+            e_context = await PluginManager().emit_event_async(
+                EventContext(
+                    Event.ON_DECORATE_REPLY,
+                    {"channel": self, "context": context, "reply": reply},
+                )
+            )
+            return await run_sync(self._apply_decoration, context, e_context)
+
+    async def _send_reply_async(self, context: Context, reply: Reply):
+        if reply and reply.type:
+            e_context = await PluginManager().emit_event_async(
+                EventContext(
+                    Event.ON_SEND_REPLY,
+                    {"channel": self, "context": context, "reply": reply},
+                )
+            )
+            reply = e_context["reply"]
+            if not e_context.is_pass() and reply and reply.type:
+                logger.debug("[chat_channel] sending reply async: {}, context: {}".format(reply, context))
+                for delay, outgoing in self._plan_replies(reply):
+                    if context.get("reply_stream") and await run_sync(self._deliver_streamed, context, outgoing):
+                        continue
+                    if delay:
+                        await asyncio.sleep(delay)
+                    await self._send_async(outgoing, context)
+
+    async def _send_async(self, reply: Reply, context: Context, retry_cnt=0):
+        try:
+            await self.send_async(reply, context)
+        except Exception as e:
+            logger.error("[chat_channel] sendMsg error: {}".format(str(e)))
+            if isinstance(e, NotImplementedError):
+                return
+            logger.exception(e)
+            if retry_cnt < 2:
+                await asyncio.sleep(3 + 3 * retry_cnt)
+                await self._send_async(reply, context, retry_cnt + 1)
+
+    # 根据消息类型选择线程池，语音、图片等慢任务和Agent任务不与普通文本共享线程
+    def _select_handler_pool(self, context: Context):
+        if context.type in [ContextType.VOICE, ContextType.IMAGE, ContextType.IMAGE_CREATE, ContextType.FILE, ContextType.VIDEO]:
+            return "media"
+        if conf().get("agent", False):
+            return "agent"
+        return "text"
+
+    def _reply_busy(self, context: Context):
+        busy_reply = conf().get("handler_pool_busy_reply", "当前请求较多，请稍后再试")
+        if busy_reply:
+            busy_reply_pool.submit(self._send, Reply(ReplyType.TEXT, busy_reply), context)
+
     def _success_callback(self, session_id, **kwargs):  # 线程正常结束时的回调函数
         logger.debug("Worker return success, session_id = {}".format(session_id))
 
@@ -405,6 +590,9 @@ class ChatChannel(Channel):
 
     def _thread_pool_callback(self, session_id, **kwargs):
         def func(worker: Future):
+            if worker.cancelled() and getattr(worker, "shed", False):
+                logger.warning("Worker shed by busy pool, session_id = {}".format(session_id))
+                self._reply_busy(kwargs["context"])
             try:
                 worker_exception = worker.exception()
                 if worker_exception:
@@ -417,6 +605,7 @@ class ChatChannel(Channel):
                 logger.exception("Worker raise exception: {}".format(e))
             with self.lock:
                 self.sessions[session_id][1].release()
+            self.ready_sessions.put(session_id)  # 释放信号量后重新唤醒该会话，继续处理排队消息或回收会话
 
         return func
 
@@ -432,39 +621,65 @@ class ChatChannel(Channel):
                 self.sessions[session_id][0].putleft(context)  # 优先处理管理命令
             else:
                 self.sessions[session_id][0].put(context)
+        self.ready_sessions.put(session_id)
 
-    # 消费者函数，单独线程，用于从消息队列中取出消息并处理
+    # 消费者函数，单独线程，阻塞等待就绪队列中的session_id并分发处理
     def consume(self):
         while True:
-            with self.lock:
-                session_ids = list(self.sessions.keys())
-            for session_id in session_ids:
+            session_id = self.ready_sessions.get()
+            try:
+                self._dispatch(session_id)
+            except Exception as e:
+                logger.exception("[chat_channel] dispatch error, session_id = {}: {}".format(session_id, e))
+
+    def _dispatch(self, session_id):
+        """
+        在信号量允许的范围内把会话中排队的消息提交到线程池；
+        会话空闲（队列为空且没有在处理的任务）时回收会话
+        """
+        contexts = []
+        with self.lock:
+            if session_id not in self.sessions:
+                return
+            context_queue, semaphore = self.sessions[session_id]
+            while semaphore.acquire(blocking=False):
+                if not context_queue.empty():
+                    contexts.append(context_queue.get())
+                elif not contexts and semaphore._initial_value == semaphore._value + 1:  # 除了当前，没有任务再申请到信号量，说明所有任务都处理完毕
+                    self.futures[session_id] = [t for t in self.futures.get(session_id, []) if not t.done()]
+                    assert len(self.futures[session_id]) == 0, "thread pool error"
+                    del self.futures[session_id]
+                    del self.sessions[session_id]
+                    break
+                else:
+                    semaphore.release()
+                    break
+        # 提交放在锁外，已完成的future会在add_done_callback中同步执行回调
+        for context in contexts:
+            logger.debug("[chat_channel] consume context: {}".format(context))
+            try:
+                if conf().get("async_mode", False):
+                    future: Future = async_loop.submit(self._handle_async(context), initializer=handler_pool_initializer)
+                else:
+                    future: Future = get_handler_pool(self._select_handler_pool(context)).submit(self._handle, context)
+            except PoolBusyError as e:
+                logger.warning("[chat_channel] {}, reject context of session {}".format(e, session_id))
                 with self.lock:
-                    context_queue, semaphore = self.sessions[session_id]
-                if semaphore.acquire(blocking=False):  # 等线程处理完毕才能删除
-                    if not context_queue.empty():
-                        context = context_queue.get()
-                        logger.debug("[chat_channel] consume context: {}".format(context))
-                        future: Future = handler_pool.submit(self._handle, context)
-                        future.add_done_callback(self._thread_pool_callback(session_id, context=context))
-                        with self.lock:
-                            if session_id not in self.futures:
-                                self.futures[session_id] = []
-                            self.futures[session_id].append(future)
-                    elif semaphore._initial_value == semaphore._value + 1:  # 除了当前，没有任务再申请到信号量，说明所有任务都处理完毕
-                        with self.lock:
-                            self.futures[session_id] = [t for t in self.futures[session_id] if not t.done()]
-                            assert len(self.futures[session_id]) == 0, "thread pool error"
-                            del self.sessions[session_id]
-                    else:
-                        semaphore.release()
-            time.sleep(0.2)
+                    self.sessions[session_id][1].release()
+                self.ready_sessions.put(session_id)
+                self._reply_busy(context)
+                continue
+            with self.lock:
+                session_futures = [t for t in self.futures.get(session_id, []) if not t.done()]
+                session_futures.append(future)
+                self.futures[session_id] = session_futures
+            future.add_done_callback(self._thread_pool_callback(session_id, context=context))
 
     # 取消session_id对应的所有任务，只能取消排队的消息和已提交线程池但未执行的任务
     def cancel_session(self, session_id):
         with self.lock:
             if session_id in self.sessions:
-                for future in self.futures[session_id]:
+                for future in self.futures.get(session_id, []):
                     future.cancel()
                 cnt = self.sessions[session_id][0].qsize()
                 if cnt > 0:
@@ -473,8 +688,8 @@ class ChatChannel(Channel):
 
     def cancel_all_session(self):
         with self.lock:
-            for session_id in self.sessions:
-                for future in self.futures[session_id]:
+            for session_id in list(self.sessions):
+                for future in self.futures.get(session_id, []):
                     future.cancel()
                 cnt = self.sessions[session_id][0].qsize()
                 if cnt > 0:
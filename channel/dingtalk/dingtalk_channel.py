@@ -17,6 +17,7 @@ from dingtalk_stream import AckMessage
 from dingtalk_stream.card_replier import AICardReplier
 from dingtalk_stream.card_replier import AICardStatus
 from dingtalk_stream.card_replier import CardReplier
+from dingtalk_stream.card_instance import AIMarkdownCardInstance
 
 from bridge.context import Context, ContextType
 from bridge.reply import Reply, ReplyType
@@ -782,6 +783,26 @@ class DingTalkChanel(ChatChannel, dingtalk_stream.ChatbotHandler):
                 self.reply_text(reply.content, incoming_message)
             return
     
+    def supports_stream(self, context: Context) -> bool:
+        # 定时任务等没有原始消息的场景无法回复AI卡片
+        return context.kwargs.get('msg') is not None
+
+    def update_message(self, context: Context, handle, content: str, final: bool = False):
+        """
+        流式回复：首次投放AI Markdown卡片，之后以打字机模式更新卡片内容，final时置为完成态
+        """
+        card = handle
+        if card is None:
+            incoming_message = context.kwargs.get('msg').incoming_message
+            card = AIMarkdownCardInstance(self.dingtalk_client, incoming_message)
+            card.set_title_and_logo("📌 内容由AI生成", "")
+            card.ai_start(recipients=[incoming_message.sender_staff_id])
+        if final:
+            card.ai_finish(markdown=content)
+        else:
+            card.ai_streaming(markdown=content, append=False)
+        return card
+
     def _send_file_message(self, access_token: str, incoming_message, msg_key: str, msg_param: dict, is_group: bool) -> bool:
         """
         发送文件/视频消息的通用方法
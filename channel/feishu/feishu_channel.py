@@ -272,7 +272,6 @@ class FeiShuChanel(ChatChannel):
 
     def send(self, reply: Reply, context: Context):
         msg = context.get("msg")
-        is_group = context["isgroup"]
         if msg:
             access_token = msg.access_token
         else:
@@ -333,13 +332,22 @@ class FeiShuChanel(ChatChannel):
                 msg_type = "file"
                 content_key = "file_key"
 
-        # Check if we can reply to an existing message (need msg_id)
-        can_reply = is_group and msg and hasattr(msg, 'msg_id') and msg.msg_id
-
         # Build content JSON
         content_json = json.dumps(reply_content) if content_key is None else json.dumps({content_key: reply_content})
         logger.debug(f"[FeiShu] Sending message: msg_type={msg_type}, content={content_json[:200]}")
 
+        res = self._post_message(context, headers, msg_type, content_json)
+        if res.get("code") == 0:
+            logger.info(f"[FeiShu] send message success")
+        else:
+            logger.error(f"[FeiShu] send message failed, code={res.get('code')}, msg={res.get('msg')}")
+
+    def _post_message(self, context: Context, headers: dict, msg_type: str, content_json: str) -> dict:
+        msg = context.get("msg")
+        is_group = context["isgroup"]
+        # Check if we can reply to an existing message (need msg_id)
+        can_reply = is_group and msg and hasattr(msg, 'msg_id') and msg.msg_id
+
         if can_reply:
             # 群聊中回复已有消息
             url = f"https://open.feishu.cn/open-apis/im/v1/messages/{msg.msg_id}/reply"
@@ -358,11 +366,33 @@ class FeiShuChanel(ChatChannel):
                 "content": content_json
             }
             res = requests.post(url=url, headers=headers, params=params, json=data, timeout=(5, 10))
-        res = res.json()
-        if res.get("code") == 0:
-            logger.info(f"[FeiShu] send message success")
+        return res.json()
+
+    def supports_stream(self, context: Context) -> bool:
+        return True
+
+    def update_message(self, context: Context, handle, content: str, final: bool = False):
+        """
+        流式回复：首次发送可更新的消息卡片，之后通过PATCH接口把卡片更新为最新内容
+        """
+        msg = context.get("msg")
+        access_token = msg.access_token if msg else self.fetch_access_token()
+        headers = {
+            "Authorization": "Bearer " + access_token,
+            "Content-Type": "application/json",
+        }
+        card_json = json.dumps({
+            "config": {"update_multi": True, "wide_screen_mode": True},  # update_multi为true的卡片才能被更新
+            "elements": [{"tag": "markdown", "content": content}],
+        })
+        if handle:
+            url = f"https://open.feishu.cn/open-apis/im/v1/messages/{handle}"
+            res = requests.patch(url=url, headers=headers, json={"content": card_json}, timeout=(5, 10)).json()
         else:
-            logger.error(f"[FeiShu] send message failed, code={res.get('code')}, msg={res.get('msg')}")
+            res = self._post_message(context, headers, "interactive", card_json)
+        if res.get("code") != 0:
+            raise Exception(f"update card failed, code={res.get('code')}, msg={res.get('msg')}")
+        return handle or res["data"]["message_id"]
 
     def fetch_access_token(self) -> str:
         url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal/"
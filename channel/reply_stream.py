@@ -0,0 +1,88 @@
+"""
+流式回复：把模型输出的增量文本合并后，按刷新间隔推送给支持消息更新的Channel
+
+一次回复可能包含多段消息（如Agent调用工具前的思考、最终回答），每段对应渠道中的一条消息：
+首段内容到达时立即发送（降低首字延迟），之后按 stream_flush_interval 合并增量、用完整文本更新该消息，
+finish() 时以最终内容更新并结束这一段。
+"""
+
+import threading
+import time
+
+from common.log import logger
+from config import conf
+
+
+class ReplyStream:
+    def __init__(self, channel, context, flush_interval=None):
+        self.channel = channel
+        self.context = context
+        self.flush_interval = conf().get("stream_flush_interval", 0.5) if flush_interval is None else flush_interval
+        self.lock = threading.Lock()
+        self.failed = False  # 渠道更新失败后不再流式推送，最终回复走普通发送
+        self.created_at = time.monotonic()
+        self.first_flush_at = None
+        self.updates = 0
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self.text = ""  # 当前段落已收到的完整文本
+        self.handle = None  # 渠道返回的消息标识，None表示当前段落还未发送
+        self.flushed_len = 0
+        self.last_flush = 0
+
+    @property
+    def active(self) -> bool:
+        """当前段落是否已有内容展示给用户"""
+        return self.handle is not None
+
+    def feed(self, delta: str):
+        """
+        追加一段增量文本，首段立即推送，之后距上次推送超过刷新间隔时推送
+        """
+        if not delta or self.failed:
+            return
+        with self.lock:
+            self.text += delta
+            if self.handle is None and not self.text.strip():
+                return
+            if self.handle is None or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush(final=False)
+
+    def finish(self, content: str = None) -> bool:
+        """
+        结束当前段落：以content（默认为已收到的文本）作为最终内容更新消息
+        :return: 内容是否已通过流式消息送达，False时调用方应按普通方式发送
+        """
+        with self.lock:
+            if self.failed:
+                self._reset_segment()
+                return False
+            if content is not None:
+                if self.handle is None:
+                    return False  # 还未开始流式展示，交给普通发送
+                self.text = content
+            if self.handle is None and not self.text.strip():
+                self._reset_segment()
+                return False
+            self._flush(final=True)
+            delivered = not self.failed
+            self._reset_segment()
+            return delivered
+
+    def _flush(self, final: bool):
+        if not final and len(self.text) == self.flushed_len:
+            return
+        try:
+            self.handle = self.channel.update_message(self.context, self.handle, self.text, final=final)
+        except Exception as e:
+            logger.warning("[ReplyStream] update message failed, fallback to normal reply: {}".format(e))
+            self.failed = True
+            return
+        now = time.monotonic()
+        if self.first_flush_at is None:
+            self.first_flush_at = now
+            logger.debug("[ReplyStream] first content shown in {:.0f}ms".format((now - self.created_at) * 1000))
+        self.updates += 1
+        self.flushed_len = len(self.text)
+        self.last_flush = now
@@ -4,70 +4,201 @@ import hashlib
 import uuid
 import json
 import time
+import threading
+from contextlib import contextmanager
+from common.fts_tokenizer import segment, build_match_query, make_snippet
 
 DB_FILE = os.path.join(os.path.dirname(__file__), 'web_chat.db')
 
-def get_db():
-    conn = sqlite3.connect(DB_FILE)
+# Schema version stored in PRAGMA user_version
+# 1: messages moved from the conversations.messages JSON column to the messages table
+# 2: full-text index (messages_fts, conversations_fts) over message content and titles
+SCHEMA_VERSION = 2
+
+# Max idle connections kept for reuse, web handlers run on a bounded thread pool
+POOL_SIZE = 8
+
+_pool = []
+_pool_lock = threading.Lock()
+
+# Whether the database has the FTS5 search tables, None until checked
+_fts_enabled = None
+
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, timeout=10, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    # WAL lets readers run concurrently with the single writer
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
     return conn
 
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection; commits on success, rolls back on error
+    """
+    with _pool_lock:
+        conn = None
+        while _pool:
+            db_file, pooled = _pool.pop()
+            if db_file == DB_FILE:
+                conn = pooled
+                break
+            pooled.close()
+    if conn is None:
+        conn = _connect()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        with _pool_lock:
+            if len(_pool) < POOL_SIZE:
+                _pool.append((DB_FILE, conn))
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+def close_pool():
+    with _pool_lock:
+        while _pool:
+            _pool.pop()[1].close()
+
+
 def init_db():
-    conn = get_db()
-    c = conn.cursor()
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        salt TEXT NOT NULL,
-        created_at REAL
-    )''')
-    # Sessions table
-    c.execute('''CREATE TABLE IF NOT EXISTS sessions (
-        token TEXT PRIMARY KEY,
-        user_id INTEGER NOT NULL,
-        expires_at REAL NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    # Conversations table
-    c.execute('''CREATE TABLE IF NOT EXISTS conversations (
-        id TEXT PRIMARY KEY,
-        user_id INTEGER NOT NULL,
-        title TEXT,
-        messages TEXT DEFAULT '[]',
-        updated_at REAL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        c = conn.cursor()
+        # Users table
+        c.execute('''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            created_at REAL
+        )''')
+        # Sessions table
+        c.execute('''CREATE TABLE IF NOT EXISTS sessions (
+            token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''')
+        # Conversations table, the messages column is kept for old databases and no longer used
+        c.execute('''CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            title TEXT,
+            messages TEXT DEFAULT '[]',
+            updated_at REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''')
+        # Messages table, one row per message, appended in seq order
+        c.execute('''CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT,
+            timestamp REAL,
+            FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+        )''')
+        c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_conversation_seq ON messages (conversation_id, seq)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_conversations_user_updated ON conversations (user_id, updated_at)')
+
+        version = c.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            _migrate_json_messages(c)
+        if version < 2:
+            _create_search_index(c)
+        c.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def _migrate_json_messages(c):
+    """Move messages stored as a JSON array in conversations.messages into the messages table"""
+    rows = c.execute("SELECT id, user_id, messages FROM conversations WHERE messages IS NOT NULL AND messages != '[]'").fetchall()
+    for row in rows:
+        try:
+            messages = json.loads(row['messages'])
+        except Exception:
+            messages = []
+        if not isinstance(messages, list):
+            messages = []
+        c.executemany('INSERT OR IGNORE INTO messages (conversation_id, user_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                      [(row['id'], row['user_id'], seq, m.get('role', 'user'), m.get('content'), m.get('timestamp'))
+                       for seq, m in enumerate(messages, 1) if isinstance(m, dict)])
+        c.execute("UPDATE conversations SET messages = '[]' WHERE id = ?", (row['id'],))
+
+def _create_search_index(c):
+    """
+    Create the FTS5 tables and index existing rows.
+    Text is stored bigram-segmented (see common.fts_tokenizer) so Chinese queries match;
+    the owner column holds 'u<user_id>' so a search only visits the user's own rows.
+    """
+    global _fts_enabled
+    try:
+        c.execute('CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, owner, conversation_id UNINDEXED)')
+        c.execute('CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(title, owner, conversation_id UNINDEXED)')
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        _fts_enabled = False
+        return
+    _fts_enabled = True
+    for row in c.execute('SELECT rowid, id, user_id, title FROM conversations').fetchall():
+        _index_conversation(c, row['rowid'], row['id'], row['user_id'], row['title'])
+    for row in c.execute('SELECT id, conversation_id, user_id, content FROM messages').fetchall():
+        _index_message(c, row['id'], row['conversation_id'], row['user_id'], row['content'])
+
+def _has_search_index(c):
+    global _fts_enabled
+    if _fts_enabled is None:
+        _fts_enabled = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone() is not None
+    return _fts_enabled
+
+def _owner(user_id):
+    return f'u{user_id}'
+
+def _index_conversation(c, rowid, conversation_id, user_id, title):
+    c.execute('INSERT INTO conversations_fts (rowid, title, owner, conversation_id) VALUES (?, ?, ?, ?)',
+              (rowid, segment(title or ''), _owner(user_id), conversation_id))
+
+def _index_message(c, message_id, conversation_id, user_id, content):
+    c.execute('INSERT INTO messages_fts (rowid, content, owner, conversation_id) VALUES (?, ?, ?, ?)',
+              (message_id, segment(content or ''), _owner(user_id), conversation_id))
+
+def _unindex_messages(c, where, params):
+    if _has_search_index(c):
+        c.execute(f'DELETE FROM messages_fts WHERE rowid IN (SELECT id FROM messages WHERE {where})', params)
+
+def _unindex_conversations(c, where, params):
+    if _has_search_index(c):
+        c.execute(f'DELETE FROM conversations_fts WHERE rowid IN (SELECT rowid FROM conversations WHERE {where})', params)
 
 # User functions
 def register_user(username, password):
-    conn = get_db()
-    c = conn.cursor()
     try:
         salt = os.urandom(16).hex()
         password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
         created_at = time.time()
-        c.execute('INSERT INTO users (username, password_hash, salt, created_at) VALUES (?, ?, ?, ?)', 
-                  (username, password_hash, salt, created_at))
-        conn.commit()
+        with connection() as conn:
+            conn.execute('INSERT INTO users (username, password_hash, salt, created_at) VALUES (?, ?, ?, ?)',
+                         (username, password_hash, salt, created_at))
         return True, "Registration successful"
     except sqlite3.IntegrityError:
         return False, "Username already exists"
     except Exception as e:
         return False, str(e)
-    finally:
-        conn.close()
 
 def login_user(username, password):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = c.fetchone()
-    conn.close()
-    
+    with connection() as conn:
+        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+
     if user:
         salt = user['salt']
         password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
@@ -75,143 +206,261 @@ def login_user(username, password):
             # Create session
             token = str(uuid.uuid4())
             expires_at = time.time() + 86400 * 7 # 7 days
-            conn = get_db()
-            # Clean old sessions for this user
-            conn.execute('DELETE FROM sessions WHERE user_id = ?', (user['id'],))
-            conn.execute('INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)', 
-                         (token, user['id'], expires_at))
-            conn.commit()
-            conn.close()
+            with connection() as conn:
+                # Clean old sessions for this user
+                conn.execute('DELETE FROM sessions WHERE user_id = ?', (user['id'],))
+                conn.execute('INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
+                             (token, user['id'], expires_at))
             return token, user['username']
     return None, None
 
 def get_user_by_token(token):
     if not token:
         return None
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT u.id, u.username FROM users u JOIN sessions s ON u.id = s.user_id WHERE s.token = ? AND s.expires_at > ?', 
-              (token, time.time()))
-    user = c.fetchone()
-    conn.close()
-    return user
+    with connection() as conn:
+        return conn.execute('SELECT u.id, u.username FROM users u JOIN sessions s ON u.id = s.user_id WHERE s.token = ? AND s.expires_at > ?',
+                            (token, time.time())).fetchone()
 
 def logout_user(token):
-    conn = get_db()
-    conn.execute('DELETE FROM sessions WHERE token = ?', (token,))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute('DELETE FROM sessions WHERE token = ?', (token,))
 
 # Conversation functions
-def get_conversations(user_id, limit=20, offset=0, keyword=None, start_date=None, end_date=None):
-    conn = get_db()
-    c = conn.cursor()
-    
-    query = 'SELECT id, title, updated_at FROM conversations WHERE user_id = ?'
+def _conversation_filters(user_id, keyword=None, start_date=None, end_date=None):
+    query = ' FROM conversations WHERE user_id = ?'
     params = [user_id]
-    
+
     if keyword:
         query += ' AND title LIKE ?'
         params.append(f'%{keyword}%')
-    
+
     if start_date:
         query += ' AND updated_at >= ?'
         params.append(start_date)
-        
+
     if end_date:
         query += ' AND updated_at <= ?'
         params.append(end_date)
-        
-    query += ' ORDER BY updated_at DESC LIMIT ? OFFSET ?'
+
+    return query, params
+
+def encode_cursor(conversation):
+    return f"{conversation['updated_at']!r}:{conversation['id']}"
+
+def decode_cursor(cursor):
+    """Parse a cursor from encode_cursor into (updated_at, id), None if malformed"""
+    try:
+        updated_at, cid = cursor.split(':', 1)
+        return float(updated_at), cid
+    except (AttributeError, ValueError):
+        return None
+
+def get_conversations(user_id, limit=20, offset=0, keyword=None, start_date=None, end_date=None, cursor=None):
+    """
+    List conversations, most recently updated first.
+    With a cursor (from encode_cursor on the last row of the previous page) the page is
+    located through the (user_id, updated_at) index instead of skipping offset rows.
+    """
+    query, params = _conversation_filters(user_id, keyword, start_date, end_date)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        query += ' AND (updated_at < ? OR (updated_at = ? AND id < ?))'
+        params.extend([position[0], position[0], position[1]])
+        offset = 0
+
+    query += ' ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?'
     params.extend([limit, offset])
-    
-    c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
+
+    with connection() as conn:
+        rows = conn.execute('SELECT id, title, updated_at' + query, params).fetchall()
     return [dict(row) for row in rows]
 
 def get_conversation_count(user_id, keyword=None, start_date=None, end_date=None):
-    conn = get_db()
-    c = conn.cursor()
-    
-    query = 'SELECT COUNT(*) FROM conversations WHERE user_id = ?'
-    params = [user_id]
-    
-    if keyword:
-        query += ' AND title LIKE ?'
-        params.append(f'%{keyword}%')
-    
+    query, params = _conversation_filters(user_id, keyword, start_date, end_date)
+    with connection() as conn:
+        return conn.execute('SELECT COUNT(*)' + query, params).fetchone()[0]
+
+def search_conversations(user_id, query, limit=20, offset=0, start_date=None, end_date=None):
+    """
+    Full-text search over conversation titles and message content, best match first.
+    Each conversation is ranked by its best BM25 hit (title hits weigh double) and carries
+    a snippet of the best matching message.
+    :return: (conversations, total)
+    """
+    match = build_match_query(query)
+    if not match:
+        return [], 0
+    with connection() as conn:
+        if not _has_search_index(conn):
+            return _search_conversations_like(conn, user_id, query, limit, offset, start_date, end_date)
+        owner = f'owner:"{_owner(user_id)}"'
+        sql = '''
+            WITH hits AS (
+                SELECT conversation_id, bm25(conversations_fts, 1.0, 0.0, 0.0) * 2 AS rank, NULL AS message_id
+                FROM conversations_fts WHERE conversations_fts MATCH ?
+                UNION ALL
+                SELECT conversation_id, bm25(messages_fts, 1.0, 0.0, 0.0) AS rank, rowid AS message_id
+                FROM messages_fts WHERE messages_fts MATCH ?
+            ), best AS (
+                SELECT conversation_id, MIN(rank) AS rank, message_id FROM hits GROUP BY conversation_id
+            )
+            SELECT c.id, c.title, c.updated_at, best.rank, best.message_id, COUNT(*) OVER () AS total
+            FROM best JOIN conversations c ON c.id = best.conversation_id
+            WHERE c.user_id = ?'''
+        params = [f'{owner} AND title:({match})', f'{owner} AND content:({match})', user_id]
+        if start_date:
+            sql += ' AND c.updated_at >= ?'
+            params.append(start_date)
+        if end_date:
+            sql += ' AND c.updated_at <= ?'
+            params.append(end_date)
+        sql += ' ORDER BY best.rank, c.updated_at DESC LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        rows = conn.execute(sql, params).fetchall()
+
+        message_ids = [row['message_id'] for row in rows if row['message_id'] is not None]
+        contents = {}
+        if message_ids:
+            placeholders = ','.join('?' * len(message_ids))
+            contents = dict(conn.execute(f'SELECT id, content FROM messages WHERE id IN ({placeholders})', message_ids).fetchall())
+
+    total = rows[0]['total'] if rows else 0
+    if not rows and offset:
+        total = search_conversations(user_id, query, 1, 0, start_date, end_date)[1]
+    results = []
+    for row in rows:
+        results.append({
+            'id': row['id'],
+            'title': row['title'],
+            'updated_at': row['updated_at'],
+            'score': -row['rank'],
+            'snippet': make_snippet(contents.get(row['message_id']), query),
+        })
+    return results, total
+
+def _search_conversations_like(conn, user_id, query, limit, offset, start_date, end_date):
+    """Search without FTS5 (SQLite built without it): substring match, most recent first"""
+    like = f'%{query.strip()}%'
+    sql = ''' FROM conversations c WHERE c.user_id = ? AND (c.title LIKE ? OR EXISTS (
+                SELECT 1 FROM messages m WHERE m.conversation_id = c.id AND m.content LIKE ?))'''
+    params = [user_id, like, like]
     if start_date:
-        query += ' AND updated_at >= ?'
+        sql += ' AND c.updated_at >= ?'
         params.append(start_date)
-        
     if end_date:
-        query += ' AND updated_at <= ?'
+        sql += ' AND c.updated_at <= ?'
         params.append(end_date)
-        
-    c.execute(query, params)
-    count = c.fetchone()[0]
-    conn.close()
-    return count
-
-def get_conversation(conversation_id, user_id):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT * FROM conversations WHERE id = ? AND user_id = ?', (conversation_id, user_id))
-    row = c.fetchone()
-    conn.close()
+    total = conn.execute('SELECT COUNT(*)' + sql, params).fetchone()[0]
+    rows = conn.execute('SELECT c.id, c.title, c.updated_at' + sql + ' ORDER BY c.updated_at DESC LIMIT ? OFFSET ?',
+                        params + [limit, offset]).fetchall()
+    return [dict(row, score=0, snippet='') for row in rows], total
+
+def _message_dict(row):
+    return {'seq': row['seq'], 'role': row['role'], 'content': row['content'], 'timestamp': row['timestamp']}
+
+def get_messages(conversation_id, user_id, before_seq=None, limit=None):
+    """
+    Get messages of a conversation in chronological order.
+    :param before_seq: only messages with seq below this, for loading older pages
+    :param limit: return at most the latest `limit` messages
+    :return: (messages, has_more)
+    """
+    query = 'SELECT seq, role, content, timestamp FROM messages WHERE conversation_id = ? AND user_id = ?'
+    params = [conversation_id, user_id]
+    if before_seq is not None:
+        query += ' AND seq < ?'
+        params.append(before_seq)
+    if limit is None:
+        with connection() as conn:
+            rows = conn.execute(query + ' ORDER BY seq', params).fetchall()
+        return [_message_dict(row) for row in rows], False
+    query += ' ORDER BY seq DESC LIMIT ?'
+    params.append(limit + 1)
+    with connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    has_more = len(rows) > limit
+    return [_message_dict(row) for row in reversed(rows[:limit])], has_more
+
+def get_conversation(conversation_id, user_id, before_seq=None, message_limit=None):
+    with connection() as conn:
+        row = conn.execute('SELECT id, user_id, title, updated_at FROM conversations WHERE id = ? AND user_id = ?',
+                           (conversation_id, user_id)).fetchone()
     if row:
         res = dict(row)
-        try:
-            res['messages'] = json.loads(res['messages'])
-        except:
-            res['messages'] = []
+        res['messages'], res['has_more'] = get_messages(conversation_id, user_id, before_seq, message_limit)
         return res
     return None
 
+def _ensure_conversation(c, conversation_id, user_id, title, now, create):
+    """Check ownership and create the conversation if needed, returns False if not allowed"""
+    row = c.execute('SELECT user_id FROM conversations WHERE id = ?', (conversation_id,)).fetchone()
+    if row:
+        return row['user_id'] == user_id
+    if not create:
+        return False
+    title = title or "New Conversation"
+    c.execute('INSERT INTO conversations (id, user_id, title, updated_at) VALUES (?, ?, ?, ?)',
+              (conversation_id, user_id, title, now))
+    if _has_search_index(c):
+        _index_conversation(c, c.lastrowid, conversation_id, user_id, title)
+    return True
+
+def append_message(conversation_id, user_id, role, content, title=None, timestamp=None, create=True):
+    """
+    Append one message to a conversation, creating the conversation when create is True.
+    Only the new row is written, the seq is taken from the (conversation_id, seq) index.
+    :return: seq of the new message, None if the conversation belongs to another user or does not exist
+    """
+    now = time.time()
+    with connection() as conn:
+        c = conn.cursor()
+        # Take the write lock up front so concurrent appends get distinct seq values
+        c.execute('BEGIN IMMEDIATE')
+        if not _ensure_conversation(c, conversation_id, user_id, title, now, create):
+            return None
+        seq = c.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE conversation_id = ?',
+                        (conversation_id,)).fetchone()[0]
+        c.execute('INSERT INTO messages (conversation_id, user_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                  (conversation_id, user_id, seq, role, content, timestamp or now))
+        if _has_search_index(c):
+            _index_message(c, c.lastrowid, conversation_id, user_id, content)
+        c.execute('UPDATE conversations SET updated_at = ? WHERE id = ?', (now, conversation_id))
+        return seq
+
 def save_conversation(conversation_id, user_id, messages, title=None):
-    conn = get_db()
-    c = conn.cursor()
-    
-    # Check if exists
-    c.execute('SELECT id FROM conversations WHERE id = ?', (conversation_id,))
-    exists = c.fetchone()
-    
-    # Check ownership if exists
-    if exists:
-        c.execute('SELECT user_id FROM conversations WHERE id = ?', (conversation_id,))
-        row = c.fetchone()
-        if row and row['user_id'] != user_id:
-            conn.close()
-            return False # Not authorized
-    
-    messages_json = json.dumps(messages, ensure_ascii=False)
+    """Replace all messages of a conversation, prefer append_message for adding messages"""
     now = time.time()
-    
-    if exists:
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        if not _ensure_conversation(c, conversation_id, user_id, title, now, True):
+            return False # Not authorized
+        _unindex_messages(c, 'conversation_id = ?', (conversation_id,))
+        c.execute('DELETE FROM messages WHERE conversation_id = ?', (conversation_id,))
+        for seq, m in enumerate(messages, 1):
+            c.execute('INSERT INTO messages (conversation_id, user_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                      (conversation_id, user_id, seq, m.get('role', 'user'), m.get('content'), m.get('timestamp')))
+            if _has_search_index(c):
+                _index_message(c, c.lastrowid, conversation_id, user_id, m.get('content'))
         if title:
-            c.execute('UPDATE conversations SET messages = ?, title = ?, updated_at = ? WHERE id = ?',
-                      (messages_json, title, now, conversation_id))
+            c.execute('UPDATE conversations SET title = ?, updated_at = ? WHERE id = ?', (title, now, conversation_id))
+            if _has_search_index(c):
+                c.execute('UPDATE conversations_fts SET title = ? WHERE rowid = (SELECT rowid FROM conversations WHERE id = ?)',
+                          (segment(title), conversation_id))
         else:
-            c.execute('UPDATE conversations SET messages = ?, updated_at = ? WHERE id = ?',
-                      (messages_json, now, conversation_id))
-    else:
-        if not title:
-            title = "New Conversation"
-        c.execute('INSERT INTO conversations (id, user_id, title, messages, updated_at) VALUES (?, ?, ?, ?, ?)',
-                  (conversation_id, user_id, title, messages_json, now))
-    conn.commit()
-    conn.close()
+            c.execute('UPDATE conversations SET updated_at = ? WHERE id = ?', (now, conversation_id))
     return True
 
 def delete_conversation(conversation_id, user_id):
-    conn = get_db()
-    conn.execute('DELETE FROM conversations WHERE id = ? AND user_id = ?', (conversation_id, user_id))
-    conn.commit()
-    conn.close()
-    
+    with connection() as conn:
+        _unindex_messages(conn, 'conversation_id = ? AND user_id = ?', (conversation_id, user_id))
+        _unindex_conversations(conn, 'id = ? AND user_id = ?', (conversation_id, user_id))
+        conn.execute('DELETE FROM messages WHERE conversation_id = ? AND user_id = ?', (conversation_id, user_id))
+        conn.execute('DELETE FROM conversations WHERE id = ? AND user_id = ?', (conversation_id, user_id))
+
 def clear_history(user_id):
-    conn = get_db()
-    conn.execute('DELETE FROM conversations WHERE user_id = ?', (user_id,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with connection() as conn:
+        _unindex_messages(conn, 'user_id = ?', (user_id,))
+        _unindex_conversations(conn, 'user_id = ?', (user_id,))
+        conn.execute('DELETE FROM messages WHERE user_id = ?', (user_id,))
+        conn.execute('DELETE FROM conversations WHERE user_id = ?', (user_id,))
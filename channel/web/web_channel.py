@@ -17,6 +17,11 @@ import mimetypes  # 添加这行来处理MIME类型
 import threading
 import logging
 from channel.web import db
+from common.expired_dict import ExpiredDict
+
+SSE_HEARTBEAT_SECONDS = 15  # SSE无消息时发送心跳的间隔，同时用于及时发现已断开的连接
+SSE_MAX_SECONDS = 600  # 单个SSE连接的最长时间，到期后由浏览器自动重连，避免长期占用服务线程
+LONG_POLL_TIMEOUT = 25  # 长轮询最长等待时间(秒)
 
 class WebMessage(ChatMessage):
     def __init__(
@@ -49,8 +54,11 @@ class WebChannel(ChatChannel):
     def __init__(self):
         super().__init__()
         self.msg_id_counter = 0  # 添加消息ID计数器
-        self.session_queues = {}  # 存储session_id到队列的映射
-        self.request_to_session = {}  # 存储request_id到session_id的映射
+        # 长时间没有收发消息的会话自动清理，避免映射无限增长
+        expires = conf().get("web_session_expires_in_seconds", 3600)
+        self.session_queues = ExpiredDict(expires)  # 存储session_id到队列的映射
+        self.request_to_session = ExpiredDict(expires)  # 存储request_id到session_id的映射
+        self._queues_lock = threading.Lock()
 
 
     def _generate_msg_id(self):
@@ -62,15 +70,23 @@ class WebChannel(ChatChannel):
         """生成唯一的请求ID"""
         return str(uuid.uuid4())
 
+    def _get_queue(self, session_id, create=False):
+        """获取会话的响应队列（同时刷新过期时间），create为True时不存在则创建"""
+        queue = self.session_queues.get(session_id)
+        if queue is None and create:
+            with self._queues_lock:
+                queue = self.session_queues.get(session_id)
+                if queue is None:
+                    queue = Queue()
+                    self.session_queues[session_id] = queue
+        return queue
+
     def send(self, reply: Reply, context: Context):
         try:
             if reply.type in self.NOT_SUPPORT_REPLYTYPE:
                 logger.warning(f"Web channel doesn't support {reply.type} yet")
                 return
 
-            if reply.type == ReplyType.IMAGE_URL:
-                time.sleep(0.5)
-
             # 获取请求ID和会话ID
             request_id = context.get("request_id", None)
             
@@ -84,26 +100,11 @@ class WebChannel(ChatChannel):
                 logger.error(f"No session_id found for request {request_id}")
                 return
             
-            # Save bot response to DB if authenticated
-            user_id = context.get("user_id")
-            conversation_id = context.get("conversation_id")
-            
-            if user_id and conversation_id:
-                try:
-                    conv = db.get_conversation(conversation_id, user_id)
-                    if conv:
-                        messages = conv['messages']
-                        messages.append({
-                            'role': 'assistant', 
-                            'content': reply.content, 
-                            'timestamp': time.time()
-                        })
-                        db.save_conversation(conversation_id, user_id, messages)
-                except Exception as e:
-                    logger.error(f"Error saving bot response to DB: {e}")
+            self._save_reply_to_db(context, reply.content)
 
             # 检查是否有会话队列
-            if session_id in self.session_queues:
+            queue = self._get_queue(session_id)
+            if queue is not None:
                 # 创建响应数据，包含请求ID以区分不同请求的响应
                 response_data = {
                     "type": str(reply.type),
@@ -111,7 +112,7 @@ class WebChannel(ChatChannel):
                     "timestamp": time.time(),
                     "request_id": request_id
                 }
-                self.session_queues[session_id].put(response_data)
+                queue.put(response_data)
                 logger.debug(f"Response sent to queue for session {session_id}, request {request_id}")
             else:
                 logger.warning(f"No response queue found for session {session_id}, response dropped")
@@ -143,24 +144,11 @@ class WebChannel(ChatChannel):
             # Save user message if authenticated
             if user_id:
                 try:
-                    messages = []
                     title = None
-                    if conversation_id:
-                        conv = db.get_conversation(conversation_id, user_id)
-                        if conv:
-                            messages = conv['messages']
-                    
                     if not conversation_id:
                         conversation_id = str(uuid.uuid4())
                         title = prompt[:20] if prompt else "New Conversation"
-                        
-                    messages.append({
-                        'role': 'user', 
-                        'content': prompt, 
-                        'timestamp': time.time()
-                    })
-                    
-                    db.save_conversation(conversation_id, user_id, messages, title)
+                    db.append_message(conversation_id, user_id, 'user', prompt, title=title)
                 except Exception as e:
                     logger.error(f"Error saving user message to DB: {e}")
 
@@ -171,8 +159,7 @@ class WebChannel(ChatChannel):
             self.request_to_session[request_id] = session_id
             
             # 确保会话队列存在
-            if session_id not in self.session_queues:
-                self.session_queues[session_id] = Queue()
+            self._get_queue(session_id, create=True)
             
             # Web channel 不需要前缀，确保消息能通过前缀检查
             trigger_prefixs = conf().get("single_chat_prefix", [""])
@@ -217,6 +204,41 @@ class WebChannel(ChatChannel):
             logger.error(f"Error processing message: {e}")
             return json.dumps({"status": "error", "message": str(e)})
 
+    def supports_stream(self, context: Context) -> bool:
+        return bool(context.get("request_id"))
+
+    def update_message(self, context: Context, handle, content: str, final: bool = False):
+        """
+        流式回复：把最新的完整内容放入会话队列，前端按stream_id更新同一条消息
+        """
+        request_id = context.get("request_id")
+        session_id = self.request_to_session.get(request_id)
+        stream_id = handle or uuid.uuid4().hex
+        if final:
+            self._save_reply_to_db(context, content)
+        queue = self._get_queue(session_id)
+        if queue is not None:
+            queue.put({
+                "type": str(ReplyType.TEXT),
+                "content": content,
+                "timestamp": time.time(),
+                "request_id": request_id,
+                "stream_id": stream_id,
+                "final": final,
+            })
+        return stream_id
+
+    def _save_reply_to_db(self, context: Context, content):
+        # Save bot response to DB if authenticated
+        user_id = context.get("user_id")
+        conversation_id = context.get("conversation_id")
+
+        if user_id and conversation_id:
+            try:
+                db.append_message(conversation_id, user_id, 'assistant', content, create=False)
+            except Exception as e:
+                logger.error(f"Error saving bot response to DB: {e}")
+
     def poll_response(self):
         """
         Poll for responses using the session_id.
@@ -226,22 +248,23 @@ class WebChannel(ChatChannel):
             json_data = json.loads(data)
             session_id = json_data.get('session_id')
             
-            if not session_id or session_id not in self.session_queues:
+            queue = self._get_queue(session_id) if session_id else None
+            if queue is None:
                 return json.dumps({"status": "error", "message": "Invalid session ID"})
             
             # 尝试从队列获取响应，不等待
             try:
                 # 使用peek而不是get，这样如果前端没有成功处理，下次还能获取到
-                response = self.session_queues[session_id].get(block=False)
+                response = queue.get(block=False)
+                
+                # 流式消息：同一stream_id的后续更新只保留最新一条，避免轮询跟不上推送速度
+                if response.get("stream_id"):
+                    with queue.mutex:
+                        while queue.queue and queue.queue[0].get("stream_id") == response["stream_id"]:
+                            response = queue.queue.popleft()
                 
                 # 返回响应，包含请求ID以区分不同请求
-                return json.dumps({
-                    "status": "success", 
-                    "has_content": True,
-                    "content": response["content"],
-                    "request_id": response["request_id"],
-                    "timestamp": response["timestamp"]
-                })
+                return json.dumps(dict(status="success", has_content=True, **self._format_response(response)))
                 
             except Empty:
                 # 没有新响应
@@ -251,6 +274,85 @@ class WebChannel(ChatChannel):
             logger.error(f"Error polling response: {e}")
             return json.dumps({"status": "error", "message": str(e)})
 
+    def stream_response(self):
+        """
+        服务端推送响应，send入队后立即送达浏览器：
+        - 请求头Accept为text/event-stream时使用SSE，连接保持到SSE_MAX_SECONDS后由浏览器重连
+        - 否则为长轮询，最多等待timeout秒，返回期间到达的全部响应
+        """
+        params = web.input(session_id=None, timeout=None)
+        session_id = params.session_id
+        if not session_id:
+            web.header('Content-Type', 'application/json')
+            return json.dumps({"status": "error", "message": "Invalid session ID"})
+        # 浏览器可能在发送第一条消息前就建立连接，队列不存在时创建
+        queue = self._get_queue(session_id, create=True)
+
+        if "text/event-stream" in web.ctx.env.get("HTTP_ACCEPT", ""):
+            web.header('Content-Type', 'text/event-stream')
+            web.header('Cache-Control', 'no-cache')
+            web.header('X-Accel-Buffering', 'no')  # 禁用Nginx缓冲，否则事件会被攒批
+            return self._sse_events(session_id, queue)
+
+        try:
+            timeout = min(float(params.timeout), LONG_POLL_TIMEOUT) if params.timeout else LONG_POLL_TIMEOUT
+        except ValueError:
+            timeout = LONG_POLL_TIMEOUT
+        responses = self._take_responses(queue, timeout)
+        web.header('Content-Type', 'application/json')
+        return json.dumps({
+            "status": "success",
+            "has_content": bool(responses),
+            "messages": [self._format_response(r) for r in responses]
+        })
+
+    def _sse_events(self, session_id, queue):
+        yield "retry: 3000\n\n"  # 断开后浏览器3秒后重连
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            responses = self._take_responses(queue, SSE_HEARTBEAT_SECONDS)
+            # 刷新会话的过期时间，会话已被清理时改用新队列
+            queue = self._get_queue(session_id, create=True)
+            if not responses:
+                yield ": ping\n\n"
+                continue
+            for i, response in enumerate(responses):
+                try:
+                    yield "data: {}\n\n".format(json.dumps(self._format_response(response)))
+                except GeneratorExit:
+                    # 连接已断开，这条及之后的响应未送达，放回队首留给下次连接
+                    with queue.mutex:
+                        queue.queue.extendleft(reversed(responses[i:]))
+                        queue.not_empty.notify()
+                    raise
+
+    def _take_responses(self, queue: Queue, timeout: float) -> list:
+        """
+        最多等待timeout秒直到有响应，然后取出队列中已有的全部响应，同一流式消息的连续更新只保留最新一条
+        """
+        try:
+            responses = [queue.get(timeout=timeout)]
+        except Empty:
+            return []
+        with queue.mutex:
+            while queue.queue:
+                item = queue.queue.popleft()
+                if item.get("stream_id") and item.get("stream_id") == responses[-1].get("stream_id"):
+                    responses[-1] = item
+                else:
+                    responses.append(item)
+        return responses
+
+    @staticmethod
+    def _format_response(response: dict) -> dict:
+        return {
+            "content": response["content"],
+            "request_id": response["request_id"],
+            "timestamp": response["timestamp"],
+            "stream_id": response.get("stream_id"),
+            "final": response.get("final", True)
+        }
+
     def chat_page(self):
         """Serve the chat HTML page."""
         file_path = os.path.join(os.path.dirname(__file__), 'chat.html')  # 使用绝对路径
@@ -287,6 +389,7 @@ class WebChannel(ChatChannel):
             '/', 'RootHandler',
             '/message', 'MessageHandler',
             '/poll', 'PollHandler',
+            '/stream', 'StreamHandler',
             '/chat', 'ChatHandler',
             '/login', 'LoginHandler',
             '/register', 'RegisterHandler',
@@ -296,6 +399,9 @@ class WebChannel(ChatChannel):
         )
         app = web.application(urls, globals(), autoreload=False)
         
+        # 每个SSE连接占用一个服务线程，默认10个线程不够用
+        web.httpserver.WSGIServer = _create_wsgi_server
+        
         # 完全禁用web.py的HTTP日志输出
         web.httpserver.LogMiddleware.log = lambda self, status, environ: None
         
@@ -312,6 +418,15 @@ class WebChannel(ChatChannel):
             sys.stdout = old_stdout
 
 
+def _create_wsgi_server(server_address, wsgi_app):
+    from cheroot import wsgi
+
+    server = wsgi.Server(server_address, wsgi_app, server_name="localhost",
+                         numthreads=conf().get("web_server_threads", 32))
+    server.nodelay = True
+    return server
+
+
 def login_required(func):
     def wrapper(self, *args, **kwargs):
         try:
@@ -368,6 +483,11 @@ class PollHandler:
         return WebChannel().poll_response()
 
 
+class StreamHandler:
+    def GET(self):
+        return WebChannel().stream_response()
+
+
 class ChatHandler:
     def GET(self):
         # 正常返回聊天页面
@@ -410,7 +530,8 @@ class ConversationHandler:
     @login_required
     def GET(self):
         try:
-            data = web.input(id=None, keyword=None, limit=20, offset=0, start_date=None, end_date=None)
+            data = web.input(id=None, keyword=None, limit=20, offset=0, start_date=None, end_date=None,
+                             cursor=None, before_seq=None, message_limit=None)
             cid = data.id
             keyword = data.keyword
             
@@ -425,11 +546,33 @@ class ConversationHandler:
             end_date = float(data.end_date) if data.end_date else None
 
             if cid:
-                # Get specific conversation
-                conv = db.get_conversation(cid, self.current_user['id'])
+                # Get specific conversation, message_limit/before_seq load the latest messages page by page
+                before_seq = int(data.before_seq) if data.before_seq else None
+                message_limit = int(data.message_limit) if data.message_limit else None
+                conv = db.get_conversation(cid, self.current_user['id'], before_seq=before_seq, message_limit=message_limit)
                 if conv:
                     return json.dumps({'status': 'success', 'data': conv})
                 return json.dumps({'status': 'error', 'message': 'Conversation not found'})
+            elif keyword:
+                # 全文检索标题和消息内容，按相关度排序
+                convs, total = db.search_conversations(
+                    self.current_user['id'],
+                    keyword,
+                    limit=limit,
+                    offset=offset,
+                    start_date=start_date,
+                    end_date=end_date
+                )
+                return json.dumps({
+                    'status': 'success',
+                    'data': convs,
+                    'pagination': {
+                        'total': total,
+                        'limit': limit,
+                        'offset': offset,
+                        'next_cursor': None
+                    }
+                })
             else:
                 # List conversations
                 convs = db.get_conversations(
@@ -438,7 +581,8 @@ class ConversationHandler:
                     offset=offset, 
                     keyword=keyword,
                     start_date=start_date,
-                    end_date=end_date
+                    end_date=end_date,
+                    cursor=data.cursor
                 )
                 total = db.get_conversation_count(
                     self.current_user['id'],
@@ -452,7 +596,9 @@ class ConversationHandler:
                     'pagination': {
                         'total': total,
                         'limit': limit,
-                        'offset': offset
+                        'offset': offset,
+                        # 传回下一页的cursor可避免深分页时的OFFSET扫描
+                        'next_cursor': db.encode_cursor(convs[-1]) if len(convs) == limit else None
                     }
                 })
         except Exception as e:
@@ -157,7 +157,8 @@ class WechatChannel(ChatChannel):
                 time.sleep(2)
                 self.auto_login_times += 1
                 if self.auto_login_times < 100:
-                    chat_channel.handler_pool._shutdown = False
+                    for pool in chat_channel.handler_pools.values():
+                        pool.executor._shutdown = False
                     self.startup()
         except Exception as e:
             pass
@@ -0,0 +1,68 @@
+"""
+进程内共享的asyncio事件循环，运行在独立的守护线程中，用于async_mode下的消息处理
+原生异步的bot(如ChatGPTBot的文本回复)在事件循环中等待请求，不占用线程；
+其余同步实现的bot、channel、插件通过run_sync在线程池中执行，每个进行中的调用占用一个线程
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import conf
+
+_loop = None
+_lock = threading.Lock()
+_aiohttp_session = None
+_aiohttp_loop = None
+
+
+def get_event_loop(initializer=None) -> asyncio.AbstractEventLoop:
+    """
+    :param initializer: 线程池工作线程的初始化函数，仅在首次创建事件循环时生效
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(
+                max_workers=conf().get("async_fallback_workers", 32),
+                thread_name_prefix="async_fallback",
+                initializer=initializer,
+            ))
+            _thread = threading.Thread(target=loop.run_forever, name="async_loop")
+            _thread.setDaemon(True)
+            _thread.start()
+            _loop = loop
+        return _loop
+
+
+def submit(coro, initializer=None):
+    """
+    从其他线程提交协程，返回concurrent.futures.Future，cancel会同时取消协程
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop(initializer))
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    在事件循环的默认线程池中执行同步函数
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+def get_aiohttp_session():
+    """
+    事件循环内共享的aiohttp会话，复用连接，需在事件循环中调用
+    """
+    global _aiohttp_session, _aiohttp_loop
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    if _aiohttp_session is None or _aiohttp_session.closed or _aiohttp_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=conf().get("http_pool_connections", 16) * conf().get("http_pool_maxsize", 32),
+            limit_per_host=conf().get("http_pool_maxsize", 32),
+        )
+        _aiohttp_session = aiohttp.ClientSession(connector=connector)
+        _aiohttp_loop = loop
+    return _aiohttp_session
@@ -1,22 +1,147 @@
-from datetime import datetime, timedelta
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from common.log import logger
+
+SWEEP_INTERVAL = 60  # 后台线程清理过期key的间隔(秒)
+
+_sweep_targets = {}  # id -> weakref，需要后台清理的ExpiredDict，对象被回收后自动移除
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _register_sweep(d):
+    global _sweeper
+    key = id(d)
+    with _sweeper_lock:
+        _sweep_targets[key] = weakref.ref(d, lambda _, key=key: _sweep_targets.pop(key, None))
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, name="expired_dict_sweeper", daemon=True)
+            _sweeper.start()
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        sweep()
+
+
+def sweep():
+    """
+    清理所有开启后台清理的ExpiredDict中已过期的key
+    """
+    with _sweeper_lock:
+        targets = [ref() for ref in list(_sweep_targets.values())]
+    for d in targets:
+        if d is None:
+            continue
+        try:
+            d.purge()
+        except Exception as e:
+            logger.warning("[ExpiredDict] sweep error: {}".format(e))
 
 
 class ExpiredDict(dict):
-    def __init__(self, expires_in_seconds):
+    """
+    带过期时间的字典，每次读写都会刷新key的过期时间
+    所有key的有效期相同，因此按最近访问排序即为按过期时间排序，过期的key总是在最前面，
+    每次操作时从头部淘汰过期key，均摊O(1)；sweep为True时后台线程每SWEEP_INTERVAL秒清理一次，
+    长时间无人访问的字典也会释放过期的key
+    max_size大于0时按LRU淘汰超出容量的key
+    on_evict(key, value)在key过期或被LRU淘汰后调用（不持有锁，可能在后台清理线程中），主动删除的key不会回调
+    """
+
+    def __init__(self, expires_in_seconds, max_size=0, on_evict=None, sweep=True):
         super().__init__()
         self.expires_in_seconds = expires_in_seconds
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self._evicted = []  # 待回调的(key, value)，释放锁后再执行回调
+        self._deadlines = OrderedDict()  # key -> 过期时间(monotonic)，按最近访问排序
+        self._next_deadline = float("inf")  # 最早的过期时间，只会偏早不会偏晚，未到该时间无需检查淘汰
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if sweep:
+            _register_sweep(self)
+
+    def _evict_expired(self, now):
+        if now < self._next_deadline:
+            return
+        # 过期的key都在头部，逐个弹出直到遇到第一个未过期的key
+        deadlines = self._deadlines
+        while deadlines:
+            key = next(iter(deadlines))
+            deadline = deadlines[key]
+            if deadline > now:
+                self._next_deadline = deadline
+                return
+            del deadlines[key]
+            self._discard(key)
+        self._next_deadline = float("inf")
+
+    def purge(self):
+        """
+        立即淘汰所有已过期的key
+        """
+        with self._lock:
+            self._evict_expired(time.monotonic())
+        self._notify_evicted()
+
+    def _discard(self, key):
+        value = super().pop(key)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self._evicted.append((key, value))
+
+    def _notify_evicted(self):
+        if not self._evicted:
+            return
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+        for key, value in evicted:
+            self.on_evict(key, value)
+
+    def _touch(self, key, now):
+        deadline = now + self.expires_in_seconds
+        if key in self._deadlines:
+            self._deadlines.move_to_end(key)
+        elif not self._deadlines:
+            self._next_deadline = deadline
+        self._deadlines[key] = deadline
 
     def __getitem__(self, key):
-        value, expiry_time = super().__getitem__(key)
-        if datetime.now() > expiry_time:
-            del self[key]
-            raise KeyError("expired {}".format(key))
-        self.__setitem__(key, value)
-        return value
+        try:
+            with self._lock:
+                now = time.monotonic()
+                self._evict_expired(now)
+                if key not in self._deadlines:
+                    self.misses += 1
+                    raise KeyError("expired {}".format(key))
+                self.hits += 1
+                self._touch(key, now)
+                return super().__getitem__(key)
+        finally:
+            self._notify_evicted()
 
     def __setitem__(self, key, value):
-        expiry_time = datetime.now() + timedelta(seconds=self.expires_in_seconds)
-        super().__setitem__(key, (value, expiry_time))
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            self._touch(key, now)
+            super().__setitem__(key, value)
+            if self.max_size and len(self._deadlines) > self.max_size:
+                oldest, _ = self._deadlines.popitem(last=False)
+                self._discard(oldest)
+        self._notify_evicted()
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._deadlines[key]
+            super().__delitem__(key)
 
     def get(self, key, default=None):
         try:
@@ -31,12 +156,63 @@ class ExpiredDict(dict):
         except KeyError:
             return False
 
+    def __len__(self):
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            size = super().__len__()
+        self._notify_evicted()
+        return size
+
+    def pop(self, key, *default):
+        try:
+            with self._lock:
+                self._evict_expired(time.monotonic())
+                if key not in self._deadlines:
+                    if default:
+                        return default[0]
+                    raise KeyError(key)
+                del self._deadlines[key]
+                return super().pop(key)
+        finally:
+            self._notify_evicted()
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._deadlines.clear()
+            self._next_deadline = float("inf")
+            super().clear()
+
+    # keys/items/values不刷新过期时间
     def keys(self):
-        keys = list(super().keys())
-        return [key for key in keys if key in self]
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            keys = list(self._deadlines)
+        self._notify_evicted()
+        return keys
 
     def items(self):
-        return [(key, self[key]) for key in self.keys()]
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            items = [(key, super(ExpiredDict, self).__getitem__(key)) for key in self._deadlines]
+        self._notify_evicted()
+        return items
+
+    def values(self):
+        return [value for _, value in self.items()]
 
     def __iter__(self):
         return self.keys().__iter__()
+
+    def stats(self) -> dict:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,89 @@
+"""
+SQLite FTS5 全文检索的中日韩分词：把CJK连续字符切成重叠的二元组(bigram)，配合FTS5默认的unicode61分词器使用
+
+unicode61会把整段中文当成一个词，导致无法按词检索；trigram分词器又无法匹配两个字的查询（中文最常见的查询长度）。
+因此写入索引前先用 segment() 处理文本，查询时用 build_match_query() 生成对应的MATCH表达式：
+    "你好世界" -> "你好 好世 世界 界"
+每段末尾额外保留最后一个单字，使单字查询也能通过前缀匹配("界"*)命中任意位置。
+"""
+
+import re
+
+# 汉字(含扩展A、兼容汉字)、日文假名、韩文音节
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_TOKEN_RE = re.compile(r"[{0}]+|[^\W{0}]+".format(_CJK))
+_CJK_RE = re.compile(r"[{0}]".format(_CJK))
+
+
+def contains_cjk(text: str) -> bool:
+    return bool(text) and _CJK_RE.search(text) is not None
+
+
+def _cjk_tokens(run: str):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def segment(text: str) -> str:
+    """
+    把文本转换为写入FTS5索引的形式，非CJK部分保持原样交给unicode61分词
+    """
+    if not text:
+        return ""
+    if not contains_cjk(text):
+        return text
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if _CJK_RE.match(token):
+            tokens.extend(_cjk_tokens(token))
+        else:
+            tokens.append(token)
+    return " ".join(tokens)
+
+
+def query_terms(query: str) -> list:
+    """拆分查询为检索词（CJK连续字符或英文/数字单词），去重并保持顺序"""
+    if not query:
+        return []
+    return list(dict.fromkeys(_TOKEN_RE.findall(query)))
+
+
+def _term_expression(term: str) -> str:
+    if _CJK_RE.match(term):
+        if len(term) == 1:
+            return '"{}"*'.format(term)
+        # 相邻二元组组成短语，等价于原文中的连续子串
+        return '"{}"'.format(" ".join(term[i:i + 2] for i in range(len(term) - 1)))
+    return '"{}"'.format(term)
+
+
+def build_match_query(query: str, operator: str = "AND"):
+    """
+    生成FTS5 MATCH表达式，检索词之间用operator(AND/OR)连接
+    :return: MATCH表达式，查询中没有可检索的词时返回None
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return " {} ".format(operator).join(_term_expression(term) for term in terms)
+
+
+def make_snippet(text: str, query: str, width: int = 60) -> str:
+    """
+    截取原文中第一个命中检索词附近的片段，用于展示搜索结果
+    """
+    if not text:
+        return ""
+    lowered = text.lower()
+    position = -1
+    for term in query_terms(query):
+        index = lowered.find(term.lower())
+        if index != -1 and (position == -1 or index < position):
+            position = index
+    if len(text) <= width:
+        return text.replace("\n", " ")
+    start = 0 if position <= width // 3 else position - width // 3
+    end = min(len(text), start + width)
+    start = max(0, end - width)
+    return ("..." if start > 0 else "") + text[start:end].replace("\n", " ") + ("..." if end < len(text) else "")
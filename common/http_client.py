@@ -0,0 +1,138 @@
+"""
+所有模型、语音、翻译客户端共用的HTTP传输层
+- 进程内共享一个requests.Session，按host复用连接池（keep-alive），避免每次调用重新TCP+TLS握手
+- 未指定timeout的请求统一使用(connect, read)超时，避免上游无响应时一直占用处理线程
+- 连接失败(请求未发出)按指数退避重试；429/502/503/504只对幂等方法重试，POST可能已被上游处理，重试会重复计费
+- 遵守Retry-After，等待时间不超过http_max_retry_after
+- 按host统计请求数、错误数和延迟
+requests不支持HTTP/2，连接复用已消除主要的握手开销
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import conf
+
+RETRY_STATUS = (429, 502, 503, 504)
+
+_session = None
+_lock = threading.Lock()
+_metrics = {}  # host -> 统计数据
+
+
+class _CappedRetry(Retry):
+    """Retry-After超过http_max_retry_after时按上限等待，避免一次重试占用处理线程过久"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, conf().get("http_max_retry_after", 30))
+
+
+def _build_session():
+    retry = _CappedRetry(
+        total=conf().get("http_max_retries", 2),
+        connect=conf().get("http_max_retries", 2),
+        read=0,  # 已发出的请求读超时不重试，避免重复计费
+        status=conf().get("http_max_retries", 2),
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # 按状态码重试仅限幂等方法
+        backoff_factor=conf().get("http_backoff_factor", 0.5),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=conf().get("http_pool_connections", 16),
+        pool_maxsize=conf().get("http_pool_maxsize", 32),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    获取共享的Session，可直接用于需要Session对象的SDK
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def default_timeout():
+    return conf().get("http_connect_timeout", 10), conf().get("http_read_timeout", 120)
+
+
+def request(method, url, **kwargs) -> requests.Response:
+    """
+    与requests.request参数一致，未传timeout时使用默认超时
+    """
+    kwargs.setdefault("timeout", default_timeout())
+    host = urlparse(url).netloc
+    start = time.monotonic()
+    error = False
+    try:
+        response = get_session().request(method, url, **kwargs)
+        error = response.status_code >= 400
+        return response
+    except Exception:
+        error = True
+        raise
+    finally:
+        _record(host, time.monotonic() - start, error)
+
+
+def get(url, params=None, **kwargs) -> requests.Response:
+    return request("GET", url, params=params, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs) -> requests.Response:
+    return request("POST", url, data=data, json=json, **kwargs)
+
+
+def _record(host, elapsed, error):
+    with _lock:
+        m = _metrics.get(host)
+        if m is None:
+            m = _metrics[host] = {"requests": 0, "errors": 0, "total_latency": 0.0, "max_latency": 0.0}
+        m["requests"] += 1
+        m["errors"] += int(error)
+        m["total_latency"] += elapsed
+        m["max_latency"] = max(m["max_latency"], elapsed)
+
+
+def stats() -> dict:
+    """
+    按host返回请求数、错误数、平均/最大延迟(ms)，流式请求的延迟为收到响应头的时间
+    """
+    with _lock:
+        return {
+            host: {
+                "requests": m["requests"],
+                "errors": m["errors"],
+                "avg_latency_ms": round(m["total_latency"] / m["requests"] * 1000, 2),
+                "max_latency_ms": round(m["max_latency"] * 1000, 2),
+            }
+            for host, m in _metrics.items()
+        }
+
+
+def install_openai_session():
+    """
+    让openai SDK (0.x) 使用与共享Session相同的连接池、超时重试配置
+    openai会定期close()自己持有的Session，因此给它单独创建，不能交出共享Session
+    """
+    try:
+        import openai
+        openai.requestssession = _build_session
+    except ImportError:
+        pass
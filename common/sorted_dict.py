@@ -1,62 +1,72 @@
-import heapq
+import bisect
 
 
 class SortedDict(dict):
+    """
+    按 sort_func(key, value) 排序的dict，keys()/items()/迭代按排序结果返回
+
+    排序索引是一个有序列表 [(排序值, key)]，插入、删除、调整顺序用二分查找定位；
+    排序后的key缓存为元组，仅在内容或顺序变化后重新生成
+    """
+
     def __init__(self, sort_func=lambda k, v: k, init_dict=None, reverse=False):
         if init_dict is None:
             init_dict = []
         if isinstance(init_dict, dict):
             init_dict = init_dict.items()
         self.sort_func = sort_func
-        self.sorted_keys = None
         self.reverse = reverse
-        self.heap = []
+        self._index = []  # [(排序值, key)]，升序
+        self._sort_values = {}  # key -> 当前在_index中的排序值
+        self.sorted_keys = None
         for k, v in init_dict:
             self[k] = v
 
+    def _index_remove(self, key):
+        entry = (self._sort_values.pop(key), key)
+        i = bisect.bisect_left(self._index, entry)
+        if i < len(self._index) and self._index[i] == entry:
+            del self._index[i]
+        else:
+            self._index.remove(entry)
+
+    def _index_add(self, key, value):
+        sort_value = self.sort_func(key, value)
+        self._sort_values[key] = sort_value
+        bisect.insort(self._index, (sort_value, key))
+
     def __setitem__(self, key, value):
         if key in self:
-            super().__setitem__(key, value)
-            for i, (priority, k) in enumerate(self.heap):
-                if k == key:
-                    self.heap[i] = (self.sort_func(key, value), key)
-                    heapq.heapify(self.heap)
-                    break
-            self.sorted_keys = None
-        else:
-            super().__setitem__(key, value)
-            heapq.heappush(self.heap, (self.sort_func(key, value), key))
-            self.sorted_keys = None
+            self._index_remove(key)
+        super().__setitem__(key, value)
+        self._index_add(key, value)
+        self.sorted_keys = None
 
     def __delitem__(self, key):
         super().__delitem__(key)
-        for i, (priority, k) in enumerate(self.heap):
-            if k == key:
-                del self.heap[i]
-                heapq.heapify(self.heap)
-                break
+        self._index_remove(key)
         self.sorted_keys = None
 
+    def reorder(self, key):
+        """value被原地修改(如优先级变化)后调用，更新key的位置"""
+        if self.sort_func(key, self[key]) != self._sort_values[key]:
+            self._index_remove(key)
+            self._index_add(key, self[key])
+            self.sorted_keys = None
+
+    _update_heap = reorder  # 兼容旧名称
+
     def keys(self):
         if self.sorted_keys is None:
-            self.sorted_keys = [k for _, k in sorted(self.heap, reverse=self.reverse)]
+            index = reversed(self._index) if self.reverse else self._index
+            self.sorted_keys = tuple(k for _, k in index)
         return self.sorted_keys
 
     def items(self):
-        if self.sorted_keys is None:
-            self.sorted_keys = [k for _, k in sorted(self.heap, reverse=self.reverse)]
-        sorted_items = [(k, self[k]) for k in self.sorted_keys]
-        return sorted_items
+        return [(k, self[k]) for k in self.keys()]
 
-    def _update_heap(self, key):
-        for i, (priority, k) in enumerate(self.heap):
-            if k == key:
-                new_priority = self.sort_func(key, self[key])
-                if new_priority != priority:
-                    self.heap[i] = (new_priority, key)
-                    heapq.heapify(self.heap)
-                    self.sorted_keys = None
-                break
+    def values(self):
+        return [self[k] for k in self.keys()]
 
     def __iter__(self):
         return iter(self.keys())
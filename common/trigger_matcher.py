@@ -0,0 +1,68 @@
+"""
+消息触发规则的匹配器：前缀字典树和关键词正则，由配置列表预先编译，匹配时不再逐项遍历列表
+"""
+
+import re
+
+_END = None  # 字典树节点中表示"到此为一个完整前缀"的键，值为该前缀在原列表中的下标
+
+
+class PrefixMatcher:
+    """
+    前缀匹配，与逐项 str.startswith 的结果一致：多个前缀同时匹配时返回列表中靠前的那个
+    """
+
+    def __init__(self, prefixes):
+        self.prefixes = list(prefixes or [])
+        self._root = {}
+        for index, prefix in enumerate(self.prefixes):
+            node = self._root
+            for ch in prefix:
+                node = node.setdefault(ch, {})
+            node.setdefault(_END, index)
+
+    def __bool__(self):
+        return bool(self.prefixes)
+
+    def match(self, content):
+        """
+        :return: 匹配到的前缀，未匹配时返回None
+        """
+        node = self._root
+        best = node.get(_END)
+        if best == 0:
+            return self.prefixes[0]
+        for ch in content:
+            node = node.get(ch)
+            if node is None:
+                break
+            index = node.get(_END)
+            if index is not None and (best is None or index < best):
+                best = index
+                if best == 0:
+                    break
+        return None if best is None else self.prefixes[best]
+
+
+class KeywordMatcher:
+    """
+    包含关键词匹配，所有关键词编译为一个正则，一次扫描完成
+    """
+
+    def __init__(self, keywords):
+        self.keywords = [k for k in (keywords or []) if k is not None]
+        if "" in self.keywords:
+            # 空关键词匹配任意内容
+            self._search = lambda content: True
+        elif self.keywords:
+            # 长词在前，避免短词截断长词
+            pattern = "|".join(re.escape(k) for k in sorted(set(self.keywords), key=len, reverse=True))
+            self._search = re.compile(pattern).search
+        else:
+            self._search = lambda content: None
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def contains(self, content) -> bool:
+        return bool(content is not None and self._search(content))
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+POLICY_REJECT = "reject"  # 队列已满时拒绝新任务
+POLICY_SHED = "shed"  # 队列已满时丢弃最早排队的任务，接收新任务
+
+
+class PoolBusyError(RuntimeError):
+    pass
+
+
+class WorkerPool:
+    """
+    有界线程池：在ThreadPoolExecutor之上限制排队长度，并统计排队数、活跃线程数和等待时间
+    max_queue为0时不限制排队长度
+    """
+
+    def __init__(self, name, max_workers=8, max_queue=0, policy=POLICY_REJECT, initializer=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.policy = policy
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}_pool", initializer=initializer)
+        self.lock = threading.RLock()
+        self.pending = deque()  # 已提交但尚未开始执行的future
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.shed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        提交任务，队列已满时按policy处理：reject抛出PoolBusyError，shed取消最早排队的任务（future.shed为True）
+        """
+        shed_future = None
+        with self.lock:
+            if self.max_queue > 0 and len(self.pending) >= self.max_queue:
+                if self.policy != POLICY_SHED:
+                    self.rejected += 1
+                    raise PoolBusyError(f"{self.name} pool is busy, queue depth {len(self.pending)}")
+                shed_future = self.pending.popleft()
+                shed_future.shed = True
+                self.shed += 1
+            self.submitted += 1
+            enqueue_time = time.monotonic()
+            holder = []
+            future = self.executor.submit(self._run, holder, enqueue_time, fn, args, kwargs)
+            future.shed = False
+            holder.append(future)
+            self.pending.append(future)
+            future.add_done_callback(self._discard_cancelled)
+        # cancel会同步触发done回调，放在锁外执行
+        if shed_future is not None and not shed_future.cancel():
+            shed_future.shed = False  # 已开始执行，无法丢弃
+            with self.lock:
+                self.shed -= 1
+        return future
+
+    def _discard_cancelled(self, future):
+        if future.cancelled():
+            with self.lock:
+                try:
+                    self.pending.remove(future)
+                except ValueError:
+                    pass
+
+    def _run(self, holder, enqueue_time, fn, args, kwargs):
+        wait = time.monotonic() - enqueue_time
+        with self.lock:
+            try:
+                self.pending.remove(holder[0])
+            except (ValueError, IndexError):
+                pass
+            self.active += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            started = self.completed + self.active
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self.pending),
+                "active_workers": self.active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "shed": self.shed,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -52,10 +52,21 @@ available_setting = {
     "image_proxy": True,  # 是否需要图片代理，国内访问LinkAI时需要
     "image_create_prefix": ["画", "看", "找"],  # 开启图片回复的前缀
     "concurrency_in_session": 1,  # 同一会话最多有多少条消息在处理中，大于1可能乱序
+    "handler_pool_size": 8,  # 处理普通文本消息的线程数
+    "handler_pool_media_size": 4,  # 处理语音、图片等消息的线程数
+    "handler_pool_agent_size": 8,  # Agent模式下处理消息的线程数
+    "handler_pool_max_queue": 0,  # 每个线程池最多排队的消息数，0为不限制
+    "handler_pool_reject_policy": "reject",  # 排队已满时的策略，reject拒绝新消息，shed丢弃最早排队的消息
+    "handler_pool_busy_reply": "当前请求较多，请稍后再试",  # 消息被拒绝或丢弃时的回复，为空则不回复
+    "async_mode": False,  # 是否使用asyncio处理消息，目前仅ChatGPT(含Azure)的非流式文本回复原生异步、等待时不占用线程，其余bot、插件、channel在线程池中执行，每个进行中的调用占用一个线程
+    "async_fallback_workers": 32,  # async_mode下执行同步bot、插件、channel的线程数，也是这些调用的并发上限
+    "stream_reply": False,  # 是否流式回复：支持的渠道(web、飞书、钉钉)边生成边更新消息，其余渠道不受影响
+    "stream_flush_interval": 0.5,  # 流式回复的刷新间隔(秒)，期间的增量合并为一次消息更新，首段内容立即发送
     "image_create_size": "256x256",  # 图片大小,可选有 256x256, 512x512, 1024x1024 (dall-e-3默认为1024x1024)
     "group_chat_exit_group": False,
     # chatgpt会话参数
     "expires_in_seconds": 3600,  # 无操作会话的过期时间
+    "max_sessions": 0,  # 内存中最多保留的用户会话数，超出时淘汰最久未使用的会话，0为不限制
     # 人格描述
     "character_desc": "你是ChatGPT, 一个由OpenAI训练的大型语言模型, 你旨在回答并解决人们的任何问题，并且可以使用多种语言与人交流。",
     "conversation_max_tokens": 1000,  # 支持上下文记忆的最多字符数
@@ -69,6 +80,14 @@ available_setting = {
     "presence_penalty": 0,
     "request_timeout": 180,  # chatgpt请求超时时间，openai接口默认设置为600，对于难问题一般需要较长时间
     "timeout": 120,  # chatgpt重试超时时间，在这个时间内，将会自动重试
+    # 模型、语音、翻译接口共用的HTTP连接池
+    "http_pool_connections": 16,  # 缓存连接池的host数
+    "http_pool_maxsize": 32,  # 每个host保持的最大连接数
+    "http_connect_timeout": 10,  # 未指定超时的请求的连接超时(秒)
+    "http_read_timeout": 120,  # 未指定超时的请求的读取超时(秒)
+    "http_max_retries": 2,  # 连接失败时的重试次数，GET等幂等请求遇到429/502/503/504时也会重试
+    "http_max_retry_after": 30,  # 按Retry-After重试时最多等待的秒数
+    "http_backoff_factor": 0.5,  # 重试退避系数，第n次重试等待 factor * 2^(n-1) 秒
     # Baidu 文心一言参数
     "baidu_wenxin_model": "eb-instant",  # 默认使用ERNIE-Bot-turbo模型
     "baidu_wenxin_api_key": "",  # Baidu api key
@@ -187,11 +206,23 @@ available_setting = {
     "Minimax_group_id": "",
     "Minimax_base_url": "",
     "web_port": 9899,
+    "web_server_threads": 32,  # web渠道HTTP服务的线程数，每个打开的网页(SSE连接)占用一个线程
+    "web_session_expires_in_seconds": 3600,  # web渠道会话的响应队列在无收发多久后清理
     "agent": True,  # 是否开启Agent模式
     "agent_workspace": "~/cow",  # agent工作空间路径，用于存储skills、memory等
     "agent_max_context_tokens": 50000,  # Agent模式下最大上下文tokens
     "agent_max_context_turns": 30,  # Agent模式下最大上下文记忆轮次
+    "agent_max_parallel_tools": 4,  # 同一轮中只读类工具(read、web_search等)的最大并行数，1为串行执行
+    "agent_token_estimator": "auto",  # Agent上下文裁剪的token估算方式：auto(安装了tiktoken时使用tiktoken计数)、heuristic(按字符类型估算)
+    "agent_max_sessions": 200,  # 内存中最多保留的Agent会话数，超出时淘汰最久未使用的会话（对话历史会持久化，下次请求时恢复）
+    "agent_session_expires_in_seconds": 3600,  # Agent会话闲置多久后从内存中淘汰（秒）
     "agent_max_steps": 15,  # Agent模式下单次运行最大决策步数
+    "scheduler_max_workers": 4,  # 定时任务同时执行的最大数量
+    "scheduler_max_concurrency_per_user": 2,  # 同一接收者的定时任务同时执行的最大数量，超出的任务排队等待
+    "scheduler_task_timeout": 600,  # 定时任务单次执行超时时间(秒)，超时后记为超时(任务无法被强制终止，结束前仍占用执行名额)
+    "scheduler_misfire_policy": "skip",  # 定时任务错过执行时间(服务停止或繁忙)时的处理：skip(跳过，从当前时间计算下次执行)、coalesce(合并为一次立即执行)、catch_up(逐次补执行)
+    "scheduler_misfire_grace_seconds": 300,  # 定时任务延迟超过该秒数才视为错过执行
+    "scheduler_max_catch_up": 10,  # catch_up策略下最多补执行的次数，超出时按coalesce处理
 }
 
 
@@ -26,21 +26,26 @@ class BaiduWenxinSession(Session):
             if cur_tokens is None:
                 raise e
             logger.debug("Exception when counting tokens precisely for query: {}".format(e))
-        while cur_tokens > max_tokens:
-            if len(self.messages) >= 2:
+        # 百度文心要求消息成对出现，按问答对丢弃
+        if precise:
+            drop = 0
+            while cur_tokens > max_tokens and len(self.messages) - drop >= 2:
+                cur_tokens -= self.message_tokens[drop] + self.message_tokens[drop + 1]
+                drop += 2
+            self._discard_messages(0, drop)
+        else:
+            self.message_tokens = []
+            self.total_message_tokens = 0
+            while cur_tokens > max_tokens and len(self.messages) >= 2:
                 self.messages.pop(0)
                 self.messages.pop(0)
-            else:
-                logger.debug("max_tokens={}, total_tokens={}, len(messages)={}".format(max_tokens, cur_tokens, len(self.messages)))
-                break
-            if precise:
-                cur_tokens = self.calc_tokens()
-            else:
                 cur_tokens = cur_tokens - max_tokens
+        if cur_tokens > max_tokens:
+            logger.debug("max_tokens={}, total_tokens={}, len(messages)={}".format(max_tokens, cur_tokens, len(self.messages)))
         return cur_tokens
 
-    def calc_tokens(self):
-        return num_tokens_from_messages(self.messages, self.model)
+    def count_message_tokens(self, message):
+        return num_tokens_from_messages([message], self.model)
 
 
 def num_tokens_from_messages(messages, model):
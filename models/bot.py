@@ -5,6 +5,7 @@ Auto-replay chat robot abstract class
 
 from bridge.context import Context
 from bridge.reply import Reply
+from common.async_loop import run_sync
 
 
 class Bot(object):
@@ -15,3 +16,9 @@ class Bot(object):
         :return: reply content
         """
         raise NotImplementedError
+
+    async def reply_async(self, query, context: Context = None) -> Reply:
+        """
+        async_mode下的回复接口，原生支持asyncio的bot可重写此方法，默认在线程池中执行reply
+        """
+        return await run_sync(self.reply, query, context)
@@ -1,7 +1,7 @@
 """
 channel factory
 """
-from common import const
+from common import const, http_client
 
 
 def create_bot(bot_type):
@@ -10,6 +10,7 @@ def create_bot(bot_type):
     :param bot_type: bot type code
     :return: bot instance
     """
+    http_client.install_openai_session()
     if bot_type == const.BAIDU:
         # 替换Baidu Unit为Baidu文心千帆对话接口
         # from models.baidu.baidu_unit_bot import BaiduUnitBot
@@ -2,11 +2,14 @@
 
 import time
 import json
+import asyncio
 
 import openai
 import openai.error
 import requests
+from common import http_client
 from common import const
+from common.async_loop import get_aiohttp_session, run_sync
 from models.bot import Bot
 from models.openai_compatible_bot import OpenAICompatibleBot
 from models.chatgpt.chat_gpt_session import ChatGPTSession
@@ -72,50 +75,16 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAICompatibleBot):
             logger.info("[CHATGPT] query={}".format(query))
 
             session_id = context["session_id"]
-            reply = None
-            clear_memory_commands = conf().get("clear_memory_commands", ["#清除记忆"])
-            if query in clear_memory_commands:
-                self.sessions.clear_session(session_id)
-                reply = Reply(ReplyType.INFO, "记忆已清除")
-            elif query == "#清除所有":
-                self.sessions.clear_all_session()
-                reply = Reply(ReplyType.INFO, "所有人记忆已清除")
-            elif query == "#更新配置":
-                load_config()
-                reply = Reply(ReplyType.INFO, "配置已更新")
+            reply = self._command_reply(query, session_id)
             if reply:
                 return reply
             session = self.sessions.session_query(query, session_id)
             logger.debug("[CHATGPT] session query={}".format(session.messages))
 
             api_key = context.get("openai_api_key")
-            model = context.get("gpt_model")
-            new_args = None
-            if model:
-                new_args = self.args.copy()
-                new_args["model"] = model
-            # if context.get('stream'):
-            #     # reply in stream
-            #     return self.reply_text_stream(query, new_query, session_id)
-
-            reply_content = self.reply_text(session, api_key, args=new_args)
-            logger.debug(
-                "[CHATGPT] new_query={}, session_id={}, reply_cont={}, completion_tokens={}".format(
-                    session.messages,
-                    session_id,
-                    reply_content["content"],
-                    reply_content["completion_tokens"],
-                )
-            )
-            if reply_content["completion_tokens"] == 0 and len(reply_content["content"]) > 0:
-                reply = Reply(ReplyType.ERROR, reply_content["content"])
-            elif reply_content["completion_tokens"] > 0:
-                self.sessions.session_reply(reply_content["content"], session_id, reply_content["total_tokens"])
-                reply = Reply(ReplyType.TEXT, reply_content["content"])
-            else:
-                reply = Reply(ReplyType.ERROR, reply_content["content"])
-                logger.debug("[CHATGPT] reply {} used 0 tokens.".format(reply_content))
-            return reply
+            # 渠道支持流式回复时，边生成边推送增量
+            reply_content = self.reply_text(session, api_key, args=self._context_args(context), reply_stream=context.get("reply_stream"))
+            return self._build_text_reply(session, reply_content)
 
         elif context.type == ContextType.IMAGE_CREATE:
             ok, retstring = self.create_img(query, 0)
@@ -129,12 +98,70 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAICompatibleBot):
             reply = Reply(ReplyType.ERROR, "Bot不支持处理{}类型的消息".format(context.type))
             return reply
 
-    def reply_text(self, session: ChatGPTSession, api_key=None, args=None, retry_count=0) -> dict:
+    async def reply_async(self, query, context=None):
+        """
+        async_mode下普通文本回复通过aiohttp请求接口，等待期间不占用线程；
+        流式回复、命令和图片等其余请求仍在线程池中执行reply
+        """
+        if context.type != ContextType.TEXT or context.get("reply_stream") or self._is_command(query):
+            return await super().reply_async(query, context)
+        logger.info("[CHATGPT] query={}".format(query))
+        session = self.sessions.session_query(query, context["session_id"])
+        logger.debug("[CHATGPT] session query={}".format(session.messages))
+        reply_content = await self.reply_text_async(session, context.get("openai_api_key"), args=self._context_args(context))
+        return self._build_text_reply(session, reply_content)
+
+    @staticmethod
+    def _is_command(query) -> bool:
+        return query in conf().get("clear_memory_commands", ["#清除记忆"]) or query in ["#清除所有", "#更新配置"]
+
+    def _command_reply(self, query, session_id):
+        if query in conf().get("clear_memory_commands", ["#清除记忆"]):
+            self.sessions.clear_session(session_id)
+            return Reply(ReplyType.INFO, "记忆已清除")
+        elif query == "#清除所有":
+            self.sessions.clear_all_session()
+            return Reply(ReplyType.INFO, "所有人记忆已清除")
+        elif query == "#更新配置":
+            load_config()
+            return Reply(ReplyType.INFO, "配置已更新")
+        return None
+
+    def _context_args(self, context):
+        model = context.get("gpt_model")
+        if not model:
+            return None
+        new_args = self.args.copy()
+        new_args["model"] = model
+        return new_args
+
+    def _build_text_reply(self, session: ChatGPTSession, reply_content: dict) -> Reply:
+        session_id = session.session_id
+        logger.debug(
+            "[CHATGPT] new_query={}, session_id={}, reply_cont={}, completion_tokens={}".format(
+                session.messages,
+                session_id,
+                reply_content["content"],
+                reply_content["completion_tokens"],
+            )
+        )
+        if reply_content["completion_tokens"] == 0 and len(reply_content["content"]) > 0:
+            reply = Reply(ReplyType.ERROR, reply_content["content"])
+        elif reply_content["completion_tokens"] > 0:
+            self.sessions.session_reply(reply_content["content"], session_id, reply_content["total_tokens"])
+            reply = Reply(ReplyType.TEXT, reply_content["content"])
+        else:
+            reply = Reply(ReplyType.ERROR, reply_content["content"])
+            logger.debug("[CHATGPT] reply {} used 0 tokens.".format(reply_content))
+        return reply
+
+    def reply_text(self, session: ChatGPTSession, api_key=None, args=None, retry_count=0, reply_stream=None) -> dict:
         """
         call openai's ChatCompletion to get the answer
         :param session: a conversation session
         :param session_id: session id
         :param retry_count: retry count
+        :param reply_stream: ReplyStream of the channel, request in stream mode and feed the deltas to it
         :return: {}
         """
         try:
@@ -143,47 +170,105 @@ class ChatGPTBot(Bot, OpenAIImage, OpenAICompatibleBot):
             # if api_key == None, the default openai.api_key will be used
             if args is None:
                 args = self.args
+            if reply_stream:
+                return self._reply_text_stream(session, api_key, args, reply_stream)
             response = openai.ChatCompletion.create(api_key=api_key, messages=session.messages, **args)
-            # logger.debug("[CHATGPT] response={}".format(response))
-            logger.info("[ChatGPT] reply={}, total_tokens={}".format(response.choices[0]['message']['content'], response["usage"]["total_tokens"]))
-            return {
-                "total_tokens": response["usage"]["total_tokens"],
-                "completion_tokens": response["usage"]["completion_tokens"],
-                "content": response.choices[0]["message"]["content"],
-            }
+            return self._parse_response(response)
         except Exception as e:
-            need_retry = retry_count < 2
-            result = {"completion_tokens": 0, "content": "我现在有点累了，等会再来吧"}
-            if isinstance(e, openai.error.RateLimitError):
-                logger.warn("[CHATGPT] RateLimitError: {}".format(e))
-                result["content"] = "提问太快啦，请休息一下再问我吧"
-                if need_retry:
-                    time.sleep(20)
-            elif isinstance(e, openai.error.Timeout):
-                logger.warn("[CHATGPT] Timeout: {}".format(e))
-                result["content"] = "我没有收到你的消息"
-                if need_retry:
-                    time.sleep(5)
-            elif isinstance(e, openai.error.APIError):
-                logger.warn("[CHATGPT] Bad Gateway: {}".format(e))
-                result["content"] = "请再问我一次"
-                if need_retry:
-                    time.sleep(10)
-            elif isinstance(e, openai.error.APIConnectionError):
-                logger.warn("[CHATGPT] APIConnectionError: {}".format(e))
-                result["content"] = "我连接不到你的网络"
-                if need_retry:
-                    time.sleep(5)
-            else:
-                logger.exception("[CHATGPT] Exception: {}".format(e))
-                need_retry = False
-                self.sessions.clear_session(session.session_id)
+            result, delay = self._handle_error(e, session, retry_count)
+            if delay is None:
+                return result
+            time.sleep(delay)
+            logger.warn("[CHATGPT] 第{}次重试".format(retry_count + 1))
+            return self.reply_text(session, api_key, args, retry_count + 1, reply_stream)
 
-            if need_retry:
-                logger.warn("[CHATGPT] 第{}次重试".format(retry_count + 1))
-                return self.reply_text(session, api_key, args, retry_count + 1)
-            else:
+    async def reply_text_async(self, session: ChatGPTSession, api_key=None, args=None, retry_count=0) -> dict:
+        """
+        reply_text的异步版本，通过openai的aiohttp接口请求，重试等待使用asyncio.sleep
+        """
+        try:
+            if conf().get("rate_limit_chatgpt") and not await run_sync(self.tb4chatgpt.get_token):
+                raise openai.error.RateLimitError("RateLimitError: rate limit exceeded")
+            if args is None:
+                args = self.args
+            openai.aiosession.set(get_aiohttp_session())
+            response = await openai.ChatCompletion.acreate(api_key=api_key, messages=session.messages, **args)
+            return self._parse_response(response)
+        except Exception as e:
+            result, delay = self._handle_error(e, session, retry_count)
+            if delay is None:
                 return result
+            await asyncio.sleep(delay)
+            logger.warn("[CHATGPT] 第{}次重试".format(retry_count + 1))
+            return await self.reply_text_async(session, api_key, args, retry_count + 1)
+
+    @staticmethod
+    def _parse_response(response) -> dict:
+        # logger.debug("[CHATGPT] response={}".format(response))
+        logger.info("[ChatGPT] reply={}, total_tokens={}".format(response.choices[0]['message']['content'], response["usage"]["total_tokens"]))
+        return {
+            "total_tokens": response["usage"]["total_tokens"],
+            "completion_tokens": response["usage"]["completion_tokens"],
+            "content": response.choices[0]["message"]["content"],
+        }
+
+    def _handle_error(self, e, session: ChatGPTSession, retry_count):
+        """
+        :return: (失败时返回的结果, 重试前的等待秒数)，不再重试时等待秒数为None
+        """
+        need_retry = retry_count < 2
+        result = {"completion_tokens": 0, "content": "我现在有点累了，等会再来吧"}
+        delay = None
+        if isinstance(e, openai.error.RateLimitError):
+            logger.warn("[CHATGPT] RateLimitError: {}".format(e))
+            result["content"] = "提问太快啦，请休息一下再问我吧"
+            delay = 20
+        elif isinstance(e, openai.error.Timeout):
+            logger.warn("[CHATGPT] Timeout: {}".format(e))
+            result["content"] = "我没有收到你的消息"
+            delay = 5
+        elif isinstance(e, openai.error.APIError):
+            logger.warn("[CHATGPT] Bad Gateway: {}".format(e))
+            result["content"] = "请再问我一次"
+            delay = 10
+        elif isinstance(e, openai.error.APIConnectionError):
+            logger.warn("[CHATGPT] APIConnectionError: {}".format(e))
+            result["content"] = "我连接不到你的网络"
+            delay = 5
+        else:
+            logger.exception("[CHATGPT] Exception: {}".format(e))
+            self.sessions.clear_session(session.session_id)
+        return result, delay if need_retry else None
+
+    def _reply_text_stream(self, session: ChatGPTSession, api_key, args, reply_stream) -> dict:
+        """
+        stream mode of reply_text, errors before the first delta are raised for the normal retry,
+        later errors keep the partial answer since it is already shown to the user
+        """
+        response = openai.ChatCompletion.create(api_key=api_key, messages=session.messages, stream=True, **args)
+        content = ""
+        try:
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].get("delta", {}).get("content")
+                if delta:
+                    content += delta
+                    reply_stream.feed(delta)
+        except Exception as e:
+            if not content:
+                raise
+            logger.warn("[CHATGPT] stream interrupted, keep partial reply: {}".format(e))
+        logger.info("[ChatGPT] reply={}, stream=True".format(content))
+        try:
+            completion_tokens = session.count_message_tokens({"role": "assistant", "content": content})
+        except Exception:
+            completion_tokens = len(content)
+        return {
+            "total_tokens": None,  # stream responses carry no usage, the session counts tokens itself
+            "completion_tokens": completion_tokens if content else 0,
+            "content": content,
+        }
 
 class AzureChatGPTBot(ChatGPTBot):
     def __init__(self):
@@ -205,13 +290,13 @@ class AzureChatGPTBot(ChatGPTBot):
             headers = {"api-key": api_key, "Content-Type": "application/json"}
             try:
                 body = {"prompt": query, "size": conf().get("image_create_size", "256x256"),"n": 1}
-                submission = requests.post(url, headers=headers, json=body)
+                submission = http_client.post(url, headers=headers, json=body)
                 operation_location = submission.headers['operation-location']
                 status = ""
                 while (status != "succeeded"):
                     if retry_count > 3:
                         return False, "图片生成失败"
-                    response = requests.get(operation_location, headers=headers)
+                    response = http_client.get(operation_location, headers=headers)
                     status = response.json()['status']
                     retry_count += 1
                 image_url = response.json()['result']['data'][0]['url']
@@ -230,7 +315,7 @@ class AzureChatGPTBot(ChatGPTBot):
             headers = {"api-key": api_key, "Content-Type": "application/json"}
             try:
                 body = {"prompt": query, "size": conf().get("image_create_size", "1024x1024"), "quality": conf().get("dalle3_image_quality", "standard")}
-                response = requests.post(url, headers=headers, json=body)
+                response = http_client.post(url, headers=headers, json=body)
                 response.raise_for_status()  # 检查请求是否成功
                 data = response.json()
 
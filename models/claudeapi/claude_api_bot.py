@@ -4,6 +4,7 @@ import json
 import time
 
 import requests
+from common import http_client
 
 from models.baidu.baidu_wenxin_session import BaiduWenxinSession
 from models.bot import Bot
@@ -112,7 +113,7 @@ class ClaudeAPIBot(Bot, OpenAIImage):
 
             # Make HTTP request
             proxies = {"http": self.proxy, "https": self.proxy} if self.proxy else None
-            response = requests.post(
+            response = http_client.post(
                 f"{self.api_base}/messages",
                 headers=headers,
                 json=data,
@@ -289,7 +290,7 @@ class ClaudeAPIBot(Bot, OpenAIImage):
 
         # Make HTTP request
         proxies = {"http": self.proxy, "https": self.proxy} if self.proxy else None
-        response = requests.post(
+        response = http_client.post(
             f"{self.api_base}/messages",
             headers=headers,
             json=request_params,
@@ -370,7 +371,7 @@ class ClaudeAPIBot(Bot, OpenAIImage):
         try:
             # Make streaming HTTP request
             proxies = {"http": self.proxy, "https": self.proxy} if self.proxy else None
-            response = requests.post(
+            response = http_client.post(
                 f"{self.api_base}/messages",
                 headers=headers,
                 json=request_params,
@@ -8,7 +8,7 @@ Google gemini bot
 
 import json
 import time
-import requests
+from common import http_client
 from models.bot import Bot
 import google.generativeai as genai
 from models.session_manager import SessionManager
@@ -263,7 +263,7 @@ class GoogleGeminiBot(Bot):
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(
+            response = http_client.post(
                 endpoint,
                 headers=headers,
                 json=payload,
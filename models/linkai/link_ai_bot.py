@@ -3,7 +3,7 @@
 
 import re
 import time
-import requests
+from common import http_client
 import json
 import config
 from models.bot import Bot
@@ -137,7 +137,7 @@ class LinkAIBot(Bot, OpenAICompatibleBot):
 
             # do http request
             base_url = conf().get("linkai_api_base", "https://api.link-ai.tech")
-            res = requests.post(url=base_url + "/v1/chat/completions", json=body, headers=headers,
+            res = http_client.post(url=base_url + "/v1/chat/completions", json=body, headers=headers,
                                 timeout=conf().get("request_timeout", 180))
             if res.status_code == 200:
                 # execute success
@@ -276,7 +276,7 @@ class LinkAIBot(Bot, OpenAICompatibleBot):
 
             # do http request
             base_url = conf().get("linkai_api_base", "https://api.link-ai.tech")
-            res = requests.post(url=base_url + "/v1/chat/completions", json=body, headers=headers,
+            res = http_client.post(url=base_url + "/v1/chat/completions", json=body, headers=headers,
                                 timeout=conf().get("request_timeout", 180))
             if res.status_code == 200:
                 # execute success
@@ -320,7 +320,7 @@ class LinkAIBot(Bot, OpenAICompatibleBot):
         # do http request
         base_url = conf().get("linkai_api_base", "https://api.link-ai.tech")
         params = {"app_code": app_code}
-        res = requests.get(url=base_url + "/v1/app/info", params=params, headers=headers, timeout=(5, 10))
+        res = http_client.get(url=base_url + "/v1/app/info", params=params, headers=headers, timeout=(5, 10))
         if res.status_code == 200:
             return res.json()
         else:
@@ -341,7 +341,7 @@ class LinkAIBot(Bot, OpenAICompatibleBot):
                 "img_proxy": conf().get("image_proxy")
             }
             url = conf().get("linkai_api_base", "https://api.link-ai.tech") + "/v1/images/generations"
-            res = requests.post(url, headers=headers, json=data, timeout=(5, 90))
+            res = http_client.post(url, headers=headers, json=data, timeout=(5, 90))
             t2 = time.time()
             image_url = res.json()["data"][0]["url"]
             logger.info("[OPEN_AI] image_url={}".format(image_url))
@@ -444,7 +444,7 @@ def _download_file(url: str):
             os.makedirs(file_path)
         file_name = url.split("/")[-1]  # 获取文件名
         file_path = os.path.join(file_path, file_name)
-        response = requests.get(url)
+        response = http_client.get(url)
         with open(file_path, "wb") as f:
             f.write(response.content)
         return file_path
@@ -569,7 +569,7 @@ def _linkai_call_with_tools(self, messages, tools=None, stream=False, **kwargs):
 def _handle_linkai_sync_response(self, base_url, headers, body):
     """Handle synchronous LinkAI API response"""
     try:
-        res = requests.post(
+        res = http_client.post(
             url=base_url + "/v1/chat/completions",
             json=body,
             headers=headers,
@@ -595,7 +595,7 @@ def _handle_linkai_sync_response(self, base_url, headers, body):
 def _handle_linkai_stream_response(self, base_url, headers, body):
     """Handle streaming LinkAI API response"""
     try:
-        res = requests.post(
+        res = http_client.post(
             url=base_url + "/v1/chat/completions",
             json=body,
             headers=headers,
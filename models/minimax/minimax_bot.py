@@ -4,6 +4,7 @@ import time
 import json
 from pydantic.types import T
 import requests
+from common import http_client
 
 from models.bot import Bot
 from models.minimax.minimax_session import MinimaxSession
@@ -115,7 +116,7 @@ class MinimaxBot(Bot):
             url = f"{self.api_base}/chat/completions"
             logger.debug(f"[MINIMAX] Calling {url} with model={request_body['model']}")
 
-            response = requests.post(url, headers=headers, json=request_body, timeout=60)
+            response = http_client.post(url, headers=headers, json=request_body, timeout=60)
 
             if response.status_code == 200:
                 result = response.json()
@@ -405,7 +406,7 @@ class MinimaxBot(Bot):
             request_body.pop("stream", None)
 
             url = f"{self.api_base}/chat/completions"
-            response = requests.post(url, headers=headers, json=request_body, timeout=60)
+            response = http_client.post(url, headers=headers, json=request_body, timeout=60)
 
             if response.status_code != 200:
                 error_msg = response.text
@@ -482,7 +483,7 @@ class MinimaxBot(Bot):
             }
 
             url = f"{self.api_base}/chat/completions"
-            response = requests.post(url, headers=headers, json=request_body, stream=True, timeout=60)
+            response = http_client.post(url, headers=headers, json=request_body, stream=True, timeout=60)
 
             if response.status_code != 200:
                 error_msg = response.text
@@ -11,7 +11,7 @@ from bridge.reply import Reply, ReplyType
 from common.log import logger
 from config import conf, load_config
 from .modelscope_session import ModelScopeSession
-import requests
+from common import http_client
 
 
 # ModelScope对话模型API
@@ -115,7 +115,7 @@ class ModelScopeBot(Bot):
             
             body = args
             body["messages"] = session.messages
-            res = requests.post(
+            res = http_client.post(
                 self.base_url,
                 headers=headers,
                 data=json.dumps(body)
@@ -185,7 +185,7 @@ class ModelScopeBot(Bot):
             body["messages"] = session.messages
             body["stream"] = True  # 启用流式响应
 
-            res = requests.post(
+            res = http_client.post(
                 self.base_url,
                 headers=headers,
                 data=json.dumps(body),
@@ -265,7 +265,7 @@ class ModelScopeBot(Bot):
             json_payload = json.dumps(payload, ensure_ascii=False).encode('utf-8')
             
             # 使用 data 参数发送原始字符串（requests 会自动处理编码）
-            res = requests.post(url, headers=headers, data=json_payload)
+            res = http_client.post(url, headers=headers, data=json_payload)
             
             response_data = res.json()
             image_url = response_data['images'][0]['url']
@@ -7,6 +7,8 @@ class Session(object):
     def __init__(self, session_id, system_prompt=None):
         self.session_id = session_id
         self.messages = []
+        self.message_tokens = []  # 与messages一一对应的token数缓存，每条消息只计算一次
+        self.total_message_tokens = 0  # message_tokens之和
         if system_prompt is None:
             self.system_prompt = conf().get("character_desc", "")
         else:
@@ -16,6 +18,8 @@ class Session(object):
     def reset(self):
         system_item = {"role": "system", "content": self.system_prompt}
         self.messages = [system_item]
+        self.message_tokens = []
+        self.total_message_tokens = 0
 
     def set_system_prompt(self, system_prompt):
         self.system_prompt = system_prompt
@@ -29,17 +33,88 @@ class Session(object):
         assistant_item = {"role": "assistant", "content": reply}
         self.messages.append(assistant_item)
 
-    def discard_exceeding(self, max_tokens=None, cur_tokens=None):
+    def count_message_tokens(self, message) -> int:
+        """
+        单条消息的token数，子类按模型实现
+        """
         raise NotImplementedError
 
+    def extra_tokens(self) -> int:
+        """
+        与消息条数无关的额外token数，如回复前缀
+        """
+        return 0
+
+    def is_reply(self, message) -> bool:
+        return message.get("role") == "assistant"
+
+    def _sync_message_tokens(self):
+        # 只为新增的消息计算token数；messages被直接截断时重新计算
+        if len(self.message_tokens) > len(self.messages):
+            self.message_tokens = []
+            self.total_message_tokens = 0
+        for message in self.messages[len(self.message_tokens):]:
+            tokens = self.count_message_tokens(message)
+            self.message_tokens.append(tokens)
+            self.total_message_tokens += tokens
+
+    def _discard_messages(self, start, count):
+        if count <= 0:
+            return
+        del self.messages[start:start + count]
+        self.total_message_tokens -= sum(self.message_tokens[start:start + count])
+        del self.message_tokens[start:start + count]
+
+    def discard_exceeding(self, max_tokens=None, cur_tokens=None):
+        """
+        从最早的历史消息开始丢弃，直到token数不超过max_tokens，保留首条消息(system)和最新一条消息
+        """
+        precise = True
+        try:
+            cur_tokens = self.calc_tokens()
+        except Exception as e:
+            precise = False
+            if cur_tokens is None:
+                raise e
+            logger.debug("Exception when counting tokens precisely for query: {}".format(e))
+        if precise:
+            # 使用缓存的单条token数一次遍历算出需要丢弃的消息数
+            drop = 0
+            while cur_tokens > max_tokens and len(self.messages) - drop > 2:
+                cur_tokens -= self.message_tokens[1 + drop]
+                drop += 1
+            self._discard_messages(1, drop)
+        else:
+            self.message_tokens = []
+            self.total_message_tokens = 0
+            while cur_tokens > max_tokens and len(self.messages) > 2:
+                self.messages.pop(1)
+                cur_tokens = cur_tokens - max_tokens
+        if cur_tokens > max_tokens:
+            if len(self.messages) == 2 and self.is_reply(self.messages[1]):
+                if precise:
+                    self._discard_messages(1, 1)
+                    cur_tokens = self.calc_tokens()
+                else:
+                    self.messages.pop(1)
+                    cur_tokens = cur_tokens - max_tokens
+            elif len(self.messages) == 2:
+                logger.warn("user message exceed max_tokens. total_tokens={}".format(cur_tokens))
+            else:
+                logger.debug("max_tokens={}, total_tokens={}, len(messages)={}".format(max_tokens, cur_tokens, len(self.messages)))
+        return cur_tokens
+
     def calc_tokens(self):
-        raise NotImplementedError
+        self._sync_message_tokens()
+        return self.total_message_tokens + self.extra_tokens()
 
 
 class SessionManager(object):
     def __init__(self, sessioncls, **session_args):
-        if conf().get("expires_in_seconds"):
-            sessions = ExpiredDict(conf().get("expires_in_seconds"))
+        expires_in_seconds = conf().get("expires_in_seconds")
+        max_sessions = conf().get("max_sessions", 0)
+        if expires_in_seconds or max_sessions:
+            sessions = ExpiredDict(expires_in_seconds or float("inf"), max_size=max_sessions)
         else:
             sessions = dict()
         self.sessions = sessions
@@ -2,6 +2,8 @@
 
 import json
 import os
+import threading
+import time
 
 import plugins
 from bridge.context import ContextType
@@ -9,7 +11,7 @@ from bridge.reply import Reply, ReplyType
 from common.log import logger
 from plugins import *
 
-from .lib.WordsSearch import WordsSearch
+from .lib.matcher import BanwordsMatcher, words_digest
 
 
 @plugins.register(
@@ -35,16 +37,15 @@ class Banwords(Plugin):
                     with open(config_path, "w") as f:
                         json.dump(conf, f, indent=4)
 
-            self.searchr = WordsSearch()
             self.action = conf["action"]
-            banwords_path = os.path.join(curdir, "banwords.txt")
-            with open(banwords_path, "r", encoding="utf-8") as f:
-                words = []
-                for line in f:
-                    word = line.strip()
-                    if word:
-                        words.append(word)
-            self.searchr.SetKeywords(words)
+            # 检查banwords.txt是否修改的最小间隔(秒)，<=0 表示不自动重载
+            self.reload_interval = conf.get("reload_interval", 5)
+            self.banwords_path = os.path.join(curdir, "banwords.txt")
+            self.cache_path = os.path.join(curdir, "banwords.dat")
+            self._reload_lock = threading.Lock()
+            self._last_check = time.time()
+            self._mtime = self._get_mtime()
+            self.matcher = self._load_matcher()
             self.handlers[Event.ON_HANDLE_CONTEXT] = self.on_handle_context
             if conf.get("reply_filter", True):
                 self.handlers[Event.ON_DECORATE_REPLY] = self.on_decorate_reply
@@ -54,6 +55,69 @@ class Banwords(Plugin):
             logger.debug("[Banwords] init failed, ignore or see https://github.com/zhayujie/chatgpt-on-wechat/tree/master/plugins/banwords .")
             raise e
 
+    def _get_mtime(self):
+        try:
+            return os.path.getmtime(self.banwords_path)
+        except OSError:
+            return None
+
+    def _load_matcher(self):
+        """
+        读取词库并得到匹配自动机：词库未变化时直接读取缓存文件banwords.dat，否则重新构建并写入缓存
+        """
+        with open(self.banwords_path, "r", encoding="utf-8") as f:
+            words = list(dict.fromkeys(word for word in (line.strip() for line in f) if word))
+        digest = words_digest(words)
+        matcher = BanwordsMatcher.load(self.cache_path, digest)
+        if matcher is not None:
+            logger.debug("[Banwords] loaded {} words from cache".format(len(matcher)))
+            return matcher
+        start = time.time()
+        matcher = BanwordsMatcher.build(words)
+        logger.info("[Banwords] built matcher for {} words in {:.2f}s".format(len(matcher), time.time() - start))
+        try:
+            tmp_path = self.cache_path + ".tmp"
+            matcher.save(tmp_path, digest)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warn("[Banwords] save cache failed: {}".format(e))
+        return matcher
+
+    def _rebuild(self):
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            # 读取词库前记录mtime，重建期间再次修改的文件会在下次检查时重新加载
+            mtime = self._get_mtime()
+            try:
+                self.matcher = self._load_matcher()
+                logger.info("[Banwords] banwords.txt reloaded")
+            except Exception as e:
+                logger.warn("[Banwords] reload banwords.txt failed: {}".format(e))
+            self._mtime = mtime
+        finally:
+            self._reload_lock.release()
+
+    def _check_reload(self):
+        """
+        词库文件修改后在后台线程重建自动机，完成前继续使用旧的自动机
+        """
+        if self.reload_interval <= 0:
+            return
+        now = time.time()
+        if now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+        if self._reload_lock.locked():
+            return
+        mtime = self._get_mtime()
+        if mtime is None or mtime == self._mtime:
+            return
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def reload(self):
+        self._rebuild()
+
     def on_handle_context(self, e_context: EventContext):
         if e_context["context"].type not in [
             ContextType.TEXT,
@@ -63,15 +127,18 @@ class Banwords(Plugin):
 
         content = e_context["context"].content
         logger.debug("[Banwords] on_handle_context. content: %s" % content)
+        self._check_reload()
+        matcher = self.matcher
         if self.action == "ignore":
-            f = self.searchr.FindFirst(content)
+            f = matcher.find_first(content)
             if f:
-                logger.info("[Banwords] %s in message" % f["Keyword"])
+                logger.info("[Banwords] %s in message" % f[0])
                 e_context.action = EventAction.BREAK_PASS
                 return
         elif self.action == "replace":
-            if self.searchr.ContainsAny(content):
-                reply = Reply(ReplyType.INFO, "发言中包含敏感词，请重试: \n" + self.searchr.Replace(content))
+            keyword, replaced = matcher.scan(content)
+            if keyword:
+                reply = Reply(ReplyType.INFO, "发言中包含敏感词，请重试: \n" + replaced)
                 e_context["reply"] = reply
                 e_context.action = EventAction.BREAK_PASS
                 return
@@ -82,16 +149,19 @@ class Banwords(Plugin):
 
         reply = e_context["reply"]
         content = reply.content
+        self._check_reload()
+        matcher = self.matcher
         if self.reply_action == "ignore":
-            f = self.searchr.FindFirst(content)
+            f = matcher.find_first(content)
             if f:
-                logger.info("[Banwords] %s in reply" % f["Keyword"])
+                logger.info("[Banwords] %s in reply" % f[0])
                 e_context["reply"] = None
                 e_context.action = EventAction.BREAK_PASS
                 return
         elif self.reply_action == "replace":
-            if self.searchr.ContainsAny(content):
-                reply = Reply(ReplyType.INFO, "已替换回复中的敏感词: \n" + self.searchr.Replace(content))
+            keyword, replaced = matcher.scan(content)
+            if keyword:
+                reply = Reply(ReplyType.INFO, "已替换回复中的敏感词: \n" + replaced)
                 e_context["reply"] = reply
                 e_context.action = EventAction.CONTINUE
                 return
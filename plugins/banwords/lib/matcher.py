@@ -0,0 +1,201 @@
+# encoding:utf-8
+"""
+敏感词匹配自动机(Aho–Corasick)，状态数据保存在array数组中
+
+- 转移边以 (状态 << 21 | 字符码) 为键保存在两个平行数组中，运行时装入一个整数键的dict，每个字符一次哈希查找
+- fail指针、每个状态结尾的最长敏感词(out_word)均为array('i')
+- scan() 一次扫描同时得到是否命中和替换后的文本，find_first() 命中即返回
+- save()/load() 把数组直接写入/读出文件，启动时无需重新构建
+"""
+
+import hashlib
+import json
+import re
+import sys
+from array import array
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+_MAGIC = b"BWAC"
+_FORMAT_VERSION = 1
+_CODE_BITS = 21  # unicode码点不超过0x10FFFF
+_CODE_MASK = (1 << _CODE_BITS) - 1
+
+
+def words_digest(words: Iterable[str]) -> str:
+    """词表摘要，用于判断缓存文件是否对应当前词表"""
+    return hashlib.sha1("\n".join(words).encode("utf-8")).hexdigest()
+
+
+class BanwordsMatcher:
+    def __init__(self, words: List[str], keys: array, targets: array, fail: array, out_word: array):
+        self.words = words
+        self._keys = keys
+        self._targets = targets
+        self._fail = fail
+        self._out_word = out_word  # 以该状态结尾的最长敏感词下标，-1表示无
+        self._word_len = array("i", map(len, words))
+        self._goto = dict(zip(keys, targets))
+        # 可作为敏感词首字的字符，扫描从第一个首字处开始
+        first_chars = sorted({chr(key & _CODE_MASK) for key in keys if key >> _CODE_BITS == 0})
+        self._first_re = re.compile("[" + "".join(re.escape(c) for c in first_chars) + "]") if first_chars else None
+
+    @classmethod
+    def build(cls, words: Iterable[str]) -> "BanwordsMatcher":
+        words = list(dict.fromkeys(w for w in words if w))
+        goto = {}
+        children = [[]]
+        word_end = array("i", [-1])
+        for index, word in enumerate(words):
+            state = 0
+            for ch in word:
+                key = (state << _CODE_BITS) | ord(ch)
+                nxt = goto.get(key)
+                if nxt is None:
+                    nxt = len(children)
+                    goto[key] = nxt
+                    children[state].append((ord(ch), nxt))
+                    children.append([])
+                    word_end.append(-1)
+                state = nxt
+            word_end[state] = index
+
+        # 按层(BFS)计算fail指针和每个状态的输出
+        count = len(children)
+        fail = array("i", [0]) * count
+        out_word = array("i", word_end)
+        queue = deque()
+        for _, child in children[0]:
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            if out_word[state] < 0:
+                out_word[state] = out_word[fail[state]]
+            for code, child in children[state]:
+                f = fail[state]
+                target = goto.get((f << _CODE_BITS) | code)
+                while target is None and f:
+                    f = fail[f]
+                    target = goto.get((f << _CODE_BITS) | code)
+                fail[child] = target if target is not None and target != child else 0
+                queue.append(child)
+
+        keys = array("q", goto.keys())
+        targets = array("i", goto.values())
+        return cls(words, keys, targets, fail, out_word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def _matches(self, text: str):
+        """逐个产出 (结束位置, 该位置结尾的最长敏感词下标)"""
+        # 不含任何敏感词首字的文本(如纯英文消息)直接返回
+        first = self._first_re.search(text) if self._first_re else None
+        if first is None:
+            return
+        goto_get = self._goto.get
+        fail = self._fail
+        out_word = self._out_word
+        state = 0
+        for i in range(first.start(), len(text)):
+            code = ord(text[i])
+            nxt = goto_get((state << _CODE_BITS) | code)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto_get((state << _CODE_BITS) | code)
+            if nxt is None:
+                state = 0
+                continue
+            state = nxt
+            if out_word[state] >= 0:
+                yield i, out_word[state]
+
+    def find_first(self, text: str) -> Optional[Tuple[str, int, int]]:
+        """
+        查找第一个敏感词（按结束位置）
+        :return: (敏感词, 起始位置, 结束位置)，未命中时返回None
+        """
+        for end, word in self._matches(text):
+            keyword = self.words[word]
+            return keyword, end + 1 - len(keyword), end
+        return None
+
+    def contains_any(self, text: str) -> bool:
+        return self.find_first(text) is not None
+
+    def scan(self, text: str, replace_char: str = "*") -> Tuple[Optional[str], str]:
+        """
+        一次扫描得到命中结果和替换后的文本
+        :return: (第一个命中的敏感词, 替换后的文本)，未命中时为 (None, 原文本)
+        """
+        first = None
+        spans = []
+        word_len = self._word_len
+        for end, word in self._matches(text):
+            if first is None:
+                first = self.words[word]
+            start = end + 1 - word_len[word]
+            if spans and start <= spans[-1][1]:
+                # 与上一段重叠或相邻，合并
+                spans[-1][0] = min(spans[-1][0], start)
+                spans[-1][1] = end + 1
+            else:
+                spans.append([start, end + 1])
+        if first is None:
+            return None, text
+        parts = []
+        pos = 0
+        for start, end in spans:
+            parts.append(text[pos:start])
+            parts.append(replace_char * (end - start))
+            pos = end
+        parts.append(text[pos:])
+        return first, "".join(parts)
+
+    def replace(self, text: str, replace_char: str = "*") -> str:
+        return self.scan(text, replace_char)[1]
+
+    def save(self, path: str, digest: str):
+        """
+        保存自动机，digest为词表摘要(words_digest)，load时用于校验
+        """
+        header = json.dumps({
+            "version": _FORMAT_VERSION,
+            "digest": digest,
+            "byteorder": sys.byteorder,
+            "words": len(self.words),
+            "edges": len(self._keys),
+            "states": len(self._fail),
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            for arr in (self._keys, self._targets, self._fail, self._out_word):
+                arr.tofile(f)
+            f.write("\n".join(self.words).encode("utf-8"))
+
+    @classmethod
+    def load(cls, path: str, digest: str) -> Optional["BanwordsMatcher"]:
+        """
+        读取save保存的自动机，文件不存在、格式不符或与digest对应的词表不一致时返回None
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(4) != _MAGIC:
+                    return None
+                header = json.loads(f.read(int.from_bytes(f.read(4), "little")))
+                if (header.get("version") != _FORMAT_VERSION or header.get("digest") != digest
+                        or header.get("byteorder") != sys.byteorder):
+                    return None
+                keys, targets, fail, out_word = array("q"), array("i"), array("i"), array("i")
+                keys.fromfile(f, header["edges"])
+                targets.fromfile(f, header["edges"])
+                fail.fromfile(f, header["states"])
+                out_word.fromfile(f, header["states"])
+                words = f.read().decode("utf-8").split("\n") if header["words"] else []
+        except (OSError, ValueError, EOFError, KeyError):
+            return None
+        if len(words) != header["words"]:
+            return None
+        return cls(words, keys, targets, fail, out_word)
@@ -131,6 +131,14 @@ ADMIN_COMMANDS = {
         "alias": ["debug", "调试模式", "DEBUG"],
         "desc": "开启机器调试日志",
     },
+    "pools": {
+        "alias": ["pools", "线程池"],
+        "desc": "查看消息处理线程池状态",
+    },
+    "pstats": {
+        "alias": ["pstats", "插件耗时"],
+        "desc": "查看各插件处理耗时",
+    },
 }
 
 
@@ -353,6 +361,19 @@ class Godcmd(Plugin):
                             else:
                                 logger.setLevel(logging.DEBUG)
                                 ok, result = True, "DEBUG模式已开启"
+                        elif cmd == "pools":
+                            from channel.chat_channel import handler_pool_stats
+                            ok = True
+                            result = "线程池状态：\n"
+                            for stats in handler_pool_stats():
+                                result += f"{stats['name']}: 活跃 {stats['active_workers']}/{stats['max_workers']}, 排队 {stats['queue_depth']}, " \
+                                          f"平均等待 {stats['avg_wait_ms']}ms, 拒绝 {stats['rejected']}, 丢弃 {stats['shed']}\n"
+                        elif cmd == "pstats":
+                            ok = True
+                            result = "插件耗时统计：\n"
+                            for stats in PluginManager().plugin_stats():
+                                result += f"{stats['name']}: 调用 {stats['calls']}, 失败 {stats['errors']}, 平均 {stats['avg_ms']}ms, " \
+                                          f"最大 {stats['max_ms']}ms, 总计 {stats['total_ms']}ms\n"
                         elif cmd == "plist":
                             plugins = PluginManager().list_plugins()
                             ok = True
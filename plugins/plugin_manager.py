@@ -1,11 +1,15 @@
 # encoding:utf-8
 
+import asyncio
 import importlib
 import importlib.util
 import json
 import os
 import sys
+import threading
+import time
 
+from common.async_loop import run_sync
 from common.log import logger
 from common.singleton import singleton
 from common.sorted_dict import SortedDict
@@ -19,10 +23,13 @@ class PluginManager:
     def __init__(self):
         self.plugins = SortedDict(lambda k, v: v.priority, reverse=True)
         self.listening_plugins = {}
+        self.event_chains = {}  # 事件 -> ((插件名, handler), ...)，已按优先级排好并过滤掉未启用的插件，仅在插件变化时重建
         self.instances = {}
         self.pconf = {}
         self.current_plugin_path = None
         self.loaded = {}
+        self.timings = {}  # 插件名 -> 调用次数、失败次数、耗时统计
+        self.timings_lock = threading.Lock()
 
     def register(self, name: str, desire_priority: int = 0, **kwargs):
         def wrapper(plugincls):
@@ -128,14 +135,34 @@ class PluginManager:
             else:
                 self.plugins[name].enabled = pconf["plugins"][rawname]["enabled"]
                 self.plugins[name].priority = pconf["plugins"][rawname]["priority"]
-                self.plugins._update_heap(name)  # 更新下plugins中的顺序
+                self.plugins.reorder(name)  # 更新下plugins中的顺序
         if modified:
             self.save_config()
+        self.refresh_order()
         return new_plugins
 
     def refresh_order(self):
         for event in self.listening_plugins.keys():
             self.listening_plugins[event].sort(key=lambda name: self.plugins[name].priority, reverse=True)
+        self._rebuild_chains()
+
+    def _rebuild_chains(self):
+        """
+        重建每个事件的处理链，插件开启、关闭、调整优先级、重载后调用；整体替换，emit_event无需加锁
+        """
+        chains = {}
+        for event, names in self.listening_plugins.items():
+            chain = []
+            for name in names:
+                plugincls = self.plugins.get(name)
+                instance = self.instances.get(name)
+                if plugincls is None or not plugincls.enabled or instance is None:
+                    continue
+                handler = instance.handlers.get(event)
+                if handler is not None:
+                    chain.append((name, handler))
+            chains[event] = tuple(chain)
+        self.event_chains = chains
 
     def activate_plugins(self):  # 生成新开启的插件实例
         failed_plugins = []
@@ -157,7 +184,8 @@ class PluginManager:
                 for event in instance.handlers:
                     if event not in self.listening_plugins:
                         self.listening_plugins[event] = []
-                    self.listening_plugins[event].append(name)
+                    if name not in self.listening_plugins[event]:
+                        self.listening_plugins[event].append(name)
         self.refresh_order()
         return failed_plugins
 
@@ -188,17 +216,77 @@ class PluginManager:
         self.activate_plugins()
 
     def emit_event(self, e_context: EventContext, *args, **kwargs):
-        if e_context.event in self.listening_plugins:
-            for name in self.listening_plugins[e_context.event]:
-                if self.plugins[name].enabled and e_context.action == EventAction.CONTINUE:
-                    logger.debug("Plugin %s triggered by event %s" % (name, e_context.event))
-                    instance = self.instances[name]
-                    instance.handlers[e_context.event](e_context, *args, **kwargs)
-                    if e_context.is_break():
-                        e_context["breaked_by"] = name
-                        logger.debug("Plugin %s breaked event %s" % (name, e_context.event))
+        for name, handler in self.event_chains.get(e_context.event, ()):
+            if e_context.action != EventAction.CONTINUE:
+                break
+            logger.debug("Plugin %s triggered by event %s" % (name, e_context.event))
+            start = time.perf_counter()
+            ok = False
+            try:
+                handler(e_context, *args, **kwargs)
+                ok = True
+            finally:
+                self._record_timing(name, time.perf_counter() - start, ok)
+            if e_context.is_break():
+                e_context["breaked_by"] = name
+                logger.debug("Plugin %s breaked event %s" % (name, e_context.event))
         return e_context
 
+    async def emit_event_async(self, e_context: EventContext, *args, **kwargs):
+        """
+        emit_event的async版本，协程handler直接await，同步handler在线程池中执行
+        """
+        for name, handler in self.event_chains.get(e_context.event, ()):
+            if e_context.action != EventAction.CONTINUE:
+                break
+            logger.debug("Plugin %s triggered by event %s" % (name, e_context.event))
+            start = time.perf_counter()
+            ok = False
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(e_context, *args, **kwargs)
+                else:
+                    await run_sync(handler, e_context, *args, **kwargs)
+                ok = True
+            finally:
+                self._record_timing(name, time.perf_counter() - start, ok)
+            if e_context.is_break():
+                e_context["breaked_by"] = name
+                logger.debug("Plugin %s breaked event %s" % (name, e_context.event))
+        return e_context
+
+    def _record_timing(self, name, elapsed, ok):
+        with self.timings_lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0}
+            timing["calls"] += 1
+            if not ok:
+                timing["errors"] += 1
+            timing["total"] += elapsed
+            if elapsed > timing["max"]:
+                timing["max"] = elapsed
+
+    def plugin_stats(self) -> list:
+        """
+        各插件处理事件的次数和耗时，按总耗时从高到低排列，用于定位拖慢消息处理的插件
+        """
+        with self.timings_lock:
+            timings = [(name, dict(timing)) for name, timing in self.timings.items()]
+        stats = [
+            {
+                "name": name,
+                "calls": timing["calls"],
+                "errors": timing["errors"],
+                "total_ms": round(timing["total"] * 1000, 2),
+                "avg_ms": round(timing["total"] / timing["calls"] * 1000, 2),
+                "max_ms": round(timing["max"] * 1000, 2),
+            }
+            for name, timing in timings
+        ]
+        stats.sort(key=lambda item: item["total_ms"], reverse=True)
+        return stats
+
     def set_plugin_priority(self, name: str, priority: int):
         name = name.upper()
         if name not in self.plugins:
@@ -206,10 +294,10 @@ class PluginManager:
         if self.plugins[name].priority == priority:
             return True
         self.plugins[name].priority = priority
-        self.plugins._update_heap(name)
+        self.plugins.reorder(name)
         rawname = self.plugins[name].name
         self.pconf["plugins"][rawname]["priority"] = priority
-        self.pconf["plugins"]._update_heap(rawname)
+        self.pconf["plugins"].reorder(rawname)
         self.save_config()
         self.refresh_order()
         return True
@@ -238,6 +326,7 @@ class PluginManager:
             rawname = self.plugins[name].name
             self.pconf["plugins"][rawname]["enabled"] = False
             self.save_config()
+            self._rebuild_chains()
             return True
         return True
 
@@ -337,6 +426,7 @@ class PluginManager:
                     self.listening_plugins[event].remove(name)
             del self.plugins[name]
             del self.pconf["plugins"][rawname]
+            self._rebuild_chains()
             self.loaded[dirname] = None
             self.save_config()
             return True, "卸载插件成功"
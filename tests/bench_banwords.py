@@ -0,0 +1,127 @@
+"""
+敏感词插件基准测试：对比原 WordsSearch(对象节点Trie) 与 BanwordsMatcher(数组存储的AC自动机)。
+
+统计构建耗时、内存占用、从缓存文件加载耗时，以及消息检查吞吐：
+原实现 replace 动作需要 ContainsAny + Replace 两次扫描，新实现 scan 一次扫描。
+
+用法: python tests/bench_banwords.py [--words 20000] [--messages 5000] [--hit-rate 0.1] [--wordlist banwords.txt]
+"""
+import argparse
+import importlib.util
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugins", "banwords", "lib")
+
+
+def load_module(name):
+    # 直接按文件加载，避免导入plugins包时触发插件注册
+    spec = importlib.util.spec_from_file_location(name, os.path.join(LIB_DIR, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def random_words(count, rng):
+    chars = [chr(c) for c in range(0x4E00, 0x4E00 + 3500)]
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(chars) for _ in range(rng.randint(2, 6))))
+    return list(words)
+
+
+def random_messages(count, words, hit_rate, rng):
+    chars = [chr(c) for c in range(0x4E00, 0x4E00 + 3500)] + list("abcdefghijklmnopqrstuvwxyz ，。！？")
+    messages = []
+    for _ in range(count):
+        text = "".join(rng.choice(chars) for _ in range(rng.randint(20, 200)))
+        if rng.random() < hit_rate:
+            pos = rng.randint(0, len(text))
+            text = text[:pos] + rng.choice(words) + text[pos:]
+        messages.append(text)
+    return messages
+
+
+def measure_build(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, memory
+
+
+def throughput(check, messages):
+    chars = sum(len(m) for m in messages)
+    start = time.perf_counter()
+    for message in messages:
+        check(message)
+    elapsed = time.perf_counter() - start
+    return len(messages) / elapsed, chars / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=20000, help="随机生成的敏感词数量")
+    parser.add_argument("--wordlist", help="使用真实词库文件(每行一个词)代替随机词")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--hit-rate", type=float, default=0.1, help="包含敏感词的消息比例")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if args.wordlist:
+        with open(args.wordlist, encoding="utf-8") as f:
+            words = [line.strip() for line in f if line.strip()]
+    else:
+        words = random_words(args.words, rng)
+    messages = random_messages(args.messages, words, args.hit_rate, rng)
+
+    WordsSearch = load_module("WordsSearch").WordsSearch
+    matcher_module = load_module("matcher")
+    BanwordsMatcher = matcher_module.BanwordsMatcher
+
+    def build_old():
+        search = WordsSearch()
+        search.SetKeywords(words)
+        return search
+
+    old, old_build, old_memory = measure_build(build_old)
+    new, new_build, new_memory = measure_build(lambda: BanwordsMatcher.build(words))
+
+    digest = matcher_module.words_digest(new.words)
+    cache_path = os.path.join(tempfile.mkdtemp(), "banwords.dat")
+    new.save(cache_path, digest)
+    start = time.perf_counter()
+    BanwordsMatcher.load(cache_path, digest)
+    load_time = time.perf_counter() - start
+
+    # 结果一致性校验
+    for message in messages[:500]:
+        expected = old.Replace(message) if old.ContainsAny(message) else message
+        assert new.scan(message)[1] == expected, message
+
+    print("{} words, {} messages, hit rate {}".format(len(words), len(messages), args.hit_rate))
+    print("{:<28} build {:.2f}s, memory {:.1f}MB".format("WordsSearch", old_build, old_memory / 1e6))
+    print("{:<28} build {:.2f}s, memory {:.1f}MB, load from cache {:.3f}s ({:.1f}MB file)".format(
+        "BanwordsMatcher", new_build, new_memory / 1e6, load_time, os.path.getsize(cache_path) / 1e6))
+
+    def old_replace(text):
+        if old.ContainsAny(text):
+            old.Replace(text)
+
+    for name, check in (
+        ("WordsSearch.FindFirst", old.FindFirst),
+        ("BanwordsMatcher.find_first", new.find_first),
+        ("WordsSearch.ContainsAny+Replace", old_replace),
+        ("BanwordsMatcher.scan", new.scan),
+    ):
+        per_second, mchars = throughput(check, messages)
+        print("{:<32} {:>9.0f} msg/s  {:.2f}M chars/s".format(name, per_second, mchars))
+
+
+if __name__ == "__main__":
+    main()
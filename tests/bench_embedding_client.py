@@ -0,0 +1,103 @@
+"""
+OpenAIEmbeddingProvider 本地测试：启动一个模拟 /embeddings 的 HTTP 服务，验证分批、并发、429 重试和结果顺序。
+
+模拟服务每个请求延迟 --latency 毫秒，并对每第 --throttle-every 个请求返回 429 (Retry-After: 0)。
+embedding 的第一维是输入文本的序号，用于校验结果顺序。
+
+用法: python tests/bench_embedding_client.py [--texts 2000] [--concurrency 4] [--latency 50]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.memory.embedding import OpenAIEmbeddingProvider
+
+
+class StandInServer:
+    def __init__(self, latency, throttle_every):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server.lock:
+                    server.requests += 1
+                    throttle = server.throttle_every and server.requests % server.throttle_every == 0
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.latency)
+                    if throttle:
+                        with server.lock:
+                            server.throttled += 1
+                        self.send_response(429)
+                        self.send_header("Retry-After", "0")
+                        self.end_headers()
+                        return
+                    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    data = [{"index": i, "embedding": [float(text.split(":")[0]), 1.0]} for i, text in enumerate(inputs)]
+                    payload = json.dumps({"data": list(reversed(data))}).encode()  # 故意乱序，客户端需按 index 排序
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--text-chars", type=int, default=600)
+    parser.add_argument("--batch-tokens", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=50, help="模拟服务延迟(ms)")
+    parser.add_argument("--throttle-every", type=int, default=7)
+    args = parser.parse_args()
+
+    server = StandInServer(args.latency / 1000, args.throttle_every)
+    texts = ["{}:{}".format(i, "x" * args.text_chars) for i in range(args.texts)]
+
+    for concurrency in sorted({1, args.concurrency}):
+        server.requests = server.throttled = server.max_in_flight = 0
+        provider = OpenAIEmbeddingProvider(
+            api_key="test", api_base=server.base_url,
+            max_batch_tokens=args.batch_tokens, max_concurrency=concurrency,
+        )
+        start = time.perf_counter()
+        embeddings = provider.embed_batch(texts)
+        elapsed = time.perf_counter() - start
+        assert [int(e[0]) for e in embeddings] == list(range(args.texts)), "results out of order"
+        print("concurrency={}: {} texts in {:.2f}s, {} requests ({} throttled), max in flight {}".format(
+            concurrency, len(embeddings), elapsed, server.requests, server.throttled, server.max_in_flight))
+
+    server.httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
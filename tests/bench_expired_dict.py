@@ -0,0 +1,90 @@
+"""
+ExpiredDict 微基准测试：对比原 datetime 实现与当前实现在 1M key 下的写入、读取、包含判断和 keys() 耗时。
+
+用法: python tests/bench_expired_dict.py [--keys 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.expired_dict import ExpiredDict
+
+
+class LegacyExpiredDict(dict):
+    """原实现：每次访问调用datetime.now()并重写元组，不主动淘汰"""
+
+    def __init__(self, expires_in_seconds):
+        super().__init__()
+        self.expires_in_seconds = expires_in_seconds
+
+    def __getitem__(self, key):
+        value, expiry_time = super().__getitem__(key)
+        if datetime.now() > expiry_time:
+            del self[key]
+            raise KeyError("expired {}".format(key))
+        self.__setitem__(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        expiry_time = datetime.now() + timedelta(seconds=self.expires_in_seconds)
+        super().__setitem__(key, (value, expiry_time))
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def keys(self):
+        keys = list(super().keys())
+        return [key for key in keys if key in self]
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench(d, n):
+    keys = ["msg_{}".format(i) for i in range(n)]
+    result = {}
+    result["set"] = _timed(lambda: [d.__setitem__(k, True) for k in keys])
+    result["get"] = _timed(lambda: [d[k] for k in keys])
+    result["contains"] = _timed(lambda: [k in d for k in keys])
+    result["keys"] = _timed(lambda: d.keys())
+    return result
+
+
+def bench_expiry(n):
+    # 过期后不再访问的key：原实现一直保留，当前实现在后续写入时淘汰
+    legacy, current = LegacyExpiredDict(0.5), ExpiredDict(0.5)
+    for d in (legacy, current):
+        for i in range(n):
+            d["old_{}".format(i)] = True
+    time.sleep(0.6)
+    for d in (legacy, current):
+        d["new"] = True
+    return dict.__len__(legacy), dict.__len__(current)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1000000)
+    args = parser.parse_args()
+
+    print("keys={}".format(args.keys))
+    for name, d in (("legacy", LegacyExpiredDict(3600)), ("current", ExpiredDict(3600))):
+        result = bench(d, args.keys)
+        print("{:8s} ".format(name) + "  ".join("{}={:.3f}s".format(k, v) for k, v in result.items()))
+    legacy_size, current_size = bench_expiry(args.keys // 10)
+    print("retained after expiry: legacy={} current={}".format(legacy_size, current_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+共享HTTP传输层基准测试：对比每次requests.post新建连接与common.http_client连接复用。
+
+本地模拟服务对每个新连接延迟 --handshake 毫秒（模拟公网TCP+TLS握手），并统计建立的连接数。
+
+用法: python tests/bench_http_transport.py [--requests 200] [--handshake 30] [--threads 4]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import http_client
+
+
+class MockServer:
+    def __init__(self, handshake):
+        self.connections = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持keep-alive
+            disable_nagle_algorithm = True  # 否则keep-alive连接上响应头和body分开发送会触发40ms延迟ACK
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+                time.sleep(handshake)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/v1/chat/completions".format(self.httpd.server_address[1])
+
+
+def run(post, url, total, threads):
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        post(url, json={"messages": [{"role": "user", "content": "hi"}]}).json()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(one, range(total)))
+    latencies.sort()
+    return time.perf_counter() - start, latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--handshake", type=float, default=30, help="模拟握手耗时(ms)")
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    server = MockServer(args.handshake / 1000)
+    for name, post in (("requests.post", requests.post), ("http_client.post", http_client.post)):
+        server.connections = 0
+        elapsed, p50 = run(post, server.url, args.requests, args.threads)
+        print("{:<17} {} requests in {:.2f}s, p50 {:.1f}ms, {} connections".format(
+            name, args.requests, elapsed, p50, server.connections))
+    print("metrics:", http_client.stats())
+    server.httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+MemoryStorage.search_vector 基准测试：对比原 JSON + 纯 Python 余弦相似度与 float32 BLOB + NumPy 矩阵检索。
+
+用法: python tests/bench_memory_vector.py [--chunks 100000] [--dim 1536] [--queries 20]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.memory.storage import MemoryChunk, MemoryStorage
+
+
+def legacy_search(conn, query_embedding, limit=10):
+    """原实现：SELECT * 后逐行 json.loads 并用纯 Python 计算余弦相似度"""
+    rows = conn.execute("SELECT * FROM chunks WHERE scope IN ('shared') AND embedding IS NOT NULL").fetchall()
+    results = []
+    for row in rows:
+        embedding = json.loads(row["embedding"])
+        similarity = MemoryStorage._cosine_similarity(query_embedding, embedding)
+        if similarity > 0:
+            results.append((similarity, row))
+    results.sort(key=lambda x: x[0], reverse=True)
+    return [row["id"] for _, row in results[:limit]]
+
+
+def random_vector(rnd, dim):
+    return [rnd.uniform(-1, 1) for _ in range(dim)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--legacy-queries", type=int, default=1, help="原实现非常慢，默认只跑1次")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    tmp_dir = tempfile.mkdtemp()
+    storage = MemoryStorage(Path(tmp_dir) / "index.db")
+    legacy_conn = sqlite3.connect(str(Path(tmp_dir) / "legacy.db"))
+    legacy_conn.row_factory = sqlite3.Row
+    legacy_conn.execute("CREATE TABLE chunks (id TEXT PRIMARY KEY, scope TEXT, text TEXT, embedding TEXT)")
+
+    print("building {} chunks, dim={} ...".format(args.chunks, args.dim))
+    batch = []
+    for i in range(args.chunks):
+        embedding = random_vector(rnd, args.dim)
+        batch.append(MemoryChunk(
+            id="c{}".format(i), user_id=None, scope="shared", source="memory", path="memory/{}.md".format(i // 10),
+            start_line=i, end_line=i, text="chunk {}".format(i), embedding=embedding, hash=str(i),
+        ))
+        legacy_conn.execute("INSERT INTO chunks VALUES (?, 'shared', ?, ?)", ("c{}".format(i), "chunk {}".format(i), json.dumps(embedding)))
+        if len(batch) >= 1000:
+            storage.save_chunks_batch(batch)
+            batch = []
+    if batch:
+        storage.save_chunks_batch(batch)
+    legacy_conn.commit()
+
+    queries = [random_vector(rnd, args.dim) for _ in range(max(args.queries, args.legacy_queries))]
+
+    start = time.perf_counter()
+    storage.search_vector(queries[0], limit=10)
+    cold = time.perf_counter() - start
+
+    latencies = []
+    for query in queries[:args.queries]:
+        start = time.perf_counter()
+        storage.search_vector(query, limit=10)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    legacy_latencies = []
+    for query in queries[:args.legacy_queries]:
+        start = time.perf_counter()
+        legacy_ids = legacy_search(legacy_conn, query)
+        legacy_latencies.append(time.perf_counter() - start)
+        current_ids = ["c{}".format(r.start_line) for r in storage.search_vector(query, limit=10)]
+        assert legacy_ids == current_ids, "top-10 mismatch"
+    legacy_latencies.sort()
+
+    print("legacy   p50={:9.1f}ms".format(legacy_latencies[len(legacy_latencies) // 2] * 1000))
+    print("current  p50={:9.1f}ms  (first query incl. cache load {:.1f}ms)".format(latencies[len(latencies) // 2] * 1000, cold * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# 测试直接导入项目模块
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# tests/ 下其余脚本需要运行中的服务或手动执行，不作为单元测试收集
+collect_ignore_glob = ["bench_*.py", "repro_*.py", "verify_*.py", "test_history_filter.py"]
@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bridge.agent_bridge import AgentBridge
+
+
+class FakeAgent:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.messages = []
+        self.messages_lock = threading.Lock()
+
+
+@pytest.fixture
+def bridge(monkeypatch):
+    bridge = AgentBridge(bridge=None)
+    bridge.builds = []
+    bridge.gates = {}
+
+    def initialize_agent(session_id=None):
+        bridge.builds.append(session_id)
+        gate = bridge.gates.get(session_id)
+        if gate is not None:
+            assert gate.wait(5)
+        return FakeAgent(session_id)
+
+    monkeypatch.setattr(bridge.initializer, "initialize_agent", initialize_agent)
+    monkeypatch.setattr(bridge, "_restore_history", lambda session_id, agent: None)
+    return bridge
+
+
+def test_cold_start_does_not_block_other_sessions(bridge):
+    warm = bridge.get_agent("warm")
+    bridge.gates["slow"] = threading.Event()
+    with ThreadPoolExecutor(4) as pool:
+        slow = pool.submit(bridge.get_agent, "slow")
+        # Other sessions, warm or cold, finish while "slow" is still being built
+        assert pool.submit(bridge.get_agent, "warm").result(timeout=2) is warm
+        assert pool.submit(bridge.get_agent, "other").result(timeout=2).session_id == "other"
+        assert not slow.done()
+        bridge.gates["slow"].set()
+        assert slow.result(timeout=2).session_id == "slow"
+    assert bridge._init_locks == {}
+
+
+def test_concurrent_cold_starts_build_once(bridge):
+    bridge.gates["s1"] = threading.Event()
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(bridge.get_agent, "s1") for _ in range(8)]
+        bridge.gates["s1"].set()
+        agents = {id(f.result(timeout=2)) for f in futures}
+    assert len(agents) == 1
+    assert bridge.builds == ["s1"]
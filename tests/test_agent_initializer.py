@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from agent.prompt.workspace import mark_conversation_started
+from bridge.agent_initializer import AgentInitializer
+
+
+def shared_components(workspace):
+    return {
+        "workspace_root": str(workspace),
+        "memory_manager": None,
+        "skill_manager": None,
+        "runtime_info": None,
+        "prompt_sections": None,
+    }
+
+
+def test_shared_prompt_picks_up_context_file_edits(tmp_path):
+    mark_conversation_started(str(tmp_path))
+    (tmp_path / "USER.md").write_text("称呼: 小明", encoding="utf-8")
+    initializer = AgentInitializer(bridge=None, agent_bridge=None)
+    shared = shared_components(tmp_path)
+    tools = [SimpleNamespace(name="write")]
+
+    first_session = initializer._get_prompt_sections(shared)
+    assert "称呼: 小明" in first_session.render(tools)
+
+    # Agent在会话中用write工具更新USER.md，之后的新会话应看到新内容
+    (tmp_path / "USER.md").write_text("称呼: 王老师，喜欢简洁的回答", encoding="utf-8")
+    next_session = initializer._get_prompt_sections(shared)
+    assert next_session is first_session
+    assert "王老师" in next_session.render(tools)
@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import random
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugins", "banwords", "lib")
+
+
+def load_module(name):
+    # 按文件加载，避免导入plugins包时触发插件注册
+    spec = importlib.util.spec_from_file_location(name, os.path.join(LIB_DIR, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+matcher_module = load_module("matcher")
+BanwordsMatcher = matcher_module.BanwordsMatcher
+words_digest = matcher_module.words_digest
+WordsSearch = load_module("WordsSearch").WordsSearch
+
+ALPHABET = "abc敏感词"
+
+
+def random_text(rng, max_len):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+def random_cases(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        words = list(dict.fromkeys(w for w in (random_text(rng, 4) for _ in range(rng.randint(1, 8))) if w))
+        if not words:
+            continue
+        yield words, [random_text(rng, 12) for _ in range(5)]
+
+
+def test_matches_words_search():
+    for words, texts in random_cases(0, 2000):
+        old = WordsSearch()
+        old.SetKeywords(words)
+        new = BanwordsMatcher.build(words)
+        for text in texts:
+            assert new.contains_any(text) == old.ContainsAny(text), (words, text)
+            assert new.replace(text) == old.Replace(text), (words, text)
+            first, replaced = new.scan(text)
+            assert replaced == old.Replace(text)
+            expected = old.FindFirst(text)
+            found = new.find_first(text)
+            if expected is None:
+                assert found is None and first is None
+            else:
+                keyword, start, end = found
+                assert (keyword, start, end) == (expected["Keyword"], expected["Start"], expected["End"]), (words, text)
+                assert first == keyword
+
+
+def test_overlapping_words_are_merged():
+    matcher = BanwordsMatcher.build(["敏感", "感词", "abc"])
+    assert matcher.scan("这是敏感词吗") == ("敏感", "这是***吗")
+    assert matcher.scan("xabcabcx", replace_char="#") == ("abc", "x######x")
+    assert matcher.scan("no match") == (None, "no match")
+    assert BanwordsMatcher.build([]).scan("敏感") == (None, "敏感")
+
+
+def test_save_and_load(tmp_path):
+    words = ["敏感", "感词", "bad word"]
+    path = str(tmp_path / "banwords.dat")
+    BanwordsMatcher.build(words).save(path, words_digest(words))
+
+    loaded = BanwordsMatcher.load(path, words_digest(words))
+    assert loaded is not None and loaded.words == words
+    for text in ("这是敏感词", "a bad word here", "clean"):
+        assert loaded.scan(text) == BanwordsMatcher.build(words).scan(text)
+
+    # 词表变化、文件损坏或不存在时返回None，由调用方重新构建
+    assert BanwordsMatcher.load(path, words_digest(words + ["新词"])) is None
+    with open(path, "r+b") as f:
+        f.truncate(40)
+    assert BanwordsMatcher.load(path, words_digest(words)) is None
+    assert BanwordsMatcher.load(str(tmp_path / "missing.dat"), words_digest(words)) is None
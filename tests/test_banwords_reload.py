@@ -0,0 +1,89 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from plugins.plugin_manager import PluginManager
+
+
+@pytest.fixture
+def Banwords(monkeypatch):
+    # 与PluginManager加载插件时相同：设置插件路径后导入，从注册表取插件类
+    manager = PluginManager()
+    monkeypatch.setattr(manager, "plugins", dict(manager.plugins))
+    monkeypatch.setattr(manager, "current_plugin_path", os.path.join("plugins", "banwords"))
+    for name in ("plugins.banwords", "plugins.banwords.banwords"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    importlib.import_module("plugins.banwords.banwords")
+    return manager.plugins["BANWORDS"]
+
+
+def make_plugin(Banwords, tmp_path, words):
+    path = tmp_path / "banwords.txt"
+    path.write_text("\n".join(words), encoding="utf-8")
+    plugin = Banwords.__new__(Banwords)
+    plugin.reload_interval = 1
+    plugin.banwords_path = str(path)
+    plugin.cache_path = str(tmp_path / "banwords.dat")
+    plugin._reload_lock = threading.Lock()
+    plugin._last_check = 0
+    plugin._mtime = plugin._get_mtime()
+    plugin.matcher = plugin._load_matcher()
+    return plugin
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def edit(path, words, mtime):
+    path.write_text("\n".join(words), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_edit_during_rebuild_is_loaded_later(Banwords, tmp_path, monkeypatch):
+    plugin = make_plugin(Banwords, tmp_path, ["旧词"])
+    path = tmp_path / "banwords.txt"
+    started, release = threading.Event(), threading.Event()
+    load_matcher = plugin._load_matcher
+
+    def slow_load():
+        matcher = load_matcher()
+        started.set()
+        assert release.wait(5)
+        return matcher
+
+    monkeypatch.setattr(plugin, "_load_matcher", slow_load)
+    edit(path, ["第一次"], 1000)
+    plugin._check_reload()
+    assert started.wait(5)
+
+    # 重建进行中再次修改词库，这次检查不会启动新的重建
+    edit(path, ["第二次"], 2000)
+    plugin._last_check = 0
+    plugin._check_reload()
+    release.set()
+    wait_until(lambda: not plugin._reload_lock.locked())
+    assert plugin.matcher.contains_any("第一次")
+
+    monkeypatch.setattr(plugin, "_load_matcher", load_matcher)
+    plugin._last_check = 0
+    plugin._check_reload()
+    wait_until(lambda: plugin.matcher.contains_any("第二次"))
+    assert plugin.matcher.contains_any("第二次")
+    assert plugin._mtime == 2000
+
+
+def test_failed_rebuild_keeps_old_matcher(Banwords, tmp_path, monkeypatch):
+    plugin = make_plugin(Banwords, tmp_path, ["旧词"])
+    monkeypatch.setattr(plugin, "_load_matcher", lambda: 1 / 0)
+    edit(tmp_path / "banwords.txt", ["新词"], 1000)
+    plugin.reload()
+    assert plugin.matcher.contains_any("旧词")
+    assert plugin._mtime == 1000
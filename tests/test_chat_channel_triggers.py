@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from bridge.context import ContextType
+from channel.chat_channel import ChatChannel
+
+BASE_CONFIG = {
+    "group_name_white_list": ["g1"],
+    "group_name_keyword_white_list": ["kw"],
+    "group_chat_prefix": ["@bot", "bot"],
+    "group_chat_keyword": ["关键词"],
+    "single_chat_prefix": ["bot", "@bot"],
+    "image_create_prefix": ["画", "看"],
+    "nick_name_black_list": ["bad"],
+}
+
+
+class _Channel(ChatChannel):
+    NOT_SUPPORT_REPLYTYPE = []
+
+    def __init__(self):
+        # 不启动consume线程
+        self.name = "bot"
+        self.user_id = "me"
+
+
+def make_msg(isgroup, group_name="g1", is_at=False, nick="nick", at_list=None, self_display_name=None, from_self=False):
+    return SimpleNamespace(
+        from_user_id="u1", other_user_id="gid" if isgroup else "u1", other_user_nickname=group_name,
+        actual_user_id="me" if from_self else "u1", to_user_id="me", is_at=is_at,
+        actual_user_nickname=nick, from_user_nickname=nick, at_list=at_list or [], self_display_name=self_display_name,
+    )
+
+
+@pytest.fixture
+def compose(monkeypatch):
+    def _compose(content, isgroup=True, ctype=ContextType.TEXT, overrides=None, **msg_kwargs):
+        monkeypatch.setattr(config, "config", config.Config(dict(BASE_CONFIG, **(overrides or {}))))
+        kwargs = {"msg": make_msg(isgroup, **msg_kwargs), "isgroup": isgroup}
+        if ctype == ContextType.VOICE:
+            kwargs["origin_ctype"] = ContextType.VOICE
+            ctype = ContextType.TEXT
+        context = _Channel()._compose_context(ctype, content, **kwargs)
+        if context is None:
+            return None
+        return context.type, context.content, context["session_id"], context["receiver"]
+
+    return _compose
+
+
+# 期望结果与重写前的 _compose_context 一致
+CASES = [
+    ("group prefix", dict(content="bot 你好"), (ContextType.TEXT, "你好", "gid", "gid")),
+    ("group longer prefix first in list", dict(content="@bot 你好"), (ContextType.TEXT, "你好", "gid", "gid")),
+    ("group no trigger", dict(content="随便聊聊"), None),
+    ("group not whitelisted", dict(content="bot hi", group_name="nope"), None),
+    ("group keyword whitelist", dict(content="bot hi", group_name="有kw的群"), (ContextType.TEXT, "hi", "gid", "gid")),
+    ("group all whitelisted", dict(content="bot hi", group_name="nope", overrides={"group_name_white_list": ["ALL_GROUP"]}),
+     (ContextType.TEXT, "hi", "gid", "gid")),
+    ("group keyword trigger", dict(content="说个关键词吧"), (ContextType.TEXT, "说个关键词吧", "gid", "gid")),
+    ("group at", dict(content="hi @bot 在吗", is_at=True), (ContextType.TEXT, "hi 在吗", "gid", "gid")),
+    ("group at strips at_list", dict(content="@bot @张三 你好", is_at=True, at_list=["张三"]),
+     (ContextType.TEXT, "你好", "gid", "gid")),
+    ("group at display name", dict(content="@小助手 hello", is_at=True, self_display_name="小助手"),
+     (ContextType.TEXT, "hello", "gid", "gid")),
+    ("group at blacklisted", dict(content="@bot 你好", is_at=True, nick="bad"), None),
+    ("group at off", dict(content="@某人 你好", is_at=True, overrides={"group_at_off": True}), None),
+    ("group own message", dict(content="bot 你好", from_self=True), None),
+    ("group image prefix", dict(content="bot 画一只猫"), (ContextType.IMAGE_CREATE, "一只猫", "gid", "gid")),
+    ("group per-user session", dict(content="bot hi", overrides={"group_shared_session": False}),
+     (ContextType.TEXT, "hi", "u1", "gid")),
+    ("group in one session", dict(content="bot hi", overrides={"group_shared_session": False, "group_chat_in_one_session": ["g1"]}),
+     (ContextType.TEXT, "hi", "gid", "gid")),
+    ("group quote filtered", dict(content="「张三：hi」\n- - - - - - -\nbot 你好"), None),
+    ("single prefix", dict(content="bot hi", isgroup=False), (ContextType.TEXT, "hi", "u1", "u1")),
+    ("single no prefix", dict(content="hi", isgroup=False), None),
+    ("single blacklisted", dict(content="bot hi", isgroup=False, nick="bad"), None),
+    ("single voice needs no prefix", dict(content="hi", isgroup=False, ctype=ContextType.VOICE), (ContextType.TEXT, "hi", "u1", "u1")),
+    ("single image prefix", dict(content="bot 看 图", isgroup=False), (ContextType.IMAGE_CREATE, "图", "u1", "u1")),
+    ("single empty prefix matches all", dict(content="hi", isgroup=False, overrides={"single_chat_prefix": [""]}),
+     (ContextType.TEXT, "hi", "u1", "u1")),
+    ("single empty image prefix is ignored", dict(content="bot hi", isgroup=False, overrides={"image_create_prefix": [""]}),
+     (ContextType.TEXT, "hi", "u1", "u1")),
+]
+
+
+@pytest.mark.parametrize("kwargs,expected", [c[1:] for c in CASES], ids=[c[0] for c in CASES])
+def test_compose_context(compose, kwargs, expected):
+    assert compose(**kwargs) == expected
+
+
+def test_trigger_table_follows_config_changes(compose):
+    assert compose("嘿 你好") is None
+    config.conf()["group_chat_prefix"] = ["嘿"]
+    assert _Channel()._compose_context(ContextType.TEXT, "嘿 你好", msg=make_msg(True), isgroup=True).content == "你好"
+
+
+def test_trigger_table_follows_in_place_list_changes(compose):
+    assert compose("嘿 你好") is None
+    config.conf()["group_chat_prefix"].append("嘿")
+    assert _Channel()._compose_context(ContextType.TEXT, "嘿 你好", msg=make_msg(True), isgroup=True).content == "你好"
+    assert compose("bot hi", isgroup=False) is not None
+    config.conf()["nick_name_black_list"].append("nick")
+    assert _Channel()._compose_context(ContextType.TEXT, "bot hi", msg=make_msg(False), isgroup=False) is None
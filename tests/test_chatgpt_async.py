@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+import config
+from bridge.context import Context, ContextType
+from bridge.reply import ReplyType
+from common import async_loop
+
+pytest.importorskip("aiohttp")
+
+DELAY = 0.3
+
+
+@pytest.fixture
+def chat_server():
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            calls.append(body)
+            time.sleep(DELAY)
+            data = json.dumps({
+                "id": "chatcmpl-1", "object": "chat.completion", "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "echo: " + body["messages"][-1]["content"]}}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}/v1".format(httpd.server_port), calls
+    httpd.shutdown()
+
+
+@pytest.fixture
+def bot(chat_server, monkeypatch):
+    url, _ = chat_server
+    monkeypatch.setattr(config, "config", config.Config({"open_ai_api_key": "sk-test", "open_ai_api_base": url, "model": "gpt-4o"}))
+    monkeypatch.setattr(openai, "api_key", openai.api_key)
+    monkeypatch.setattr(openai, "api_base", openai.api_base)
+    from models.chatgpt.chat_gpt_bot import ChatGPTBot
+    return ChatGPTBot()
+
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_loop.get_aiohttp_session().close()
+
+    return asyncio.run(main())
+
+
+def text_context(session_id):
+    context = Context(ContextType.TEXT, "hi")
+    context["session_id"] = session_id
+    return context
+
+
+def test_text_replies_do_not_hold_threads(bot, chat_server):
+    _, calls = chat_server
+    count = 10
+
+    async def main():
+        # A single fallback thread: replies that went through run_sync would run one at a time
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+        started = time.monotonic()
+        replies = await asyncio.gather(*(bot.reply_async(f"q{i}", text_context(f"s{i}")) for i in range(count)))
+        return replies, time.monotonic() - started
+
+    replies, elapsed = run(main())
+    assert [r.type for r in replies] == [ReplyType.TEXT] * count
+    assert sorted(r.content for r in replies) == sorted(f"echo: q{i}" for i in range(count))
+    assert len(calls) == count
+    assert elapsed < DELAY * count / 2
+
+
+def test_reply_is_recorded_in_session(bot):
+    reply = run(bot.reply_async("hello", text_context("s1")))
+    assert reply.content == "echo: hello"
+    assert bot.sessions.build_session("s1").messages[-1] == {"role": "assistant", "content": "echo: hello"}
+
+
+def test_commands_use_sync_path(bot, chat_server):
+    _, calls = chat_server
+    run(bot.reply_async("hello", text_context("s1")))
+    reply = run(bot.reply_async("#清除记忆", text_context("s1")))
+    assert reply.type == ReplyType.INFO
+    assert len(calls) == 1
@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent.memory.embedding import OpenAIEmbeddingProvider
+
+
+class StandInServer:
+    """
+    模拟 /embeddings 接口：throttle(inputs) 返回Retry-After时该请求返回429，
+    embedding的第一维是输入文本的序号，结果故意乱序返回
+    """
+
+    def __init__(self, latency=0.05, throttle=None):
+        self.latency = latency
+        self.throttle = throttle or (lambda inputs: None)
+        self.lock = threading.Lock()
+        self.log = []  # (时间, 输入列表, 状态码)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                with server.lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    retry_after = server.throttle(inputs)
+                    server.log.append((time.monotonic(), inputs, 429 if retry_after is not None else 200))
+                try:
+                    time.sleep(server.latency)
+                    if retry_after is not None:
+                        self.send_response(429)
+                        self.send_header("Retry-After", retry_after)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    data = [{"index": i, "embedding": [float(text.split(":")[0]), 1.0]} for i, text in enumerate(inputs)]
+                    payload = json.dumps({"data": list(reversed(data))}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+
+    def requests_for(self, first_input):
+        return [entry for entry in self.log if entry[1][0] == first_input]
+
+
+def texts(count, chars=300):
+    return ["{}:{}".format(i, "x" * chars) for i in range(count)]
+
+
+def first_attempt_throttle(retry_after, every=3):
+    """每第every个批次的第一次请求返回429"""
+    seen = set()
+
+    def throttle(inputs):
+        index = int(inputs[0].split(":")[0])
+        if inputs[0] in seen:
+            return None
+        seen.add(inputs[0])
+        return retry_after if (index // 10) % every == 0 else None
+
+    return throttle
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(**kwargs):
+        server = StandInServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.httpd.shutdown()
+        server.httpd.server_close()
+
+
+def make_provider(server, **kwargs):
+    # 每条文本约101 token，max_batch_tokens=1100时每批10条
+    kwargs.setdefault("max_batch_tokens", 1100)
+    return OpenAIEmbeddingProvider(api_key="test", api_base=server.base_url, **kwargs)
+
+
+def test_batches_keep_order_under_bounded_concurrency(stand_in):
+    server = stand_in()
+    provider = make_provider(server, max_concurrency=3)
+    embeddings = provider.embed_batch(texts(120))
+    assert [int(e[0]) for e in embeddings] == list(range(120))
+    assert len(server.log) == 12
+    assert all(len(inputs) == 10 for _, inputs, _ in server.log)
+    assert 1 < server.max_in_flight <= 3
+
+
+def test_throttled_batches_are_retried_after_retry_after(stand_in):
+    server = stand_in(throttle=first_attempt_throttle("0.3"))
+    provider = make_provider(server, max_concurrency=4)
+    embeddings = provider.embed_batch(texts(120))
+    assert [int(e[0]) for e in embeddings] == list(range(120))
+
+    throttled = [inputs[0] for _, inputs, status in server.log if status == 429]
+    assert len(throttled) == 4
+    assert len(server.log) == 12 + 4
+    for first_input in throttled:
+        (t1, _, s1), (t2, _, s2) = server.requests_for(first_input)
+        assert (s1, s2) == (429, 200)
+        assert t2 - t1 >= 0.3
+    assert server.max_in_flight <= 4
+
+
+def test_rate_limit_error_after_retries_exhausted(stand_in):
+    server = stand_in(latency=0, throttle=lambda inputs: "0")
+    provider = make_provider(server, max_retries=2)
+    with pytest.raises(ValueError, match="rate limit"):
+        provider.embed_batch(texts(5))
+    assert len(server.log) == 3
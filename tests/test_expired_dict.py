@@ -0,0 +1,80 @@
+import gc
+import time
+
+from common import expired_dict
+from common.expired_dict import ExpiredDict
+
+
+def test_expired_keys_are_dropped():
+    d = ExpiredDict(0.05)
+    d["a"] = 1
+    assert d["a"] == 1
+    time.sleep(0.1)
+    assert "a" not in d
+    assert d.get("a") is None
+
+
+def test_access_refreshes_ttl():
+    d = ExpiredDict(0.2)
+    d["a"] = 1
+    for _ in range(3):
+        time.sleep(0.1)
+        assert d["a"] == 1
+
+
+def test_lru_cap_evicts_least_recently_used():
+    evicted = []
+    d = ExpiredDict(60, max_size=2, on_evict=lambda k, v: evicted.append(k))
+    d["a"] = 1
+    d["b"] = 2
+    d["a"]
+    d["c"] = 3
+    assert list(d.keys()) == ["a", "c"]
+    assert evicted == ["b"]
+
+
+def test_sweep_evicts_untouched_dicts():
+    evicted = []
+    d = ExpiredDict(0.05, on_evict=lambda k, v: evicted.append((k, v)))
+    d["a"] = 1
+    time.sleep(0.1)
+    # Nothing touches d, the periodic sweep releases the value
+    expired_dict.sweep()
+    assert evicted == [("a", 1)]
+    assert dict.__len__(d) == 0
+
+
+def test_sweep_drops_collected_dicts():
+    d = ExpiredDict(60)
+    key = id(d)
+    assert key in expired_dict._sweep_targets
+    del d
+    gc.collect()
+    assert key not in expired_dict._sweep_targets
+    assert expired_dict._sweeper.is_alive()
+
+
+def test_sweep_can_be_disabled():
+    d = ExpiredDict(60, sweep=False)
+    assert id(d) not in expired_dict._sweep_targets
+
+
+def test_session_manager_is_bounded(monkeypatch):
+    import config
+    from models.session_manager import Session, SessionManager
+
+    monkeypatch.setattr(config, "config", config.Config({"expires_in_seconds": None, "max_sessions": 2}))
+    manager = SessionManager(Session)
+    for session_id in ("s1", "s2", "s3"):
+        manager.build_session(session_id)
+    assert list(manager.sessions.keys()) == ["s2", "s3"]
+
+
+def test_session_manager_is_unbounded_by_default(monkeypatch):
+    import config
+    from models.session_manager import Session, SessionManager
+
+    monkeypatch.setattr(config, "config", config.Config({"expires_in_seconds": None}))
+    manager = SessionManager(Session)
+    assert type(manager.sessions) is dict
+    assert config.available_setting["max_sessions"] == 0
@@ -0,0 +1,59 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from urllib3 import HTTPResponse
+
+from common import http_client
+
+
+@pytest.fixture
+def server():
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            calls.append(self.command)
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = _reply
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}/".format(httpd.server_port), calls
+    httpd.shutdown()
+
+
+def test_status_retry_only_for_idempotent_methods(server, monkeypatch):
+    url, calls = server
+    monkeypatch.setattr(http_client, "conf", lambda: {"http_max_retries": 2, "http_backoff_factor": 0})
+    session = http_client._build_session()
+
+    assert session.post(url, json={"prompt": "hi"}, timeout=5).status_code == 503
+    assert calls == ["POST"]
+
+    calls.clear()
+    assert session.get(url, timeout=5).status_code == 503
+    assert calls == ["GET"] * 3
+
+
+def test_retry_after_is_capped(monkeypatch):
+    monkeypatch.setattr(http_client, "conf", lambda: {"http_max_retry_after": 5})
+    retry = http_client._CappedRetry(total=1)
+    assert retry.get_retry_after(HTTPResponse(headers={"Retry-After": "3600"})) == 5
+    assert retry.get_retry_after(HTTPResponse(headers={"Retry-After": "2"})) == 2
+    assert retry.get_retry_after(HTTPResponse()) is None
+
+
+def test_openai_gets_its_own_session():
+    openai = pytest.importorskip("openai")
+    http_client.install_openai_session()
+    assert openai.requestssession() is not http_client.get_session()
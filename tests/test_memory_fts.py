@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from agent.memory.storage import MemoryChunk, MemoryStorage
+
+
+def make_chunk(chunk_id, text, path="memory/notes.md"):
+    return MemoryChunk(id=chunk_id, user_id=None, scope="shared", source="memory", path=path,
+                       start_line=1, end_line=1, text=text, embedding=None, hash=chunk_id)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    storage = MemoryStorage(tmp_path / "index.db")
+    available = storage.fts5_available
+    storage.close()
+    if not available:
+        pytest.skip("SQLite built without FTS5")
+    return tmp_path / "index.db"
+
+
+def test_cjk_search_after_insert_and_replace(db_path):
+    storage = MemoryStorage(db_path)
+    storage.save_chunks_batch([make_chunk("a", "用户喜欢喝乌龙茶"), make_chunk("b", "the cat is called Snow")])
+    assert [r.snippet for r in storage.search_keyword("乌龙茶")] == ["用户喜欢喝乌龙茶"]
+
+    storage.save_chunks_batch([make_chunk("a", "用户改喝红茶了")])
+    assert storage.search_keyword("乌龙茶") == []
+    assert [r.path for r in storage.search_keyword("红茶")] == ["memory/notes.md"]
+    assert storage.conn.execute("SELECT count(*) FROM chunks_fts").fetchone()[0] == 2
+    storage.close()
+
+
+def test_other_connections_can_write_chunks(db_path):
+    storage = MemoryStorage(db_path)
+    storage.save_chunks_batch([make_chunk("a", "用户喜欢喝乌龙茶")])
+    storage.close()
+
+    # A plain connection has no Python functions registered (sqlite CLI, sqlite-web, another process)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        INSERT INTO chunks (id, scope, source, path, start_line, end_line, text, hash)
+        VALUES ('b', 'shared', 'memory', 'memory/other.md', 1, 1, 'written by hand', 'b')
+    """)
+    conn.execute("UPDATE chunks SET text = 'edited by hand' WHERE id = 'b'")
+    conn.execute("UPDATE chunks SET path = 'memory/moved.md' WHERE id = 'a'")
+    conn.execute("DELETE FROM chunks WHERE id = 'b'")
+    conn.commit()
+    conn.close()
+
+    storage = MemoryStorage(db_path)
+    assert [r.path for r in storage.search_keyword("乌龙茶")] == ["memory/moved.md"]
+    assert storage.search_keyword("hand") == []
+    storage.close()
+
+
+def test_triggers_using_sql_function_are_replaced(db_path):
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("DROP TRIGGER chunks_ai")
+    conn.create_function("fts_segment", 1, lambda text: text)
+    conn.execute("""
+        CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN
+            INSERT INTO chunks_fts(rowid, text, id, user_id, path, source, scope)
+            VALUES (new.rowid, fts_segment(new.text), new.id, new.user_id, new.path, new.source, new.scope);
+        END
+    """)
+    conn.commit()
+    conn.close()
+
+    MemoryStorage(db_path).close()
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        INSERT INTO chunks (id, scope, source, path, start_line, end_line, text, hash)
+        VALUES ('c', 'shared', 'memory', 'memory/c.md', 1, 1, 'plain text', 'c')
+    """)
+    assert conn.execute("SELECT count(*) FROM chunks_fts").fetchone()[0] == 1
+    conn.close()
@@ -0,0 +1,36 @@
+import pytest
+
+from agent.memory.storage import MemoryChunk, MemoryStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = MemoryStorage(tmp_path / "index.db")
+    if not storage.fts5_available:
+        pytest.skip("SQLite built without FTS5")
+    texts = ["用户喜欢喝乌龙茶，每天下午三点喝一杯", "用户的猫叫小白"]
+    texts += [f"filler note {i} about weather and lunch" for i in range(20)]
+    storage.save_chunks_batch([
+        MemoryChunk(id=str(i), user_id=None, scope="shared", source="memory", path=f"memory/m{i}.md",
+                    start_line=1, end_line=1, text=text, embedding=None, hash=str(i))
+        for i, text in enumerate(texts)
+    ])
+    yield storage
+    storage.close()
+
+
+def test_rank_transform_is_bounded_and_monotonic():
+    scores = [MemoryStorage._bm25_rank_to_score(rank) for rank in (-0.01, -0.5, -2.0, -10.0, -1000.0)]
+    assert scores == sorted(scores)
+    assert all(0.0 < s < 1.0 for s in scores)
+    assert MemoryStorage._bm25_rank_to_score(None) == 0.0
+
+
+def test_weak_best_hit_is_not_promoted(storage):
+    # Every chunk of the corpus matches a term that appears everywhere, its best hit stays weak
+    weak = storage.search_keyword("weather", limit=3)
+    strong = storage.search_keyword("乌龙茶", limit=3)
+    assert weak and strong
+    assert weak[0].score < 0.1
+    assert strong[0].score > 0.5
+    assert strong[0].path == "memory/m0.md"
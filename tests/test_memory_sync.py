@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from agent.memory.config import MemoryConfig
+from agent.memory.manager import MemoryManager
+from agent.memory.storage import MemoryStorage
+
+
+def make_manager(tmp_path):
+    config = MemoryConfig(workspace_root=str(tmp_path), vector_index="exact")
+    return MemoryManager(config=config)
+
+
+def indexed_paths(manager):
+    return set(manager.storage.get_file_stats())
+
+
+def test_deleted_file_is_purged(tmp_path):
+    manager = make_manager(tmp_path)
+    note = tmp_path / "memory" / "note.md"
+    note.write_text("remember the milk", encoding="utf-8")
+    asyncio.run(manager.sync())
+    assert "memory/note.md" in indexed_paths(manager)
+
+    note.unlink()
+    asyncio.run(manager.sync())
+    assert "memory/note.md" not in indexed_paths(manager)
+
+
+def test_add_memory_entries_survive_sync(tmp_path):
+    manager = make_manager(tmp_path)
+    asyncio.run(manager.add_memory("user likes tea", user_id="u1", scope="user"))
+    # Entry written by an older version: generated path, nonzero mtime, no file on disk
+    legacy = "memory/shared/memory_0123abcd.md"
+    manager.storage.update_file_metadata(legacy, "memory", MemoryStorage.compute_hash("old"), 1700000000, 3)
+    manager.storage.close()
+
+    manager = make_manager(tmp_path)
+    asyncio.run(manager.sync())
+    paths = indexed_paths(manager)
+    assert legacy in paths
+    assert any(p.startswith("memory/users/u1/memory_") for p in paths)
+
+
+def test_sync_waits_for_lock_without_blocking_loop(tmp_path):
+    manager = make_manager(tmp_path)
+    (tmp_path / "memory" / "a.md").write_text("alpha", encoding="utf-8")
+    released = threading.Event()
+
+    def hold_lock():
+        with manager._sync_lock:
+            released.wait(5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+
+    async def main():
+        sync = asyncio.ensure_future(manager.sync())
+        # Another thread holds the lock: the coroutine waits, the loop keeps running
+        for _ in range(5):
+            await asyncio.sleep(0.02)
+        assert not sync.done()
+        released.set()
+        await asyncio.wait_for(sync, 5)
+
+    asyncio.run(main())
+    holder.join()
+    assert "memory/a.md" in indexed_paths(manager)
+
+
+def test_concurrent_syncs_are_serialized(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path)
+    for name in ("a", "b"):
+        (tmp_path / "memory" / f"{name}.md").write_text(name, encoding="utf-8")
+    running = []
+    overlap = []
+    original = MemoryManager._sync_file
+
+    def slow_sync_file(self, *args, **kwargs):
+        running.append(1)
+        overlap.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(MemoryManager, "_sync_file", slow_sync_file)
+
+    async def main():
+        await asyncio.gather(*(manager.sync(force=True) for _ in range(3)))
+
+    asyncio.run(main())
+    assert max(overlap) == 1
+    assert len(overlap) >= 6
+
+
+def test_same_second_same_size_edit_is_synced(tmp_path):
+    manager = make_manager(tmp_path)
+    note = tmp_path / "memory" / "note.md"
+    note.write_text("alpha", encoding="utf-8")
+    os.utime(note, ns=(1700000000_100000000, 1700000000_100000000))
+    asyncio.run(manager.sync())
+    # Same-size edit within the same second, only the sub-second mtime differs
+    note.write_text("omega", encoding="utf-8")
+    os.utime(note, ns=(1700000000_900000000, 1700000000_900000000))
+    asyncio.run(manager.sync())
+    assert manager.storage.get_file_hash("memory/note.md") == MemoryStorage.compute_hash("omega")
+
+
+def test_second_mtimes_are_migrated_to_nanoseconds(tmp_path):
+    manager = make_manager(tmp_path)
+    manager.storage.update_file_metadata("memory/a.md", "memory", "h", 1700000000, 3)
+    manager.storage.update_file_metadata("memory/shared/memory_0123abcd.md", "memory", "h", 0, 3)
+    manager.storage.close()
+    conn = sqlite3.connect(str(manager.storage.db_path))
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+    storage = MemoryStorage(manager.storage.db_path)
+    assert storage.get_file_stats() == {
+        "memory/a.md": (1700000000_000000000, 3),
+        "memory/shared/memory_0123abcd.md": (0, 3),
+    }
+    storage.close()
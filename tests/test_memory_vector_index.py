@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from agent.memory.storage import MemoryChunk, MemoryStorage
+from agent.memory.vector_index import IVFVectorIndex
+
+
+def make_chunk(chunk_id, embedding, text="memory"):
+    return MemoryChunk(
+        id=chunk_id, user_id=None, scope="shared", source="memory", path="MEMORY.md",
+        start_line=1, end_line=1, text=text, embedding=embedding, hash=MemoryStorage.compute_hash(text),
+    )
+
+
+def open_storage(tmp_path):
+    return MemoryStorage(tmp_path / "index.db", vector_index=IVFVectorIndex(tmp_path / "vector_index.pkl"))
+
+
+def search_ids(storage, query):
+    return [r.snippet for r in storage.search_vector(query, limit=5)]
+
+
+def test_index_is_saved_on_flush_and_reused(tmp_path, monkeypatch):
+    storage = open_storage(tmp_path)
+    storage.save_chunks_batch([make_chunk("a", [1.0, 0.0], "alpha"), make_chunk("b", [0.0, 1.0], "beta")])
+    storage.flush_vector_index()
+    assert (tmp_path / "vector_index.pkl").exists()
+    storage.close()
+
+    rebuilt = []
+    monkeypatch.setattr(IVFVectorIndex, "clear", lambda self: rebuilt.append(True))
+    storage = open_storage(tmp_path)
+    assert rebuilt == []
+    assert search_ids(storage, [1.0, 0.0])[0] == "alpha"
+    storage.close()
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.save_chunks_batch([make_chunk("a", [1.0, 0.0], "alpha"), make_chunk("b", [0.0, 1.0], "beta")])
+    storage.close()
+
+    # 同一id重新写入不同的向量，块数量不变，且进程退出前没有保存索引
+    storage = open_storage(tmp_path)
+    storage.save_chunks_batch([make_chunk("a", [0.0, -1.0], "alpha")])
+    storage._close_connection()
+
+    storage = open_storage(tmp_path)
+    assert search_ids(storage, [1.0, 0.0]) == []
+    assert search_ids(storage, [0.0, -1.0]) == ["alpha"]
+    storage.close()
+
+
+def test_destructor_does_not_save_index(tmp_path):
+    storage = open_storage(tmp_path)
+    storage.save_chunks_batch([make_chunk("a", [1.0, 0.0])])
+    storage.__del__()
+    index = IVFVectorIndex(tmp_path / "vector_index.pkl")
+    assert not index.load() or len(index) == 0
+
+
+def test_dimension_change_drops_old_vectors():
+    index = IVFVectorIndex()
+    index.add("a", [1.0, 0.0], "shared", None)
+    index.add("b", [0.0, 1.0], "shared", None)
+    index.add("u", [1.0, 0.0], "user", "u1")
+    # 切换embedding模型后，同一分区写入不同维度的向量
+    index.add("c", [0.0, 0.0, 1.0], "shared", None)
+    assert len(index) == 2
+    assert sorted(index.locations) == ["c", "u"]
+    index.remove("a")
+    index.remove("c")
+    assert len(index) == 1
+    assert index.search([1.0, 0.0], [("user", "u1")], 5) == [(1.0, "u")]
@@ -0,0 +1,132 @@
+import asyncio
+import random
+
+import pytest
+
+from common.sorted_dict import SortedDict
+from plugins.event import Event, EventAction, EventContext
+from plugins.plugin_manager import PluginManager
+
+
+def reference_keys(d, sort_func, reverse):
+    return [k for _, k in sorted(((sort_func(k, v), k) for k, v in dict.items(d)), reverse=reverse)]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_sorted_dict_matches_full_sort(reverse):
+    rng = random.Random(0)
+    sort_func = lambda k, v: v["priority"]
+    d = SortedDict(sort_func, reverse=reverse)
+    for _ in range(3000):
+        key = rng.randint(0, 40)
+        op = rng.random()
+        if op < 0.5:
+            d[key] = {"priority": rng.randint(0, 5)}
+        elif op < 0.7 and key in dict.keys(d):
+            del d[key]
+        elif key in dict.keys(d):
+            # 原地修改后调用reorder
+            d[key]["priority"] = rng.randint(0, 5)
+            d.reorder(key)
+        expected = reference_keys(d, sort_func, reverse)
+        assert list(d.keys()) == expected
+        assert list(d) == expected
+        assert [k for k, _ in d.items()] == expected
+        assert d.values() == [d[k] for k in expected]
+
+
+def test_sorted_dict_init_and_legacy_name():
+    d = SortedDict(lambda k, v: v, {"a": 3, "b": 1, "c": 2}, reverse=True)
+    assert list(d.keys()) == ["a", "c", "b"]
+    d._update_heap("a")
+    assert list(d.keys()) == ["a", "c", "b"]
+
+
+class _Plugin:
+    enabled = True
+
+    def __init__(self, name, priority, calls, action=EventAction.CONTINUE):
+        self.name = name
+        self.priority = priority
+        self._calls = calls
+        self._action = action
+        self.handlers = {Event.ON_HANDLE_CONTEXT: self.on_handle_context}
+
+    def on_handle_context(self, e_context):
+        self._calls.append(self.name)
+        e_context.action = self._action
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """用测试插件替换插件管理器的状态，结束后恢复"""
+    pm = PluginManager()
+    calls = []
+    plugins = {
+        "LOW": _Plugin("LOW", 1, calls),
+        "HIGH": _Plugin("HIGH", 10, calls),
+        "MID": _Plugin("MID", 5, calls),
+    }
+    monkeypatch.setattr(pm, "plugins", SortedDict(lambda k, v: v.priority, plugins, reverse=True))
+    monkeypatch.setattr(pm, "instances", dict(plugins))
+    monkeypatch.setattr(pm, "listening_plugins", {Event.ON_HANDLE_CONTEXT: list(plugins)})
+    monkeypatch.setattr(pm, "pconf", {"plugins": SortedDict(lambda k, v: v["priority"], {
+        name: {"enabled": True, "priority": p.priority} for name, p in plugins.items()}, reverse=True)})
+    monkeypatch.setattr(pm, "event_chains", {})
+    monkeypatch.setattr(pm, "timings", {})
+    monkeypatch.setattr(pm, "save_config", lambda: None)
+    pm.refresh_order()
+    return pm, plugins, calls
+
+
+def emit(pm):
+    return pm.emit_event(EventContext(Event.ON_HANDLE_CONTEXT, {}))
+
+
+def test_handlers_run_by_priority(manager):
+    pm, _, calls = manager
+    emit(pm)
+    assert calls == ["HIGH", "MID", "LOW"]
+    assert [name for name, _ in pm.event_chains[Event.ON_HANDLE_CONTEXT]] == ["HIGH", "MID", "LOW"]
+
+
+def test_chain_follows_priority_and_enable_changes(manager):
+    pm, _, calls = manager
+    pm.set_plugin_priority("LOW", 20)
+    emit(pm)
+    assert calls == ["LOW", "HIGH", "MID"]
+
+    calls.clear()
+    pm.disable_plugin("HIGH")
+    emit(pm)
+    assert calls == ["LOW", "MID"]
+
+
+def test_break_stops_the_chain(manager):
+    pm, plugins, calls = manager
+    plugins["MID"]._action = EventAction.BREAK_PASS
+    e_context = emit(pm)
+    assert calls == ["HIGH", "MID"]
+    assert e_context["breaked_by"] == "MID"
+    assert e_context.is_pass()
+
+
+def test_timings_are_recorded(manager):
+    pm, _, _ = manager
+    for _ in range(3):
+        emit(pm)
+    stats = {item["name"]: item for item in pm.plugin_stats()}
+    assert set(stats) == {"HIGH", "MID", "LOW"}
+    assert all(item["calls"] == 3 and item["errors"] == 0 for item in stats.values())
+
+
+def test_async_emit_awaits_coroutine_handlers(manager):
+    pm, plugins, calls = manager
+
+    async def on_handle_context(e_context):
+        calls.append("ASYNC_MID")
+
+    plugins["MID"].handlers[Event.ON_HANDLE_CONTEXT] = on_handle_context
+    pm.refresh_order()
+    asyncio.run(pm.emit_event_async(EventContext(Event.ON_HANDLE_CONTEXT, {})))
+    assert calls == ["HIGH", "ASYNC_MID", "LOW"]
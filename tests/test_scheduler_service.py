@@ -0,0 +1,76 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from agent.tools.scheduler.scheduler_service import SchedulerService
+from agent.tools.scheduler.task_store import TaskStore
+
+
+def interval_task(task_id, seconds=1, receiver="u1"):
+    return {
+        "id": task_id,
+        "name": task_id,
+        "enabled": True,
+        "schedule": {"type": "interval", "seconds": seconds},
+        "next_run_at": (datetime.now() - timedelta(seconds=0.1)).isoformat(),
+        "action": {"channel_type": "web", "receiver": receiver},
+    }
+
+
+class Recorder:
+    """记录同时执行的任务数"""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+        self.max_total = 0
+
+    def __call__(self, task):
+        with self.lock:
+            self.running[task["id"]] = self.running.get(task["id"], 0) + 1
+            self.max_running[task["id"]] = max(self.max_running.get(task["id"], 0), self.running[task["id"]])
+            self.max_total = max(self.max_total, sum(self.running.values()))
+        time.sleep(self.duration)
+        with self.lock:
+            self.running[task["id"]] -= 1
+
+
+def run_scheduler(tmp_path, tasks, callback, seconds, **kwargs):
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    for task in tasks:
+        store.add_task(task)
+    service = SchedulerService(store, callback, misfire_policy="coalesce", **kwargs)
+    service.start()
+    time.sleep(seconds)
+    service.stop()
+    return store, service
+
+
+def test_timed_out_run_keeps_its_slot(tmp_path):
+    recorder = Recorder(duration=2.5)
+    store, _ = run_scheduler(tmp_path, [interval_task("slow")], recorder, 4,
+                             max_workers=4, max_per_user=2, task_timeout=0.5)
+    assert recorder.max_running["slow"] == 1
+    task = store.get_task("slow")
+    assert task["last_status"] == "timeout"
+    assert task["run_count"] >= 1
+
+
+def test_per_user_limit(tmp_path):
+    recorder = Recorder(duration=1.5)
+    tasks = [interval_task(f"t{i}", seconds=60) for i in range(4)]
+    run_scheduler(tmp_path, tasks, recorder, 2, max_workers=4, max_per_user=2, task_timeout=0.5)
+    assert recorder.max_total == 2
+
+
+def test_failed_run_is_recorded(tmp_path):
+    def fail(task):
+        raise RuntimeError("boom")
+
+    store, _ = run_scheduler(tmp_path, [interval_task("bad", seconds=60)], fail, 0.5)
+    task = store.get_task("bad")
+    assert task["last_status"] == "failed"
+    assert task["failure_count"] == 1
+    assert task["last_error"] == "boom"
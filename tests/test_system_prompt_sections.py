@@ -0,0 +1,69 @@
+import os
+from types import SimpleNamespace
+
+from agent.prompt import PromptBuilder, SystemPromptSections
+
+
+def tools(*names):
+    return [SimpleNamespace(name=name) for name in names]
+
+
+def write(path, content):
+    stat = os.stat(path) if os.path.exists(path) else None
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    if stat is not None:
+        # 保证mtime变化，不依赖文件系统的时间精度
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_context_files_reload_when_changed(tmp_path):
+    agent_md = tmp_path / "AGENT.md"
+    write(agent_md, "名字: 小助手")
+    sections = PromptBuilder(str(tmp_path)).build_sections()
+
+    assert "名字: 小助手" in sections.render(tools("read"))
+
+    write(agent_md, "名字: 新名字")
+    prompt = sections.render(tools("read"))
+    assert "名字: 新名字" in prompt
+    assert "小助手" not in prompt
+
+    write(tmp_path / "USER.md", "称呼: 老王")
+    assert "称呼: 老王" in sections.render(tools("read"))
+
+    os.remove(tmp_path / "USER.md")
+    assert "老王" not in sections.render(tools("read"))
+
+
+def test_explicit_context_files_are_not_reloaded(tmp_path):
+    write(tmp_path / "AGENT.md", "来自文件")
+    sections = PromptBuilder(str(tmp_path)).build_sections(context_files=[])
+    assert "来自文件" not in sections.render(tools("read"))
+
+
+def test_unchanged_prompt_is_reused(tmp_path):
+    write(tmp_path / "AGENT.md", "名字: 小助手")
+    sections = PromptBuilder(str(tmp_path)).build_sections()
+    assert sections.render(tools("read")) is sections.render(tools("read"))
+
+
+def test_one_cache_per_tool_set(tmp_path, monkeypatch):
+    sections = PromptBuilder(str(tmp_path)).build_sections()
+    rendered = []
+    original = SystemPromptSections._render_section
+
+    def spy(self, name, tool_list, key=None):
+        rendered.append(name)
+        return original(self, name, tool_list, key)
+
+    monkeypatch.setattr(SystemPromptSections, "_render_section", spy)
+    first = sections.render(tools("read", "memory_search"))
+    second = sections.render(tools("read", "bash"))
+    assert first != second
+    rendered.clear()
+
+    # 不同工具集合的会话交替渲染，互不导致重新渲染
+    assert sections.render(tools("read", "memory_search")) is first
+    assert sections.render(tools("bash", "read")) is second
+    assert "tooling" not in rendered
@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from agent.tools.scheduler.scheduler_service import SchedulerService
+from agent.tools.scheduler.task_store import TaskStore
+
+
+def make_task(task_id, next_run_at=None, enabled=True, receiver="u1"):
+    return {
+        "id": task_id,
+        "name": task_id,
+        "enabled": enabled,
+        "schedule": {"type": "interval", "seconds": 3600},
+        "next_run_at": next_run_at,
+        "action": {"channel_type": "web", "receiver": receiver},
+    }
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    json_path = tmp_path / "tasks.json"
+    legacy = {
+        "a": make_task("a", "2030-01-01T08:00:00"),
+        "b": make_task("b", "2029-01-01T08:00:00", enabled=False),
+        "c": make_task("c"),
+    }
+    json_path.write_text(json.dumps({"version": 1, "tasks": legacy}), encoding="utf-8")
+
+    # 传入旧的tasks.json路径，数据库建在同一目录
+    store = TaskStore(str(json_path))
+    assert store.store_path == str(tmp_path / "tasks.db")
+    assert store.load_tasks() == legacy
+    assert not json_path.exists()
+    assert (tmp_path / "tasks.json.migrated").exists()
+    assert [t["id"] for t in store.list_tasks()] == ["b", "a", "c"]
+    assert [t["id"] for t in store.list_tasks(enabled_only=True)] == ["a", "c"]
+    store.delete_task("a")
+    store.close()
+
+    # 重启后不会再次导入
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    assert set(store.load_tasks()) == {"b", "c"}
+    store.close()
+
+
+def test_unreadable_json_is_left_in_place(tmp_path):
+    json_path = tmp_path / "tasks.json"
+    json_path.write_text("{not json", encoding="utf-8")
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    assert store.load_tasks() == {}
+    assert json_path.exists()
+    store.close()
+
+
+def test_update_touches_one_row(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    store.add_task(make_task("a", "2030-01-01T08:00:00"))
+    store.add_task(make_task("b", "2030-01-02T08:00:00"))
+    with pytest.raises(ValueError):
+        store.add_task(make_task("a"))
+
+    conn = sqlite3.connect(store.store_path)
+    before = dict(conn.execute("SELECT id, data FROM tasks"))
+    store.update_task("a", {"next_run_at": "2031-01-01T08:00:00", "enabled": False})
+    after = dict(conn.execute("SELECT id, data FROM tasks"))
+    assert after["b"] == before["b"]
+    row = conn.execute("SELECT enabled, next_run_at FROM tasks WHERE id = 'a'").fetchone()
+    assert row == (0, "2031-01-01T08:00:00")
+    conn.close()
+
+    task = store.get_task("a")
+    assert task["enabled"] is False and "updated_at" in task
+    assert [t["id"] for t in store.list_tasks(enabled_only=True)] == ["b"]
+    with pytest.raises(ValueError):
+        store.update_task("missing", {"enabled": True})
+    store.close()
+
+
+def test_listeners_see_changes(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    events = []
+    store.add_listener(lambda task_id, task: events.append((task_id, task and task["enabled"])))
+    store.add_listener(lambda task_id, task: 1 / 0)  # 出错的监听器不影响其他监听器和存储
+
+    store.add_task(make_task("a"))
+    store.enable_task("a", False)
+    store.delete_task("a")
+    with pytest.raises(ValueError):
+        store.delete_task("a")
+    assert events == [("a", True), ("a", False), ("a", None)]
+    assert store.get_task("a") is None
+    store.close()
+
+
+def test_added_task_wakes_scheduler(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    ran = threading.Event()
+    service = SchedulerService(store, lambda task: ran.set(), max_workers=2, max_per_user=2, task_timeout=5)
+    service.start()
+    try:
+        # 空的堆会睡眠MAX_SLEEP_SECONDS，新增任务应立即唤醒调度循环
+        time.sleep(0.2)
+        start = time.monotonic()
+        store.add_task(make_task("soon", (datetime.now() + timedelta(seconds=0.3)).isoformat()))
+        assert ran.wait(5)
+        assert time.monotonic() - start < 2
+    finally:
+        service.stop()
+        store.close()
+
+
+def test_deleted_task_is_not_run(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.db"))
+    ran = threading.Event()
+    service = SchedulerService(store, lambda task: ran.set(), max_workers=2, max_per_user=2, task_timeout=5)
+    service.start()
+    try:
+        store.add_task(make_task("gone", (datetime.now() + timedelta(seconds=0.5)).isoformat()))
+        store.delete_task("gone")
+        assert not ran.wait(1.5)
+        assert service._scheduled == {}
+    finally:
+        service.stop()
+        store.close()
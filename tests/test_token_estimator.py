@@ -0,0 +1,54 @@
+import gc
+import weakref
+
+from agent.protocol.token_estimator import TokenEstimator
+
+
+class _Message(dict):
+    """dict subclass so the test can hold a weak reference"""
+
+
+def test_cache_does_not_pin_messages():
+    estimator = TokenEstimator(mode="heuristic")
+    message = _Message(role="user", content=[{"type": "tool_result", "content": "x" * 10000}])
+    ref = weakref.ref(message)
+    estimator.estimate_message(message)
+    del message
+    gc.collect()
+    assert ref() is None
+    assert estimator.stats()["cached_messages"] == 1
+
+
+def test_equal_content_hits_cache():
+    estimator = TokenEstimator(mode="heuristic")
+    first = estimator.estimate_message({"role": "user", "content": "hello world"})
+    second = estimator.estimate_message({"role": "user", "content": "hello world"})
+    assert first == second
+    assert estimator.hits == 1 and estimator.misses == 1
+
+
+def test_in_place_truncation_is_recounted():
+    estimator = TokenEstimator(mode="heuristic")
+    block = {"type": "tool_result", "tool_use_id": "t1", "content": "a" * 4000}
+    message = {"role": "user", "content": [block]}
+    full = estimator.estimate_message(message)
+    block["content"] = "a" * 400
+    truncated = estimator.estimate_message(message)
+    assert truncated < full
+    assert estimator.misses == 2
+
+
+def test_tool_use_input_change_is_recounted():
+    estimator = TokenEstimator(mode="heuristic")
+    block = {"type": "tool_use", "id": "t1", "name": "bash", "input": {"command": "ls"}}
+    message = {"role": "assistant", "content": [block]}
+    before = estimator.estimate_message(message)
+    block["input"] = {"command": "ls " + "-la " * 200}
+    assert estimator.estimate_message(message) > before
+
+
+def test_lru_bound():
+    estimator = TokenEstimator(mode="heuristic", max_cached_messages=3)
+    for i in range(10):
+        estimator.estimate_message({"role": "user", "content": f"message {i}"})
+    assert estimator.stats()["cached_messages"] == 3
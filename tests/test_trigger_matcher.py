@@ -0,0 +1,40 @@
+import random
+
+from channel.chat_channel import check_contain, check_prefix
+from common.trigger_matcher import KeywordMatcher, PrefixMatcher
+
+ALPHABET = "ab机器人@ "
+
+
+def random_words(rng, count, max_len):
+    return ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len))) for _ in range(count)]
+
+
+def test_prefix_matcher_matches_linear_scan():
+    rng = random.Random(0)
+    for _ in range(5000):
+        prefixes = random_words(rng, rng.randint(0, 5), 3)
+        content = random_words(rng, 1, 6)[0]
+        assert PrefixMatcher(prefixes).match(content) == check_prefix(content, prefixes), (prefixes, content)
+
+
+def test_keyword_matcher_matches_linear_scan():
+    rng = random.Random(1)
+    for _ in range(5000):
+        keywords = random_words(rng, rng.randint(0, 5), 3)
+        content = random_words(rng, 1, 6)[0]
+        assert KeywordMatcher(keywords).contains(content) == bool(check_contain(content, keywords)), (keywords, content)
+
+
+def test_prefix_order_wins_over_length():
+    assert PrefixMatcher(["bot", "bot2"]).match("bot2 hi") == "bot"
+    assert PrefixMatcher(["bot2", "bot"]).match("bot2 hi") == "bot2"
+    assert PrefixMatcher(["", "bot"]).match("bot hi") == ""
+    assert PrefixMatcher([]).match("bot") is None
+
+
+def test_keywords_are_literal():
+    matcher = KeywordMatcher(["a.b", "(x"])
+    assert matcher.contains("1a.b2") and matcher.contains("(x")
+    assert not matcher.contains("axb")
+    assert not KeywordMatcher([]).contains("anything")
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from channel.web import db
+
+
+@pytest.fixture
+def web_db(tmp_path, monkeypatch):
+    db.close_pool()
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "web_chat.db"))
+    monkeypatch.setattr(db, "_fts_enabled", None)
+    yield db
+    db.close_pool()
+
+
+def create_legacy_db(path, conversations):
+    """重写前的表结构：消息以JSON数组保存在conversations.messages中"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, "
+                 "password_hash TEXT NOT NULL, salt TEXT NOT NULL, created_at REAL)")
+    conn.execute("CREATE TABLE conversations (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, title TEXT, "
+                 "messages TEXT DEFAULT '[]', updated_at REAL)")
+    for cid, user_id, title, messages, updated_at in conversations:
+        conn.execute("INSERT INTO conversations VALUES (?, ?, ?, ?, ?)", (cid, user_id, title, json.dumps(messages), updated_at))
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_json_messages_are_migrated(web_db):
+    messages = [{"role": "user", "content": "你好", "timestamp": 1.0}, {"role": "assistant", "content": "hi", "timestamp": 2.0}]
+    create_legacy_db(web_db.DB_FILE, [("c1", 1, "旧对话", messages, 10.0), ("c2", 1, "broken", "not a list", 5.0)])
+    web_db.init_db()
+    conversation = web_db.get_conversation("c1", 1)
+    assert [(m["seq"], m["role"], m["content"]) for m in conversation["messages"]] == [(1, "user", "你好"), (2, "assistant", "hi")]
+    assert web_db.get_messages("c2", 1) == ([], False)
+    with web_db.connection() as conn:
+        assert conn.execute("SELECT messages FROM conversations WHERE id = 'c1'").fetchone()[0] == "[]"
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == web_db.SCHEMA_VERSION
+    # 再次初始化不会重复迁移
+    web_db.init_db()
+    assert len(web_db.get_messages("c1", 1)[0]) == 2
+
+
+def test_append_message_and_ownership(web_db):
+    web_db.init_db()
+    assert web_db.append_message("c1", 1, "user", "one", title="t") == 1
+    assert web_db.append_message("c1", 1, "assistant", "two") == 2
+    assert web_db.append_message("c1", 2, "user", "intruder") is None
+    assert web_db.append_message("missing", 1, "user", "x", create=False) is None
+    assert [m["content"] for m in web_db.get_messages("c1", 1)[0]] == ["one", "two"]
+    assert web_db.get_conversation("c1", 2) is None
+
+
+def test_concurrent_appends_get_distinct_seq(web_db):
+    web_db.init_db()
+    web_db.append_message("c1", 1, "user", "first")
+
+    def append(n):
+        for i in range(n):
+            web_db.append_message("c1", 1, "user", f"m{i}")
+
+    threads = [threading.Thread(target=append, args=(20,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    messages, _ = web_db.get_messages("c1", 1)
+    assert [m["seq"] for m in messages] == list(range(1, 82))
+
+
+def test_message_pages(web_db):
+    web_db.init_db()
+    for i in range(5):
+        web_db.append_message("c1", 1, "user", f"m{i}")
+    page, has_more = web_db.get_messages("c1", 1, limit=2)
+    assert [m["content"] for m in page] == ["m3", "m4"] and has_more
+    page, has_more = web_db.get_messages("c1", 1, before_seq=page[0]["seq"], limit=2)
+    assert [m["content"] for m in page] == ["m1", "m2"] and has_more
+    page, has_more = web_db.get_messages("c1", 1, before_seq=page[0]["seq"], limit=2)
+    assert [m["content"] for m in page] == ["m0"] and not has_more
+
+
+def test_conversation_cursor_matches_offset(web_db):
+    web_db.init_db()
+    for i in range(7):
+        web_db.append_message(f"c{i}", 1, "user", "x", title=f"t{i}")
+    expected = web_db.get_conversations(1, limit=100)
+    pages, cursor = [], None
+    while True:
+        page = web_db.get_conversations(1, limit=3, cursor=cursor)
+        if not page:
+            break
+        pages.extend(page)
+        cursor = web_db.encode_cursor(page[-1])
+    assert [c["id"] for c in pages] == [c["id"] for c in expected]
+    assert web_db.get_conversations(1, limit=3, offset=3) == expected[3:6]
+    assert web_db.get_conversation_count(1) == 7
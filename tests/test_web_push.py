@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+web = pytest.importorskip("web")
+
+from bridge.context import Context, ContextType
+from bridge.reply import Reply, ReplyType
+from channel.web import web_channel
+from channel.web.web_channel import WebChannel
+
+
+@pytest.fixture
+def channel():
+    return WebChannel()
+
+
+@pytest.fixture
+def session(channel):
+    """新会话及其中一条请求，返回(session_id, context)"""
+    session_id = "s-" + uuid.uuid4().hex
+    request_id = uuid.uuid4().hex
+    channel.request_to_session[request_id] = session_id
+    channel._get_queue(session_id, create=True)
+    context = Context(ContextType.TEXT, "hi")
+    context["request_id"] = request_id
+    return session_id, context
+
+
+@pytest.fixture
+def app():
+    return web.application(("/stream", "StreamHandler"), vars(web_channel), autoreload=False)
+
+
+def test_long_poll_wakes_on_send(channel, session, app):
+    session_id, context = session
+    threading.Timer(0.2, channel.send, args=(Reply(ReplyType.TEXT, "hello"), context)).start()
+    started = time.monotonic()
+    response = app.request(f"/stream?session_id={session_id}&timeout=5")
+    elapsed = time.monotonic() - started
+    data = json.loads(response.data)
+    assert data["has_content"] is True
+    assert [m["content"] for m in data["messages"]] == ["hello"]
+    assert data["messages"][0]["request_id"] == context["request_id"]
+    assert elapsed < 2
+
+
+def test_long_poll_times_out_empty(session, app):
+    session_id, _ = session
+    data = json.loads(app.request(f"/stream?session_id={session_id}&timeout=0.1").data)
+    assert data == {"status": "success", "has_content": False, "messages": []}
+
+
+def test_stream_updates_are_coalesced(channel, session):
+    session_id, context = session
+    stream_id = channel.update_message(context, None, "a")
+    channel.update_message(context, stream_id, "ab")
+    channel.update_message(context, stream_id, "abc", final=True)
+    channel.send(Reply(ReplyType.TEXT, "next"), context)
+    responses = channel._take_responses(channel._get_queue(session_id), 1)
+    assert [(r["content"], r.get("final")) for r in responses] == [("abc", True), ("next", None)]
+
+
+def test_sse_delivers_events_and_heartbeats(channel, session, monkeypatch):
+    session_id, context = session
+    monkeypatch.setattr(web_channel, "SSE_HEARTBEAT_SECONDS", 0.1)
+    events = channel._sse_events(session_id, channel._get_queue(session_id))
+    assert next(events).startswith("retry:")
+    assert next(events) == ": ping\n\n"
+    channel.send(Reply(ReplyType.TEXT, "pushed"), context)
+    event = next(events)
+    assert event.startswith("data: ") and event.endswith("\n\n")
+    assert json.loads(event[len("data: "):])["content"] == "pushed"
+    events.close()
+
+
+def test_sse_requeues_undelivered_events(channel, session):
+    session_id, context = session
+    queue = channel._get_queue(session_id)
+    channel.send(Reply(ReplyType.TEXT, "first"), context)
+    channel.send(Reply(ReplyType.TEXT, "second"), context)
+    events = channel._sse_events(session_id, queue)
+    next(events)
+    next(events)  # "first"写出时连接断开
+    events.close()
+    assert [r["content"] for r in channel._take_responses(queue, 0.1)] == ["first", "second"]
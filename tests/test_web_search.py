@@ -0,0 +1,107 @@
+import sqlite3
+
+import pytest
+
+from channel.web import db
+from common.fts_tokenizer import build_match_query, make_snippet, segment
+
+
+def _fts5_available():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def web_db(tmp_path, monkeypatch):
+    if not _fts5_available():
+        pytest.skip("SQLite built without FTS5")
+    db.close_pool()
+    monkeypatch.setattr(db, "DB_FILE", str(tmp_path / "web_chat.db"))
+    monkeypatch.setattr(db, "_fts_enabled", None)
+    db.init_db()
+    yield db
+    db.close_pool()
+
+
+def search_ids(web_db, user_id, query, **kwargs):
+    results, total = web_db.search_conversations(user_id, query, **kwargs)
+    return [r["id"] for r in results], total
+
+
+def test_segment_and_match_query():
+    assert segment("你好世界") == "你好 好世 世界 界"
+    assert segment("hello 世界 2024") == "hello 世界 界 2024"
+    assert segment("plain text") == "plain text"
+    assert build_match_query("世界 hello") == '"世界" AND "hello"'
+    assert build_match_query("天气预报", operator="OR") == '"天气 气预 预报"'
+    assert build_match_query("界") == '"界"*'
+    assert build_match_query("  ,.!") is None
+
+
+def test_snippet_centers_on_first_hit():
+    text = "开头" * 40 + "关键内容在这里" + "结尾" * 40
+    snippet = make_snippet(text, "关键内容", width=20)
+    assert "关键内容" in snippet and snippet.startswith("...") and snippet.endswith("...")
+    assert make_snippet("short\ntext", "x") == "short text"
+
+
+def test_chinese_queries_match_substrings(web_db):
+    web_db.append_message("c1", 1, "user", "明天北京的天气预报怎么样", title="天气")
+    web_db.append_message("c2", 1, "user", "帮我写一首关于春天的诗", title="写诗")
+    assert search_ids(web_db, 1, "天气预报") == (["c1"], 1)
+    assert search_ids(web_db, 1, "北京") == (["c1"], 1)
+    assert search_ids(web_db, 1, "诗")[0] == ["c2"]
+    assert search_ids(web_db, 1, "上海") == ([], 0)
+
+
+def test_title_hits_rank_first_and_snippet(web_db):
+    web_db.append_message("c1", 1, "user", "顺便问一下 python 的装饰器怎么写", title="杂项")
+    web_db.append_message("c2", 1, "user", "列表推导式", title="python 入门")
+    results, total = web_db.search_conversations(1, "python")
+    assert total == 2
+    assert results[0]["id"] == "c2"
+    assert "python" in results[1]["snippet"]
+
+
+def test_search_is_scoped_to_user(web_db):
+    web_db.append_message("c1", 1, "user", "秘密计划")
+    web_db.append_message("c2", 2, "user", "秘密计划")
+    assert search_ids(web_db, 1, "秘密") == (["c1"], 1)
+    assert search_ids(web_db, 2, "秘密") == (["c2"], 1)
+
+
+def test_deleted_and_replaced_messages_leave_the_index(web_db):
+    web_db.append_message("c1", 1, "user", "旧的内容")
+    web_db.save_conversation("c1", 1, [{"role": "user", "content": "新的内容"}], title="改名")
+    assert search_ids(web_db, 1, "旧的") == ([], 0)
+    assert search_ids(web_db, 1, "新的") == (["c1"], 1)
+    assert search_ids(web_db, 1, "改名") == (["c1"], 1)
+    web_db.delete_conversation("c1", 1)
+    assert search_ids(web_db, 1, "新的") == ([], 0)
+
+
+def test_pagination_keeps_total(web_db):
+    for i in range(5):
+        web_db.append_message(f"c{i}", 1, "user", f"会议纪要 {i}")
+    ids, total = search_ids(web_db, 1, "会议", limit=2, offset=4)
+    assert len(ids) == 1 and total == 5
+    ids, total = search_ids(web_db, 1, "会议", limit=2, offset=10)
+    assert ids == [] and total == 5
+
+
+def test_existing_rows_are_indexed_on_upgrade(web_db):
+    web_db.append_message("c1", 1, "user", "升级前的消息", title="旧标题")
+    with web_db.connection() as conn:
+        conn.execute("DROP TABLE messages_fts")
+        conn.execute("DROP TABLE conversations_fts")
+        conn.execute("PRAGMA user_version = 1")
+    web_db._fts_enabled = None
+    web_db.init_db()
+    assert search_ids(web_db, 1, "升级") == (["c1"], 1)
+    assert search_ids(web_db, 1, "旧标题") == (["c1"], 1)
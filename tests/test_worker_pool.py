@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+
+import config
+from bridge.context import Context, ContextType
+from channel import chat_channel
+from channel.chat_channel import ChatChannel
+from common.dequeue import Dequeue
+from common.worker_pool import POLICY_SHED, PoolBusyError, WorkerPool
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+def occupy(pool, gate):
+    """提交一个阻塞任务并等它开始执行，之后提交的任务都会排队"""
+    future = pool.submit(gate.wait, 5)
+    wait_until(lambda: pool.stats()["active_workers"] == 1)
+    return future
+
+
+def test_reject_when_queue_full(gate):
+    pool = WorkerPool("t", max_workers=1, max_queue=2)
+    occupy(pool, gate)
+    queued = [pool.submit(lambda i=i: i) for i in range(2)]
+    with pytest.raises(PoolBusyError):
+        pool.submit(lambda: None)
+    stats = pool.stats()
+    assert (stats["queue_depth"], stats["active_workers"]) == (2, 1)
+    assert (stats["submitted"], stats["rejected"], stats["shed"]) == (3, 1, 0)
+
+    gate.set()
+    assert [f.result(timeout=5) for f in queued] == [0, 1]
+    wait_until(lambda: pool.stats()["completed"] == 3)
+    stats = pool.stats()
+    assert (stats["queue_depth"], stats["active_workers"]) == (0, 0)
+    assert stats["max_wait_ms"] > 0
+    pool.shutdown()
+
+
+def test_shed_drops_oldest_queued(gate):
+    pool = WorkerPool("t", max_workers=1, max_queue=2, policy=POLICY_SHED)
+    occupy(pool, gate)
+    oldest, second = pool.submit(lambda: "oldest"), pool.submit(lambda: "second")
+    newest = pool.submit(lambda: "newest")
+    assert oldest.cancelled() and oldest.shed
+    assert not second.shed and not newest.shed
+    stats = pool.stats()
+    assert (stats["queue_depth"], stats["shed"], stats["rejected"], stats["submitted"]) == (2, 1, 0, 4)
+
+    gate.set()
+    assert (second.result(timeout=5), newest.result(timeout=5)) == ("second", "newest")
+    pool.shutdown()
+
+
+def test_shed_undone_when_task_already_started(gate):
+    pool = WorkerPool("t", max_workers=2, max_queue=1, policy=POLICY_SHED)
+    occupy(pool, gate)
+    with pool.lock:
+        # 新建的工作线程取到任务(future进入RUNNING)后阻塞在pool.lock上，此时它仍在pending中
+        started = pool.submit(lambda: "started")
+        wait_until(started.running)
+        newest = pool.submit(lambda: "newest")
+        assert not started.cancelled() and not started.shed
+        assert pool.stats()["shed"] == 0
+    assert started.result(timeout=5) == "started"
+    assert newest.result(timeout=5) == "newest"
+    gate.set()
+    wait_until(lambda: pool.stats()["completed"] == 3)
+    assert pool.stats()["queue_depth"] == 0
+    pool.shutdown()
+
+
+def test_cancelled_future_leaves_queue(gate):
+    pool = WorkerPool("t", max_workers=1, max_queue=1)
+    occupy(pool, gate)
+    queued = pool.submit(lambda: None)
+    assert queued.cancel()
+    assert pool.stats()["queue_depth"] == 0
+    # 取消后腾出排队位置
+    pool.submit(lambda: None)
+    assert pool.stats()["rejected"] == 0
+    gate.set()
+    pool.shutdown()
+
+
+class _Channel(ChatChannel):
+    def __init__(self):
+        # 不启动consume线程
+        self.sessions = {}
+        self.futures = {}
+        self.ready_sessions = Dequeue()
+        self.sent = []
+        self.sent_event = threading.Event()
+
+    def _handle(self, context):
+        pass
+
+    def _send(self, reply, context, retry_cnt=0):
+        self.sent.append((reply.content, context.content))
+        self.sent_event.set()
+
+
+def make_context(content, ctype=ContextType.TEXT, session_id="s1"):
+    context = Context(ctype, content)
+    context["session_id"] = session_id
+    context["receiver"] = session_id
+    return context
+
+
+@pytest.fixture
+def channel(monkeypatch):
+    def _channel(**overrides):
+        settings = {"handler_pool_size": 1, "handler_pool_max_queue": 1, "handler_pool_busy_reply": "忙"}
+        monkeypatch.setattr(config, "config", config.Config(dict(settings, **overrides)))
+        monkeypatch.setattr(chat_channel, "handler_pools", {})
+        return _Channel()
+
+    return _channel
+
+
+def test_select_handler_pool(channel):
+    ch = channel()
+    assert ch._select_handler_pool(make_context("hi")) == "text"
+    assert ch._select_handler_pool(make_context("a.mp3", ContextType.VOICE)) == "media"
+    assert ch._select_handler_pool(make_context("a.png", ContextType.IMAGE)) == "media"
+    ch = channel(agent=True)
+    assert ch._select_handler_pool(make_context("hi")) == "agent"
+    assert ch._select_handler_pool(make_context("a.png", ContextType.IMAGE)) == "media"
+
+
+def test_rejected_message_gets_busy_reply(channel, gate):
+    ch = channel()
+    pool = chat_channel.get_handler_pool("text")
+    occupy(pool, gate)
+    for content in ("first", "second"):
+        ch.produce(make_context(content))
+    ch._dispatch("s1")
+
+    assert ch.sent_event.wait(5)
+    assert ch.sent == [("忙", "second")]
+    assert pool.stats()["rejected"] == 1
+    # 被拒绝的消息归还了信号量，只有排队中的一条占用
+    assert ch.sessions["s1"][1]._value == ch.sessions["s1"][1]._initial_value - 1
+    assert chat_channel.handler_pool_stats()[0]["queue_depth"] == 1
+
+
+def test_shed_message_gets_busy_reply(channel, gate):
+    ch = channel(handler_pool_reject_policy="shed")
+    pool = chat_channel.get_handler_pool("text")
+    occupy(pool, gate)
+    for content in ("first", "second"):
+        ch.produce(make_context(content))
+    ch._dispatch("s1")
+
+    assert ch.sent_event.wait(5)
+    assert ch.sent == [("忙", "first")]
+    assert pool.stats()["shed"] == 1
+    gate.set()
+    wait_until(lambda: ch.sessions["s1"][1]._value == ch.sessions["s1"][1]._initial_value)